@@ -1,25 +1,39 @@
-disable_jit = True
-if disable_jit:
-    import os
-
-    os.environ["NUMBA_DISABLE_JIT"] = "1"
-
 from agents.common import (
     PLAYER1,
     PLAYER2,
     NO_PLAYER,
+    N_CELLS,
+    N_COLUMNS,
+    BITBOARD_HEIGHT,
+    N_ROWS,
     GameState,
     BoardPiece,
     SavedState,
     PlayerAction,
-    check_end_state,
-    is_terminal_board,
-    apply_player_action,
+    Position,
+    TimeManager,
+    atomic_add,
+    jit,
+    other_player,
+    player_index,
+    play_bitboard,
+    warm_up_jit,
+    ZOBRIST_BITS,
+    ZOBRIST_SIDE,
+    column_mask,
+    get_worker_pool,
+    legal_columns,
+    batch_connected_four,
+    bitboard_connected_four,
 )
 import numpy as np
+import random
+import threading
 import time
-from numba import njit
-from typing import Optional, Tuple
+from dataclasses import asdict, dataclass
+from typing import Optional, Tuple, Union
+from agents.opening_book import OpeningBook, book_move
+from agents.solver import COLUMN_ORDER, SOLVER_EMPTY_CELLS, solve_move, warm_up_solver
 
 
 def get_valid_actions(board):
@@ -34,38 +48,436 @@ def get_valid_actions(board):
     return np.where(board[-1, :] == NO_PLAYER)[0]
 
 
-def other_player(player):
-    """Returns the opposing player
+MASK_COLUMNS = [
+    [column for column in range(N_COLUMNS) if mask >> column & 1] for mask in range(1 << N_COLUMNS)
+]  # MASK_COLUMNS[mask] lists the columns set in a 7 bit column mask
+EARLY_STOP_INTERVAL = 256  # iterations between the early stopping checks of MCTS.get_best_action
+MIN_WORKER_TIME = 1e-3  # seconds a root_parallel_search worker searches for when it starts late
+NODE_ARRAYS = {  # name: (dtype, shape of one row, fill value) of the per-node arrays of MCTS
+    "visits": (np.int64, (), 0),
+    "wins": (np.float64, (), 0.0),
+    "parent": (np.int32, (), -1),
+    "action": (np.int8, (), -1),
+    "player": (np.int8, (), 0),
+    "children": (np.int32, (N_COLUMNS,), -1),
+    "unexpanded": (np.uint8, (), 0),
+    "terminal": (np.bool_, (), False),
+    "n_moves": (np.int8, (), 0),
+    "bitboards": (np.int64, (2,), 0),
+    "child_visits": (np.int32, (N_COLUMNS,), 0),  # edge statistics, per action of the node
+    "child_wins": (np.float32, (N_COLUMNS,), 0.0),
+    "log_visits": (np.float64, (), 0.0),  # np.log(visits), cached for the selection
+    "virtual_loss": (np.int32, (), 0),
+    "proven": (np.int8, (), 0),  # with the solver, 1 (-1) if the player who moved into the node has a proven win (loss)
+    "key": (np.uint64, (), 0),  # Zobrist key, only kept for the transposition table
+}
+NODE_BYTES = sum(np.dtype(dtype).itemsize * int(np.prod(shape)) for dtype, shape, _ in NODE_ARRAYS.values())
+
+
+@jit
+def random_column(columns_mask):
+    """Returns a uniformly random column out of the columns set in the 7 bit `columns_mask`."""
+    n_columns = 0
+    for column in range(N_COLUMNS):
+        if columns_mask >> column & 1:
+            n_columns += 1
+    k = random.randrange(n_columns)  # play the k-th column in the mask
+    for column in range(N_COLUMNS):
+        if columns_mask >> column & 1:
+            if k == 0:
+                return column
+            k -= 1
+    return -1
+
+
+@jit(nogil=True)
+def random_rollout(bitboard, other_bitboard, n_moves):
+    """Plays uniformly random moves on a bitboard position until the game ends.
+
+    Args:
+        bitboard (int): Bitboard of the player to move.
+        other_bitboard (int): Bitboard of the player who made the last move.
+        n_moves (int): Number of pieces on the board.
+
+    Returns:
+        Int: 1 if the player to move wins, -1 if the other player wins, 0 for a draw.
     """
-    return PLAYER1 if player is PLAYER2 else PLAYER2
+    mask = bitboard | other_bitboard
+    sign = 1
+    while True:
+        if bitboard_connected_four(other_bitboard):  # only the player who just moved can have won
+            return -sign
+        if n_moves == N_CELLS:
+            return 0
+        action = random_column(legal_columns(mask))
+        bitboard, mask = play_bitboard(bitboard, mask, action)
+        bitboard, other_bitboard = other_bitboard, bitboard
+        n_moves += 1
+        sign = -sign
 
 
-class Node:
-    def __init__(self, board, parent, player):
-        """Class constructor for a node in the tree. Attributes are included to describe
-        the game state of the node and statistics for monte carlo tree search.
+@jit(nogil=True)
+def repeated_rollouts(bitboard, other_bitboard, n_moves, n_rollouts):
+    """Plays `n_rollouts` random_rollout games from the same position.
 
-        Args:
-            board (Numpy.ndarray): Array describing the board state of the node.
-            parent (Node): Parent node of current node.
-            player (BoardPiece): Current player to play into the state of the node.
-        """
-        # State details
-        self.board = board
-        self.player = player
-        self.parent = parent
-        self.children = {}
-        self.unplayed_actions = get_valid_actions(board)
-        if is_terminal_board(board, other_player(player)) or is_terminal_board(
-            board, player
-        ):
-            self.is_terminal = True
+    Returns:
+        Float: mean outcome for the player to move, between -1 and 1.
+    """
+    total = 0
+    for _ in range(n_rollouts):
+        total += random_rollout(bitboard, other_bitboard, n_moves)
+    return total / n_rollouts
+
+
+COLUMN_MASKS = np.array([column_mask(column) for column in range(N_COLUMNS)], dtype=np.int64)
+BOTTOM_CELLS = np.array([1 << (column * BITBOARD_HEIGHT) for column in range(N_COLUMNS)], dtype=np.int64)
+TOP_CELLS = BOTTOM_CELLS << (N_ROWS - 1)
+
+
+def batch_rollouts(bitboards, other_bitboards, n_moves):
+    """Plays many random games at once, one per entry of the input arrays, with NumPy operations
+    over the whole batch: legal moves are sampled for every game in one draw and wins are
+    detected with batch_connected_four. Finished games are dropped from the batch as it goes.
+
+    Args:
+        bitboards (np.ndarray): Bitboards of the player to move, one per game.
+        other_bitboards (np.ndarray): Bitboards of the player who made the last move.
+        n_moves (np.ndarray): Number of pieces on each board.
+
+    Returns:
+        np.ndarray: per game, 1 if the player to move at the start wins, -1 if the other player
+            wins, 0 for a draw.
+    """
+    bitboards, other_bitboards, n_moves = np.broadcast_arrays(
+        np.asarray(bitboards, dtype=np.int64), np.asarray(other_bitboards, dtype=np.int64),
+        np.asarray(n_moves, dtype=np.int64))
+    outcomes = np.zeros(len(bitboards), dtype=np.int8)
+    games = np.arange(len(bitboards))  # index into outcomes of the games still running
+    mask = bitboards | other_bitboards
+    sign = 1  # all games move in lockstep, so the start player is to move on every other ply
+    while len(games):
+        won = batch_connected_four(other_bitboards)  # only the player who just moved can have won
+        outcomes[games[won]] = -sign
+        running = ~won & (n_moves < N_CELLS)
+        games, bitboards, other_bitboards, mask, n_moves = (
+            games[running], bitboards[running], other_bitboards[running], mask[running], n_moves[running])
+
+        open_columns = (mask[:, None] & TOP_CELLS) == 0
+        columns = np.argmax(np.random.random(open_columns.shape) * open_columns, axis=1)  # uniform over open columns
+        move = (mask + BOTTOM_CELLS[columns]) & COLUMN_MASKS[columns]
+        bitboards, other_bitboards = other_bitboards, bitboards | move
+        mask = mask | move
+        n_moves = n_moves + 1
+        sign = -sign
+    return outcomes
+
+
+@jit
+def simulate_node(bitboards, player, n_moves, node, root_player):
+    """Runs random_rollout from `node` of an MCTS tree.
+
+    Returns:
+        Float: 1 if the rollout was a win for `root_player`, 0.5 for a draw, otherwise 0.
+    """
+    to_move = 0 if player[node] > 0 else 1  # PLAYER1 is stored as 1 and PLAYER2 as -1
+    outcome = random_rollout(bitboards[node, to_move], bitboards[node, 1 - to_move], n_moves[node])
+    if player[node] != root_player:
+        outcome = -outcome
+    return (outcome + 1) / 2
+
+
+@jit
+def expand_node(node, child, column, children, unexpanded, parent, action, player, bitboards, n_moves,
+                terminal, proven, solver):
+    """Plays the unexpanded action `column` of `node` and stores the resulting position as
+    the new node `child`, which must be an unused slot of the node arrays. With `solver`, a
+    winning move marks the child as a proven win. The child is linked to `node` only once it
+    is complete, so that descents running at the same time never reach a half written node.
+    """
+    mover = 0 if player[node] > 0 else 1
+    bitboard, mask = play_bitboard(bitboards[node, mover], bitboards[node, 0] | bitboards[node, 1], column)
+    bitboards[child, mover] = bitboard
+    bitboards[child, 1 - mover] = bitboards[node, 1 - mover]
+    n_moves[child] = n_moves[node] + 1
+    won = bitboard_connected_four(bitboard)
+    terminal[child] = won or n_moves[child] == N_CELLS
+    proven[child] = 1 if solver and won else 0
+    unexpanded[child] = 0 if terminal[child] else legal_columns(mask)
+    parent[child] = node
+    action[child] = column
+    player[child] = -player[node]
+    children[node, column] = child
+    unexpanded[node] &= ~(1 << column)  # remove played action from the unplayed actions
+
+
+@jit
+def seed_kernels(seed):
+    """Seeds the random number generators used inside the nopython kernels, which keep their
+    own state apart from python's and NumPy's once compiled."""
+    random.seed(seed)
+    np.random.seed(seed)
+
+
+def seed_random(seed):
+    """Seeds every random number generator used by the MCTS agent.
+
+    Args:
+        seed (int): Seed, between 0 and 2**32 - 1.
+    """
+    random.seed(seed)
+    np.random.seed(seed)
+    seed_kernels(seed)
+
+
+def warm_up_mcts(board: np.ndarray = None, player: BoardPiece = PLAYER1):
+    """Compiles the nopython kernels used by the MCTS agent, or loads them from the on-disk
+    cache. Takes the arguments of the `init` hooks of main.human_vs_agent, which are ignored.
+    """
+    warm_up_jit()
+    random_rollout(0, 0, 0)
+    seed_kernels(0)
+    tree = MCTS(PLAYER1, np.zeros((6, 7), dtype=BoardPiece), iterations=1, timeout=False, solver=True)
+    tree.get_best_action()
+    solve_path(tree.path, 0, tree.proven, tree.children, tree.unexpanded)
+    warm_up_solver()
+
+
+@jit
+def uct_best_child(children, child_visits, child_wins, log_visits, virtual_loss, proven, node,
+                   exploration_const):
+    """Returns the index of the child of `node` with the highest UCB1 score,
+    wins / visits + exploration_const * sqrt(log(parent visits) / visits), computed from the
+    contiguous edge statistics of `node` and its cached log visit count. Children without
+    visits score +inf.
+    Virtual losses count as visits without wins, which steers concurrent searches of one tree
+    onto different paths. Proven children are not scored: losses are only chosen when nothing
+    else is left, and a win is always chosen.
+
+    Args:
+        children (np.ndarray): Child index table of the tree, -1 where a child is missing.
+        child_visits (np.ndarray): Visits of the edges to the children, per node and action.
+        child_wins (np.ndarray): Wins of the edges, for the player who makes the move.
+        log_visits (np.ndarray): Cached natural log of the visit counts of the nodes.
+        virtual_loss (np.ndarray): Number of searches currently passing through each node.
+        proven (np.ndarray): Proven results of the nodes, see NODE_ARRAYS.
+        node (int): Index of the parent node.
+        exploration_const (float): Weight of the exploration term.
+
+    Returns:
+        Int: index of the best child.
+    """
+    log_parent_visits = log_visits[node]
+    best_score = -np.inf
+    best_child = -1
+    for action in range(N_COLUMNS):
+        child = children[node, action]
+        if child < 0:
+            continue
+        visits = child_visits[node, action] + virtual_loss[child]
+        if proven[child] != 0:
+            score = proven[child] * 1e9
+        elif visits == 0:
+            score = np.inf
         else:
-            self.is_terminal = False
+            score = child_wins[node, action] / visits + exploration_const * np.sqrt(log_parent_visits / visits)
+        if score > best_score:
+            best_score = score
+            best_child = child
+    return best_child
+
+
+@jit(nogil=True)
+def descend(children, child_visits, child_wins, log_visits, virtual_loss, proven, terminal, unexpanded,
+            exploration_const, path, add_virtual_loss):
+    """Follows the best UCB1 children from the root (node 0) until reaching a terminal or proven
+    node or a node with unexpanded actions, writing the visited nodes into `path`. Adds
+    `add_virtual_loss` to the virtual loss of every visited node, with atomic_add, as other
+    threads may descend the same path at the same time.
+
+    Returns:
+        Int: length of the path, the last node in it is where the descent stopped.
+    """
+    node = 0
+    path[0] = node
+    if add_virtual_loss:
+        atomic_add(virtual_loss, node, add_virtual_loss)
+    length = 1
+    while not terminal[node] and proven[node] == 0 and unexpanded[node] == 0:
+        node = uct_best_child(children, child_visits, child_wins, log_visits, virtual_loss, proven, node,
+                              exploration_const)
+        if node < 0:  # in tree-parallel search, the last child may be expanded but not linked yet
+            break
+        path[length] = node
+        if add_virtual_loss:
+            atomic_add(virtual_loss, node, add_virtual_loss)
+        length += 1
+    return length
+
+
+@jit(nogil=True)
+def add_virtual_loss(virtual_loss, node, amount):
+    """Adds `amount` to the virtual loss of `node` with atomic_add."""
+    atomic_add(virtual_loss, node, amount)
+
+
+@jit(nogil=True)
+def backpropagate_path(path, length, visits, wins, child_visits, child_wins, log_visits, children,
+                       virtual_loss, player, root_player, result, remove_virtual_loss):
+    """Adds one visit and the rollout result to every node of `path` and to the edges between
+    them, refreshes the cached logs of the node visits, and takes `remove_virtual_loss` off
+    their virtual loss. With a virtual loss to remove, that is in tree-parallel search, the
+    statistics are updated with atomic_add, as other threads update the same nodes at the
+    same time.
+
+    Args:
+        result (float): Score of the rollout for `root_player`, 1 for a win, 0.5 for a draw and
+            0 for a loss. Nodes entered by the opponent of the root player are credited 1 - result.
+    """
+    for k in range(length):
+        node = path[k]
+        if player[node] != root_player:  # the root player made the move into this node
+            score = result
+        else:
+            score = 1.0 - result
+        if remove_virtual_loss:
+            log_visits[node] = np.log(atomic_add(visits, node, 1) + 1)
+            atomic_add(wins, node, score)
+            atomic_add(virtual_loss, node, -remove_virtual_loss)
+        else:
+            visits[node] += 1
+            log_visits[node] = np.log(visits[node])
+            wins[node] += score
+        if k > 0:
+            parent = path[k - 1]
+            for column in range(N_COLUMNS):  # with transpositions, the node may be another action's child first
+                if children[parent, column] == node:
+                    if remove_virtual_loss:
+                        atomic_add(child_visits, (parent, column), 1)
+                        atomic_add(child_wins, (parent, column), score)
+                    else:
+                        child_visits[parent, column] += 1
+                        child_wins[parent, column] += score
+                    break
+
+
+@jit
+def solve_path(path, length, proven, children, unexpanded):
+    """Propagates the proven result of the last node of `path` towards the root. The player to
+    move at a node wins if any child is a proven win for them, so its parent is a proven loss
+    for the player who moved into it; and loses if every action has been expanded into a proven
+    loss for them, so it is a proven win for the player who moved into it.
+    """
+    for k in range(length - 1, 0, -1):
+        node, parent = path[k], path[k - 1]
+        if proven[parent] != 0:
+            return
+        if proven[node] == 1:
+            proven[parent] = -1
+        elif proven[node] == -1 and unexpanded[parent] == 0:
+            for column in range(N_COLUMNS):
+                child = children[parent, column]
+                if child >= 0 and proven[child] != -1:
+                    return
+            proven[parent] = 1
+        else:
+            return
+
+
+def center_first_column(columns_mask):
+    """Returns the first column in center-first order out of the columns set in the 7 bit
+    `columns_mask`. Raises a ValueError if there is none, on a full board."""
+    for column in COLUMN_ORDER:
+        if columns_mask >> column & 1:
+            return int(column)
+    raise ValueError("The board is full, there is no action to play.")
+
+
+class Node:
+    """View of one node of an MCTS tree. The node statistics live in the arrays of the tree;
+    this class reads them for inspection and for the tests.
+    """
+
+    def __init__(self, tree, index):
+        self.tree = tree
+        self.index = index
+
+    @property
+    def visits(self):
+        return int(self.tree.visits[self.index])
+
+    @property
+    def wins(self):
+        return float(self.tree.wins[self.index])
+
+    @property
+    def player(self):
+        return PLAYER1 if self.tree.player[self.index] == PLAYER1 else PLAYER2
+
+    @property
+    def parent(self):
+        parent = self.tree.parent[self.index]
+        return None if parent < 0 else Node(self.tree, int(parent))
+
+    @property
+    def children(self):
+        return {
+            action: Node(self.tree, int(child))
+            for action, child in enumerate(self.tree.children[self.index])
+            if child >= 0
+        }
+
+    @property
+    def unplayed_actions(self):
+        return MASK_COLUMNS[self.tree.unexpanded[self.index]]
+
+    @property
+    def is_terminal(self):
+        return bool(self.tree.terminal[self.index])
+
+    @property
+    def position(self):
+        return Position.from_bitboards(self.player, self.tree.bitboards[self.index].tolist())
+
+
+@dataclass
+class SearchStats:
+    """Statistics of one MCTS search, see MCTS.search_stats. Times are in seconds. Of the
+    phase times, only selection_time is measured unless the search runs with profile=True."""
+    iterations: int
+    rollouts: int
+    elapsed: float
+    n_nodes: int
+    high_water_nodes: int
+    high_water_bytes: int
+    max_depth: int
+    mean_depth: float
+    root_visits: np.ndarray  # visits and wins of the 7 root actions, 0 where not expanded
+    root_wins: np.ndarray
+    root_proven: int
+    deduplicated: int = 0
+    recycled: int = 0
+    selection_time: float = 0.0
+    expansion_time: float = 0.0
+    simulation_time: float = 0.0
+    backpropagation_time: float = 0.0
+
+    @property
+    def iterations_per_second(self) -> float:
+        return self.iterations / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def rollouts_per_second(self) -> float:
+        return self.rollouts / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self) -> dict:
+        """Returns the statistics as plain python values, for logging as JSON."""
+        stats = asdict(self)
+        stats["root_visits"] = self.root_visits.tolist()
+        stats["root_wins"] = self.root_wins.tolist()
+        stats["iterations_per_second"] = self.iterations_per_second
+        stats["rollouts_per_second"] = self.rollouts_per_second
+        return stats
 
-        # Monte Carlo Metrics
-        self.visits = 0
-        self.wins = 0
 
 # Monte Carlo Tree Search
 class MCTS(object):
@@ -76,59 +488,593 @@ class MCTS(object):
         iterations=False,
         timeout=4,
         exploration_const=1 / np.sqrt(2),
+        initial_capacity=1024,
+        rollouts_per_leaf=1,
+        n_threads=1,
+        transpositions=False,
+        max_transpositions=1 << 20,
+        early_stop=False,
+        max_nodes=None,
+        max_bytes=None,
+        recycle=False,
+        solver=False,
+        profile=False,
+        callback=None,
+        callback_interval=1000,
     ):
-        """Class constructor for a Monte Carlo tree search
+        """Class constructor for a Monte Carlo tree search. The tree is a pool of nodes stored
+        as parallel arrays (see NODE_ARRAYS) indexed by node, with the root at index 0. Each
+        node keeps its bitboards, so no board is copied or rebuilt during the search, and the
+        pool grows geometrically when it is full.
 
         Args:
-            current_player (BoardPiece): _description_
-            current_board (numpy.ndarray): _description_
-            iterations (int, optional): _description_. Defaults to 2000.
-            timeout (int, optional): _description_. Defaults to 5.
-            exploration_const (int, optional): _description_. Defaults to 1/np.sqrt(2).
+            current_player (BoardPiece): Player to move at the root.
+            current_board (numpy.ndarray): Board at the root.
+            iterations (int, optional): Number of iterations, used when timeout is False. Defaults to False.
+            timeout (int, optional): Seconds to search for. Defaults to 4.
+            exploration_const (float, optional): Weight of the UCB1 exploration term, see
+                uct_best_child. Defaults to 1/np.sqrt(2).
+            initial_capacity (int, optional): Number of nodes allocated up front. Defaults to 1024.
+            rollouts_per_leaf (int, optional): Random games played from every new leaf. With more
+                than one, they are played as one batch_rollouts call, or repeated_rollouts in
+                tree-parallel search, and the leaf is backpropagated with their mean score. Defaults to 1.
+            n_threads (int, optional): Number of threads searching the tree concurrently, see
+                search_threads. Defaults to 1.
+            transpositions (bool, optional): Share one node between all move orders that reach
+                the same position, which turns the tree into a DAG. Nodes are looked up by their
+                Zobrist key in self.transpositions. Defaults to False.
+            max_transpositions (int, optional): Most positions kept in self.transpositions;
+                once it is full, new nodes are no longer added to it. Defaults to 2**20.
+            early_stop (bool, optional): Stop searching once the most visited root child can
+                no longer be overtaken in the iterations or time left, see get_best_action.
+                Defaults to False.
+            max_nodes (int, optional): Most nodes the tree may hold. Defaults to None, no limit.
+            max_bytes (int, optional): Most bytes the node arrays may take, which bounds the
+                number of nodes in the same way; the transposition table is not counted.
+                Defaults to None, no limit.
+            recycle (bool, optional): What to do once the tree is full. If False, the search
+                goes on without expanding, with rollouts from the leaves it reaches. If True,
+                the least visited subtrees are freed with recycle_nodes and the search goes on
+                expanding. Defaults to False.
+            solver (bool, optional): Prove wins and losses (MCTS-Solver): winning moves are
+                stored as proven results in self.proven and propagated towards the root by
+                solve_path. Proven nodes are scored by their result instead of rollouts, the
+                selection skips them, and get_best_action returns as soon as the root is proven.
+                Defaults to False.
+            profile (bool, optional): Time every phase of the iterations for the SearchStats,
+                not only the selection. Defaults to False.
+            callback (callable, optional): Called with the SearchStats of the search so far
+                every `callback_interval` iterations of get_best_action; not called by
+                tree-parallel search. Defaults to None.
+            callback_interval (int, optional): Iterations between callback calls. Defaults to 1000.
         """
         self.timeout = timeout
         self.iterations = iterations
         self.exploration_const = exploration_const
         self.current_player = current_player
-        self.rootnode = Node(current_board, None, current_player)
+        self.rollouts_per_leaf = rollouts_per_leaf
+        self.n_threads = n_threads
+        self.early_stop = early_stop
+        self.solver = solver
+        self.profile = profile
+        self.callback = callback
+        self.callback_interval = callback_interval
+        self.lock = threading.Lock()
+        self.idle = threading.Condition(self.lock)  # notified whenever a tree-parallel iteration ends
+        self.n_active = 0  # tree-parallel iterations running
+        self.max_transpositions = max_transpositions
+        self.transpositions = {} if transpositions else None  # Zobrist key: node index
+        self.ponder_thread = None
+        self.stop_ponder = threading.Event()
+        self.set_node_limit(max_nodes, max_bytes)
+        self.recycle = recycle
+        self.n_recycled = 0  # nodes freed by recycle_nodes
+        self.resize_seconds_per_byte = 0.0  # time per byte of new node arrays in the last grow or compact
+        initial_capacity = min(initial_capacity, self.node_limit)
+        self.initial_capacity = initial_capacity
+        self.capacity = initial_capacity
+        for name, (dtype, shape, fill) in NODE_ARRAYS.items():
+            setattr(self, name, np.full((initial_capacity,) + shape, fill, dtype=dtype))
+        self.path = np.zeros(N_CELLS + 1, dtype=np.int32)
+        self.n_nodes = 0
+        self.n_iterations = 0
+        self.reset_stats()
+        self.stats = None  # SearchStats of the last get_best_action
+
+        root = Position.from_board(current_board, current_player)
+        self.add_node(-1, -1, current_player, root.bitboards, root.n_moves,
+                      root.is_terminal(PLAYER1) or root.is_terminal(PLAYER2))
+        self.key[0] = root.key
+        if solver and root.last_move_end_state() == GameState.IS_WIN:
+            self.proven[0] = 1
+        if self.transpositions is not None:
+            self.transpositions[root.key] = 0
+
+    @property
+    def rootnode(self):
+        return Node(self, 0)
+
+    def add_node(self, parent, action, player, bitboards, n_moves, is_terminal):
+        """Appends a node to the pool, growing the arrays if it is full.
+
+        Returns:
+            Int: index of the new node.
+        """
+        if self.n_nodes == self.capacity:
+            self.grow()
+        index = self.n_nodes
+        self.n_nodes += 1
+        self.parent[index] = parent
+        self.action[index] = action
+        self.player[index] = player
+        self.bitboards[index] = bitboards
+        self.n_moves[index] = n_moves
+        self.terminal[index] = is_terminal
+        self.unexpanded[index] = 0 if is_terminal else legal_columns(bitboards[0] | bitboards[1])
+        if parent >= 0:
+            self.children[parent, action] = index
+        return index
+
+    def set_node_limit(self, max_nodes=None, max_bytes=None):
+        """Sets self.node_limit from the max_nodes and max_bytes bounds described in __init__.
+        A limit below the nodes the tree already holds only stops it from expanding, or lets
+        the next recycle_nodes free nodes down to it."""
+        self.node_limit = np.iinfo(np.int32).max
+        if max_nodes:
+            self.node_limit = min(self.node_limit, max_nodes)
+        if max_bytes:
+            self.node_limit = min(self.node_limit, int(max_bytes // NODE_BYTES))
+
+    def grown_capacity(self, factor=2):
+        """Returns the capacity grow(factor) reallocates the node arrays to."""
+        return min(self.capacity * factor, max(self.node_limit, self.capacity + 1))
+
+    def grow(self, factor=2):
+        """Reallocates every node array with `factor` times the capacity, but at most
+        self.node_limit unless the arrays are already that large."""
+        start = time.perf_counter()
+        capacity = self.grown_capacity(factor)
+        for name, (dtype, shape, fill) in NODE_ARRAYS.items():
+            array = np.full((capacity,) + shape, fill, dtype=dtype)
+            array[:self.capacity] = getattr(self, name)
+            setattr(self, name, array)
+        self.capacity = capacity
+        self.high_water_bytes = max(self.high_water_bytes, self.memory_bytes())
+        self.resize_seconds_per_byte = (time.perf_counter() - start) / (capacity * NODE_BYTES)
+
+    def resize_bytes(self):
+        """Returns the bytes of the node arrays that the next iteration of search allocates and
+        copies into, by growing the arrays or, with self.recycle and a full tree, compacting
+        them in recycle_nodes; 0 if it needs no new arrays."""
+        if self.n_nodes >= self.node_limit:
+            return self.node_limit * NODE_BYTES if self.recycle else 0
+        if self.n_nodes >= self.capacity:
+            return self.grown_capacity() * NODE_BYTES
+        return 0
 
-    def search(self, node):
-        """Run one iteration of monte carlo tree search on given node.
+    def resize_fits(self, deadline):
+        """Returns False if the next iteration has to grow or compact the node arrays and that
+        would not end before `deadline` (a time.perf_counter value), at the time per byte the
+        last grow or compact took. A deadline check after the iteration would be too late,
+        as a single reallocation of a large tree can take longer than the time left."""
+        n_bytes = self.resize_bytes()
+        return n_bytes == 0 or time.perf_counter() + self.resize_seconds_per_byte * n_bytes < deadline
+
+    def find_node(self, board, player, max_depth=2):
+        """Looks for the node holding `board` with `player` to move among the root and its
+        descendants up to `max_depth` plies below it.
+
+        Returns:
+            Int: index of the node, or -1 if the position is not in that part of the tree.
+        """
+        position = Position.from_board(board, player)
+        frontier = np.zeros(1, dtype=np.int32)
+        for _ in range(max_depth + 1):
+            matches = frontier[
+                (self.bitboards[frontier, 0] == position.bitboards[0])
+                & (self.bitboards[frontier, 1] == position.bitboards[1])
+                & (self.player[frontier] == player)
+            ]
+            if len(matches):
+                return int(matches[0])
+            frontier = self.children[frontier].ravel()
+            frontier = frontier[frontier >= 0]
+        return -1
+
+    def reroot(self, node):
+        """Makes `node` the root of the tree. The subtree below it is compacted to the front of
+        new, smaller node arrays, keeping all of its statistics, and the rest of the tree is freed.
 
         Args:
-            node (Node): 
-        """
-        node = self.select()
-        result = self.simulate(node)
-        self.backpropogate(node, result)
-        
-    @njit()
-    def get_best_action(self):
+            node (int): index of the new root.
+        """
+        self.compact(node)
+
+    def recycle_nodes(self):
+        """Frees the least visited subtrees so that at most half of self.node_limit nodes are
+        left: only nodes with more visits than the (node_limit // 2)-th most visited one are
+        kept, along with the root. The actions leading to freed subtrees become unexpanded
+        again, so they can be grown anew, while the visits of their parents are kept.
+        """
+        visits = self.visits[:self.n_nodes]
+        threshold = np.partition(visits, len(visits) - self.node_limit // 2 - 1)[len(visits) - self.node_limit // 2 - 1]
+        keep = visits > threshold
+        keep[0] = True
+        n_nodes = self.n_nodes
+        self.high_water_nodes = max(self.high_water_nodes, n_nodes)
+        self.compact(0, keep)
+        self.n_recycled += n_nodes - self.n_nodes
+
+    def compact(self, node, keep=None):
+        """Moves `node` and the nodes reachable from it to the front of new node arrays, in
+        breadth first order with `node` at index 0, and frees the rest.
+
+        Args:
+            node (int): index of the new root.
+            keep (np.ndarray, optional): Mask over the nodes; nodes outside it are freed along
+                with everything only reachable through them, and the actions leading to them
+                become unexpanded. Defaults to None, keeping everything reachable.
+        """
+        start = time.perf_counter()
+        order = []
+        visited = np.zeros(self.n_nodes, dtype=np.bool_)
+        if keep is not None:
+            visited[~keep] = True
+        frontier = np.array([node], dtype=np.int32)
+        while len(frontier):  # breadth first, so parents come before their children
+            visited[frontier] = True
+            order.append(frontier)
+            frontier = self.children[frontier].ravel()
+            frontier = np.unique(frontier[frontier >= 0])
+            frontier = frontier[~visited[frontier]]
+        order = np.concatenate(order)
+
+        new_index = np.full(self.n_nodes + 1, -1, dtype=np.int32)  # the extra entry maps -1 to -1
+        new_index[order] = np.arange(len(order), dtype=np.int32)
+        n_nodes = len(order)
+        capacity = min(max(self.initial_capacity, 2 * n_nodes), max(self.node_limit, n_nodes))
+        for name, (dtype, shape, fill) in NODE_ARRAYS.items():
+            array = np.full((capacity,) + shape, fill, dtype=dtype)
+            array[:n_nodes] = getattr(self, name)[order]
+            setattr(self, name, array)
+        old_children = self.children[:n_nodes].copy()
+        self.children[:n_nodes] = new_index[old_children]
+        freed = (old_children >= 0) & (self.children[:n_nodes] < 0)
+        self.child_visits[:n_nodes][freed] = 0
+        self.child_wins[:n_nodes][freed] = 0
+        self.unexpanded[:n_nodes] |= (freed << np.arange(N_COLUMNS)).sum(axis=1).astype(np.uint8)
+        self.parent[:n_nodes] = new_index[self.parent[:n_nodes]]
+        self.parent[0] = -1
+        self.action[0] = -1
+        self.capacity = capacity
+        self.n_nodes = n_nodes
+        if self.transpositions is not None:
+            self.transpositions = {
+                key: int(new_index[index]) for key, index in self.transpositions.items() if new_index[index] >= 0
+            }
+        self.resize_seconds_per_byte = (time.perf_counter() - start) / (capacity * NODE_BYTES)
+
+    def bytes_per_node(self):
+        """Returns the memory of the node arrays divided by the number of allocated nodes."""
+        return sum(getattr(self, name).nbytes for name in NODE_ARRAYS) / self.capacity
+
+    def memory_bytes(self):
+        """Returns the memory of the node arrays."""
+        return sum(getattr(self, name).nbytes for name in NODE_ARRAYS)
+
+    def search(self, node=None):
+        """Run one iteration of monte carlo tree search from the root.
+
+        Args:
+            node (Node): Ignored, the search always starts at the root.
+        """
+        if self.n_nodes >= self.node_limit and self.recycle:
+            self.recycle_nodes()
+        start = time.perf_counter()
+        length = self.descend_path(self.path)
+        self.selection_time += time.perf_counter() - start
+        length = self.expand_leaf(self.path, length)
+        result = self.evaluate_leaf(self.path, length)
+        self.backpropagate_result(self.path, length, result)
+
+    def search_profiled(self):
+        """The same iteration as search, also timing the expansion, simulation and
+        backpropagation phases. Used instead of search when self.profile is set."""
+        if self.n_nodes >= self.node_limit and self.recycle:
+            self.recycle_nodes()
+        t0 = time.perf_counter()
+        length = self.descend_path(self.path)
+        t1 = time.perf_counter()
+        length = self.expand_leaf(self.path, length)
+        t2 = time.perf_counter()
+        result = self.evaluate_leaf(self.path, length)
+        t3 = time.perf_counter()
+        self.backpropagate_result(self.path, length, result)
+        t4 = time.perf_counter()
+        self.selection_time += t1 - t0
+        self.expansion_time += t2 - t1
+        self.simulation_time += t3 - t2
+        self.backpropagation_time += t4 - t3
+
+    def expand_leaf(self, path, length):
+        """Expands the last node of `path` unless it is terminal or proven, or the tree is full,
+        and appends the new node to the path.
+
+        Returns:
+            Int: the new length of the path.
+        """
+        leaf = path[length - 1]
+        if (not self.terminal[leaf] and self.proven[leaf] == 0 and self.unexpanded[leaf] != 0
+                and self.n_nodes < self.node_limit):
+            path[length] = self.expand(leaf)
+            length += 1
+        if length > self.max_depth:
+            self.max_depth = length
+        self.depth_sum += length
+        return length
+
+    def evaluate_leaf(self, path, length):
+        """Scores the last node of `path`: proven nodes by their result, after propagating it
+        with solve_path, and other nodes with self.rollouts_per_leaf random rollouts.
+
+        Returns:
+            Float: score for the root player, as returned by simulate.
+        """
+        leaf = path[length - 1]
+        if self.proven[leaf] != 0:
+            solve_path(path, length, self.proven, self.children, self.unexpanded)
+            return self.proven_result(leaf)
+        self.n_rollouts += self.rollouts_per_leaf
+        if self.rollouts_per_leaf > 1:
+            return self.simulate_batch(leaf, self.rollouts_per_leaf)
+        return self.simulate(leaf)
+
+    def descend_path(self, path, add_virtual_loss=0):
+        """Runs descend on this tree, writing the nodes it passes into `path`.
+
+        Returns:
+            Int: length of the path.
+        """
+        return descend(self.children, self.child_visits, self.child_wins, self.log_visits, self.virtual_loss,
+                       self.proven, self.terminal, self.unexpanded, self.exploration_const, path,
+                       add_virtual_loss)
+
+    def backpropagate_result(self, path, length, result, remove_virtual_loss=0):
+        """Runs backpropagate_path on this tree for the first `length` nodes of `path`."""
+        backpropagate_path(path, length, self.visits, self.wins, self.child_visits, self.child_wins,
+                           self.log_visits, self.children, self.virtual_loss, self.player,
+                           self.current_player, result, remove_virtual_loss)
+
+    def search_with_virtual_loss(self, path):
+        """One iteration of tree-parallel search, safe to run from several threads at once. Only
+        the expansion, which links a new node into the tree, runs under self.lock. The descent,
+        the rollouts and the backpropagation run in kernels that release the GIL and update the
+        node statistics with atomic_add, so they run in parallel in all threads. A virtual loss
+        on the path keeps the other threads off it until the result is in. The node arrays must
+        not be reallocated in the meantime, which search_threads ensures.
+
+        Args:
+            path (np.ndarray): Path buffer owned by the calling thread.
+        """
+        start = time.perf_counter()
+        length = self.descend_path(path, 1)
+        with self.lock:
+            self.selection_time += time.perf_counter() - start
+            expanded_length = self.expand_leaf(path, length)
+            leaf = path[expanded_length - 1]
+            if expanded_length > length:
+                add_virtual_loss(self.virtual_loss, leaf, 1)
+            length = expanded_length
+            result = None
+            if self.proven[leaf] != 0:
+                solve_path(path, length, self.proven, self.children, self.unexpanded)
+                result = self.proven_result(leaf)
+            else:
+                self.n_rollouts += self.rollouts_per_leaf
+        if result is None:
+            to_move = player_index(self.player[leaf])
+            sign = 1 if self.player[leaf] == self.current_player else -1
+            outcome = repeated_rollouts(int(self.bitboards[leaf, to_move]), int(self.bitboards[leaf, 1 - to_move]),
+                                        int(self.n_moves[leaf]), self.rollouts_per_leaf)
+            result = (sign * outcome + 1) / 2
+        self.backpropagate_result(path, length, result, 1)
+
+    def proven_result(self, node):
+        """Returns the score of proven `node` for the root player, as a rollout result."""
+        sign = 1 if self.player[node] != self.current_player else -1  # the root player moved into the node
+        return (sign * int(self.proven[node]) + 1) / 2
+
+    def search_threads(self, deadline=None):
+        """Tree-parallel search: self.n_threads threads run search_with_virtual_loss on this
+        tree until `deadline` (a time.perf_counter value), or without a deadline until
+        self.iterations iterations have been run between them.
+
+        Every iteration expands at most one node, so a thread only starts one while the node
+        arrays have a free slot for every running iteration. Otherwise it waits until the
+        running iterations have ended and grows the arrays, or with self.recycle and a full
+        tree frees nodes with recycle_nodes, with no other thread using them. The search ends
+        there instead if the reallocation would not be done by the deadline, see resize_fits.
+        """
+        remaining = [0 if deadline else self.iterations]
+
+        def start_iteration():
+            with self.lock:
+                while (self.n_nodes + self.n_active >= self.capacity
+                       and (self.capacity < self.node_limit or self.recycle)):
+                    if self.n_active > 0:
+                        self.idle.wait()
+                        continue
+                    if deadline and not self.resize_fits(deadline):
+                        return False
+                    if self.capacity < self.node_limit:
+                        self.grow()
+                    else:
+                        self.recycle_nodes()
+                if self.proven[0] != 0:
+                    return False
+                if deadline:
+                    if time.perf_counter() >= deadline:
+                        return False
+                elif remaining[0] <= 0:
+                    return False
+                else:
+                    remaining[0] -= 1
+                self.n_active += 1
+                return True
+
+        def worker():
+            path = np.zeros(N_CELLS + 1, dtype=np.int32)
+            while start_iteration():
+                try:
+                    self.search_with_virtual_loss(path)
+                finally:
+                    with self.lock:
+                        self.n_active -= 1
+                        self.idle.notify_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.n_threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def ponder(self, max_bytes):
+        """Keeps searching this tree in a background thread until stop_pondering is called or
+        the node arrays are full and growing them would allocate more than `max_bytes`.
+        Nothing else may use the tree in the meantime.
+
+        Args:
+            max_bytes (int): Bound on the memory of the node arrays while pondering.
+        """
+        self.stop_pondering()
+        self.stop_ponder.clear()
+
+        def may_expand():
+            if self.n_nodes < self.capacity or self.n_nodes >= self.node_limit:
+                return True  # expanding needs no new memory, or the tree is full and no longer expands
+            return self.grown_capacity() * NODE_BYTES <= max_bytes
+
+        def ponder_loop():
+            while not self.stop_ponder.is_set() and self.proven[0] == 0 and may_expand():
+                self.search()
+
+        self.ponder_thread = threading.Thread(target=ponder_loop, daemon=True)
+        self.ponder_thread.start()
+
+    def stop_pondering(self):
+        """Stops the thread started by ponder and waits for it to finish its last iteration."""
+        if self.ponder_thread is not None:
+            self.stop_ponder.set()
+            self.ponder_thread.join()
+            self.ponder_thread = None
+
+    def leader_is_decided(self, iterations_left):
+        """Returns True if the most visited root child keeps the most visits whatever the next
+        `iterations_left` iterations do, so that searching on cannot change the best action."""
+        child_visits = np.sort(self.child_visits[0])
+        return child_visits[-1] - child_visits[-2] > iterations_left
+
+    def get_best_action(self, deadline=None):
         """Runs iterations of the monte carlo tree search algorithm as defined by the MCTS class
         to build a tree search with win and visits stored in each node. After the iterative tree
         search, returns the child node of the root with the most visits.
-        
+
+        The deadline is checked after every iteration, and before an iteration that grows or
+        compacts the node arrays, see resize_fits. With self.early_stop, every
+        EARLY_STOP_INTERVAL iterations the search also stops if the runner-up can no longer catch
+        up with the leader in the remaining iterations, estimated from the iteration rate so far
+        when searching against the clock. Tree-parallel search runs to the end.
+
+        Args:
+            deadline (float, optional): time.perf_counter value to stop at. Defaults to
+                self.timeout seconds from now, or no deadline if self.timeout is False.
 
         Returns:
-            Int: An action from 0 to 6 to play on connect 4 board.
+            Int: An action from 0 to 6 to play on connect 4 board; the first legal column in
+                center-first order if no child of the root was expanded.
         """
-        if self.timeout:
-            timeout = time.time() + self.timeout
-            while time.time() < timeout:
-                self.search(self.rootnode)
+        start = time.perf_counter()
+        self.reset_stats()
+        start_visits = self.visits[0]
+        if deadline is None and self.timeout:
+            deadline = start + self.timeout
+        search = self.search_profiled if self.profile else self.search
+        if self.n_threads > 1:
+            self.search_threads(deadline)
+        elif deadline:
+            n_iterations = 0
+            while self.proven[0] == 0 and self.resize_fits(deadline):
+                search()
+                n_iterations += 1
+                if self.callback is not None and n_iterations % self.callback_interval == 0:
+                    self.callback(self.search_stats(start, start_visits))
+                now = time.perf_counter()
+                if now >= deadline:
+                    break
+                if self.early_stop and n_iterations % EARLY_STOP_INTERVAL == 0:
+                    rate = (self.visits[0] - start_visits) / (now - start)
+                    if self.leader_is_decided(rate * (deadline - now)):
+                        break
         elif self.iterations:
-            for _ in range(self.iterations):
-                self.search(self.rootnode)
-        
-        most_visits = -1
-        for action in self.rootnode.children:
-            child_visits = self.rootnode.children[action].visits
-            if child_visits > most_visits:
-                best_action = action
-                most_visits = child_visits
-        return best_action
-
-    @njit()
+            for iteration in range(self.iterations):
+                if self.proven[0] != 0:
+                    break
+                search()
+                if self.callback is not None and (iteration + 1) % self.callback_interval == 0:
+                    self.callback(self.search_stats(start, start_visits))
+                if (self.early_stop and iteration % EARLY_STOP_INTERVAL == 0
+                        and self.leader_is_decided(self.iterations - iteration - 1)):
+                    break
+        self.stats = self.search_stats(start, start_visits)
+
+        root_children = self.children[0]
+        if (root_children < 0).all():  # nothing was expanded, without iterations or time or at a terminal root
+            return center_first_column(legal_columns(int(self.bitboards[0, 0] | self.bitboards[0, 1])))
+        child_visits = np.where(root_children >= 0, self.child_visits[0], -1)
+        proven = np.where(root_children >= 0, self.proven[root_children], 0)
+        if (proven == 1).any():  # a proven win for the root player
+            return int(np.argmax(proven == 1))
+        if (child_visits[proven != -1] >= 0).any():  # avoid proven losses while there is another move
+            child_visits[proven == -1] = -1
+        return int(np.argmax(child_visits))
+
+    def reset_stats(self):
+        """Zeroes the counters behind search_stats, at the start of get_best_action."""
+        self.n_deduplicated = 0  # expansions that found their position in self.transpositions
+        self.high_water_nodes, self.high_water_bytes = self.n_nodes, self.memory_bytes()  # most nodes held and bytes allocated
+        self.n_rollouts = 0
+        self.max_depth = 0  # longest path and sum of the path lengths, counting the root
+        self.depth_sum = 0
+        self.selection_time = 0.0  # seconds per phase, only the selection unless self.profile
+        self.expansion_time = 0.0
+        self.simulation_time = 0.0
+        self.backpropagation_time = 0.0
+
+    def search_stats(self, start, start_visits):
+        """Returns the SearchStats of the search running since time.perf_counter() was `start`
+        and the root had `start_visits` visits."""
+        self.high_water_nodes = max(self.high_water_nodes, self.n_nodes)
+        self.n_iterations = int(self.visits[0] - start_visits)
+        return SearchStats(
+            iterations=self.n_iterations,
+            rollouts=self.n_rollouts,
+            elapsed=time.perf_counter() - start,
+            n_nodes=self.n_nodes,
+            high_water_nodes=self.high_water_nodes,
+            high_water_bytes=self.high_water_bytes,
+            max_depth=max(self.max_depth - 1, 0),  # path lengths count the root
+            mean_depth=self.depth_sum / self.n_iterations - 1 if self.n_iterations else 0.0,
+            root_visits=self.child_visits[0].astype(np.int64),
+            root_wins=self.child_wins[0].astype(np.float64),
+            root_proven=int(self.proven[0]),
+            deduplicated=self.n_deduplicated,
+            recycled=self.n_recycled,
+            selection_time=self.selection_time,
+            expansion_time=self.expansion_time,
+            simulation_time=self.simulation_time,
+            backpropagation_time=self.backpropagation_time,
+        )
+
     def select(self):
         """Successively selects the best child node of fully expanded nodes based off UCT formula 
         until a terminal node is reached. If a non-fully expanded node is encountered, select function
@@ -137,68 +1083,109 @@ class MCTS(object):
         Returns:
             Node: returns the node that was expanded or the best terminal child node.
         """
-        node = self.rootnode
-        while not node.is_terminal:
-            if len(node.unplayed_actions) == 0:
-                node = self.get_best_child(node)
-            else:
-                return self.expand(node)
-        return node
+        length = self.descend_path(self.path)
+        leaf = self.path[length - 1]
+        if not self.terminal[leaf] and self.proven[leaf] == 0:
+            return self.expand(Node(self, int(leaf)))
+        return Node(self, int(leaf))
 
     def expand(self, node):
         """Adds a random child node to an input node that has unplayed actions.
 
         Args:
-            node (Node): Input a node with valid unplayed actions. 
+            node (Node or int): Input a node with valid unplayed actions. 
+
+        Returns:
+            Node or int: Returns the child node that was added, as the same type as `node`.
+        """
+        index = node.index if isinstance(node, Node) else node
+        column = random_column(self.unexpanded[index])
+        if self.transpositions is not None:
+            key, existing = self.find_transposition(index, column)
+            if existing >= 0:
+                self.children[index, column] = existing
+                self.unexpanded[index] &= ~np.uint8(1 << column)
+                self.n_deduplicated += 1
+                return Node(self, existing) if isinstance(node, Node) else existing
+        if self.n_nodes == self.capacity:
+            self.grow()
+        child = self.n_nodes
+        expand_node(index, child, column, self.children, self.unexpanded, self.parent, self.action,
+                    self.player, self.bitboards, self.n_moves, self.terminal, self.proven, self.solver)
+        self.n_nodes += 1
+        if self.transpositions is not None:
+            self.key[child] = key
+            if len(self.transpositions) < self.max_transpositions:
+                self.transpositions[key] = child
+        return Node(self, child) if isinstance(node, Node) else child
+
+    def find_transposition(self, node, column):
+        """Computes the Zobrist key of the position after playing `column` at `node` and looks
+        it up in self.transpositions, before anything is written to the tree, so that a
+        position already in the tree is linked to `node` without ever taking a new slot.
 
         Returns:
-            Node: Returns the child node that was added.
+            Tuple[int, int]: the key, and the index of the node holding the position or -1.
         """
-        action = np.random.choice(node.unplayed_actions)
-        child_board = apply_player_action(node.board, action, node.player)
-        node.unplayed_actions = node.unplayed_actions[node.unplayed_actions != action]  # remove played action from node.unplayed_actions
-        child_node = Node(child_board, node, other_player(node.player))
-        node.children[action] = child_node  # expand child into node
-        return child_node
+        mover = player_index(self.player[node])
+        bitboards = self.bitboards[node].copy()
+        mask = int(bitboards[0] | bitboards[1])
+        move = (mask + BOTTOM_CELLS[column]) & COLUMN_MASKS[column]
+        bitboards[mover] |= move
+        key = int(self.key[node]) ^ ZOBRIST_BITS[mover][int(move).bit_length() - 1] ^ ZOBRIST_SIDE
+        existing = self.transpositions.get(key, -1)
+        if existing >= 0 and (self.bitboards[existing] == bitboards).all():
+            return key, existing
+        return key, -1
 
-    @njit()
     def simulate(self, node):
         """ Runs a random rollout to a terminal state of the board.
 
         Args:
-            node (Node): Takes in a node to simulate a random game off of.
+            node (Node or int): Takes in a node to simulate a random game off of.
+
+        Returns:
+            Float: 1 if game was a win for the root node player, 0.5 for a draw, otherwise 0.
+        """
+        index = node.index if isinstance(node, Node) else node
+        return simulate_node(self.bitboards, self.player, self.n_moves, index, self.current_player)
+
+    def simulate_batch(self, node, n_rollouts):
+        """Runs `n_rollouts` random rollouts from a node as one batch.
+
+        Args:
+            node (Node or int): Takes in a node to simulate random games off of.
+            n_rollouts (int): Number of rollouts.
 
         Returns:
-            Int: 1 if game was a win for the root node player, otherwise 0.
-        """
-        board = node.board
-        player = node.player
-        while len(get_valid_actions(board)) != 0 and not is_terminal_board(
-            board, other_player(player)
-        ):
-            action = np.random.choice(get_valid_actions(board))
-            board = apply_player_action(board, action, player)
-            player = other_player(player)
-        result = (
-            1 if check_end_state(board, self.current_player) is GameState.IS_WIN else 0
+            Float: mean score of the rollouts for the root node player (1 win, 0.5 draw, 0 loss).
+        """
+        index = node.index if isinstance(node, Node) else node
+        to_move = player_index(self.player[index])
+        outcomes = batch_rollouts(
+            np.full(n_rollouts, self.bitboards[index, to_move]),
+            self.bitboards[index, 1 - to_move], self.n_moves[index]
         )
-        return result
+        if self.player[index] != self.current_player:
+            outcomes = -outcomes
+        return (outcomes.mean() + 1) / 2
 
-    @njit()
     def backpropogate(self, node, result):
-        """Update tree statistics
+        """Update tree statistics along the parents of `node`. With transpositions a node can
+        have several parents and only the one it was first expanded from is followed; search
+        backpropagates along the path it actually took instead.
 
         Args:
             node (Node): node to backpropogate from
-            result (Int): result of random rollout
+            result (Float): result of random rollout for the root player
         """
+        path = []
         while node is not None:
-            node.visits += 1
-            if other_player(node.player) == self.current_player:
-                node.wins += result
+            path.append(node.index)
             node = node.parent
+        path = np.array(path, dtype=np.int32)
+        self.backpropagate_result(path, len(path), result)
 
-    @njit()
     def get_best_child(self, node):
         """Returns best child of given node as per the UCT formula.
 
@@ -208,16 +1195,94 @@ class MCTS(object):
         Returns:
             Node: best child node of the input node.
         """
-        best_score = np.NINF
-        for child in node.children.values():
-            move_score = child.wins / child.visits + self.exploration_const * np.sqrt(
-                np.log(node.visits / child.visits)
-            )
-            if move_score > best_score:
-                best_score = move_score
-                best_child = child
+        return Node(self, int(uct_best_child(self.children, self.child_visits, self.child_wins, self.log_visits,
+                                             self.virtual_loss, self.proven, node.index, self.exploration_const)))
+
+
+class MCTSSavedState(SavedState):
+    def __init__(self, tree, time_manager=None, stats=None):
+        """Saved state of the MCTS agent between its moves.
+
+        Args:
+            tree (MCTS): Search tree of the last move, rooted at the position it was asked to
+                play, or at the position after its move while pondering. None after a
+                root-parallel search, whose trees stay in the workers.
+            time_manager (TimeManager, optional): Time budget of the game, if it has one.
+            stats (SearchStats, optional): Statistics of the search for the last move.
+        """
+        self.tree = tree
+        self.time_manager = time_manager
+        self.stats = stats
+
+    def stop(self):
+        if self.tree is not None:
+            self.tree.stop_pondering()
+
+
+def root_statistics(board, player, end_time, iterations, seed, options):
+    """Grows an independent MCTS tree from `board` and returns the statistics of its root
+    children. Runs inside the worker processes of root_parallel_search.
+
+    Args:
+        end_time (float): time.time() value to stop at, as time.perf_counter values of
+            different processes cannot be compared, or None to run `iterations` iterations.
+        options (dict): Other keyword arguments of MCTS.
 
-        return best_child
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: visits, wins and proven results of the 7
+            root children, 0 where a child is missing.
+    """
+    seed_random(seed)
+    timeout = max(end_time - time.time(), MIN_WORKER_TIME) if end_time is not None else False
+    tree = MCTS(player, board, iterations, timeout, **options)
+    tree.get_best_action()
+    children = tree.children[0]
+    proven = np.where(children >= 0, tree.proven[children], 0)
+    return tree.child_visits[0].astype(np.int64), tree.child_wins[0].astype(np.float64), proven
+
+
+def root_parallel_search(board, player, n_workers, timeout=4, iterations=False,
+                         exploration_const=1 / np.sqrt(2), rollouts_per_leaf=1, deadline=None, **options):
+    """Root-parallel MCTS: every worker of a persistent process pool grows its own tree from
+    the same root with its own random seed. At the deadline the visit and win counts of the
+    root children are summed over the workers and the most visited action is returned,
+    unless a worker proved a win, and avoiding children a worker proved to be lost.
+
+    Args:
+        board (np.ndarray): Board at the root.
+        player (BoardPiece): Player to move at the root.
+        n_workers (int): Number of worker processes.
+        timeout (float, optional): Seconds to search for, from now. Defaults to 4.
+        iterations (int, optional): Iterations per worker, used when timeout is False. Defaults to False.
+        deadline (float, optional): time.perf_counter value to stop at instead of the timeout.
+            The workers get the time left when they start, so the time spent sending them the
+            task is not added on top. Defaults to None.
+        options: Other keyword arguments of MCTS for the trees of the workers, such as solver,
+            early_stop, transpositions or max_bytes.
+
+    Returns:
+        Tuple[int, np.ndarray, np.ndarray]: best action and the merged visits and wins of the root children.
+    """
+    if deadline is None and timeout:
+        deadline = time.perf_counter() + timeout
+    end_time = time.time() + (deadline - time.perf_counter()) if deadline is not None else None
+    options = dict(options, exploration_const=exploration_const, rollouts_per_leaf=rollouts_per_leaf)
+    pool = get_worker_pool(n_workers, warm_up_mcts)
+    seeds = np.random.SeedSequence().generate_state(n_workers)
+    futures = [pool.submit(root_statistics, board, player, end_time, iterations, int(seed), options)
+               for seed in seeds]
+    results = [future.result() for future in futures]
+    visits = np.sum([result[0] for result in results], axis=0)
+    wins = np.sum([result[1] for result in results], axis=0)
+    proven = np.stack([result[2] for result in results])
+    if (proven == 1).any():  # a proven win for the root player
+        return int(np.argmax((proven == 1).any(axis=0))), visits, wins
+    if not visits.any():  # no worker expanded anything
+        return center_first_column(legal_columns(int(Position.from_board(board, player).mask))), visits, wins
+    lost = (proven == -1).any(axis=0)
+    if (visits[~lost] > 0).any():  # some action is not proven lost
+        return int(np.argmax(np.where(lost, -1, visits))), visits, wins
+    return int(np.argmax(visits)), visits, wins
 
 
 def generate_move_mcts(
@@ -226,20 +1291,141 @@ def generate_move_mcts(
     saved_state: Optional[SavedState],
     timeout=4,
     iterations=False,
+    reuse_tree=True,
+    rollouts_per_leaf=1,
+    n_workers=1,
+    n_threads=1,
+    transpositions=False,
+    ponder=False,
+    ponder_max_bytes=1 << 26,
+    game_time=None,
+    early_stop=True,
+    max_bytes=None,
+    recycle=False,
+    solver=True,
+    exploration_const=1 / np.sqrt(2),
+    profile=False,
+    callback=None,
+    callback_interval=1000,
+    opening_book: Union[bool, OpeningBook, None] = None,
+    solver_empty_cells=SOLVER_EMPTY_CELLS,
 ) -> Tuple[PlayerAction, Optional[SavedState]]:
-    """Returns best action as defined by MCTS parameters.
+    """Returns best action as defined by MCTS parameters. If `saved_state` holds the tree of
+    our previous move and the current board is in it (our move followed by the opponent's
+    reply), the search continues on that subtree instead of starting from scratch.
 
     Args:
         board (np.ndarray): current state of the board to be played into.
         player (BoardPiece): current player to place a piece
-        saved_state (Optional[SavedState]): not used
+        saved_state (Optional[SavedState]): MCTSSavedState of the previous move, or None.
         iterations (int, optional): Number of MCTS iterations. Defaults to 1000. 
         timeout (float, optional): Seconds until search times out. Defaults to 4.
+        reuse_tree (bool, optional): Continue on the subtree of the saved tree. Defaults to True.
+        rollouts_per_leaf (int, optional): Random games played per new leaf, see MCTS. Defaults to 1.
+        n_workers (int, optional): With more than one, search with root_parallel_search on that
+            many processes instead, with the same solver, early_stop, transpositions, max_bytes
+            and recycle options; the trees stay in the workers and are not reused. Defaults to 1.
+        n_threads (int, optional): Threads searching the one tree with virtual loss, see
+            MCTS.search_threads. Defaults to 1.
+        transpositions (bool, optional): Search a DAG that shares the nodes of transposed
+            positions, see MCTS. Only used for a new tree; a reused tree keeps its setting.
+            Defaults to False.
+        ponder (bool, optional): After choosing the move, reroot the tree on it and keep
+            searching the opponent's replies in the background (see MCTS.ponder) until the next
+            call, or until saved_state.stop() is called. Defaults to False.
+        ponder_max_bytes (int, optional): Memory of the node arrays that pondering may not
+            grow beyond, see MCTS.ponder. Defaults to 2**26, 64 MiB.
+        game_time (float, optional): Seconds for all of our moves in this game. A TimeManager
+            kept in the saved state then sets the timeout of every move, and the time moves
+            actually take, including tree reuse, is taken off the budget. Defaults to None.
+        early_stop (bool, optional): Return as soon as the best action cannot change any
+            more, see MCTS.get_best_action. Defaults to True.
+        max_bytes (int, optional): Memory bound of the tree, see MCTS; a reused tree gets the
+            new bound. Defaults to None.
+        recycle (bool, optional): Free the least visited subtrees when the tree is full
+            instead of only running rollouts, see MCTS. Defaults to False.
+        solver (bool, optional): Prove wins and losses and stop once the root is proven, see
+            MCTS. Defaults to True.
+        exploration_const (float, optional): Weight of the UCB1 exploration term for this
+            search. Defaults to 1/np.sqrt(2).
+        profile (bool, optional): Time every phase of the search, see MCTS. Defaults to False.
+        callback (callable, optional): Called with the SearchStats so far every
+            `callback_interval` iterations, see MCTS. Defaults to None.
+        callback_interval (int, optional): Iterations between callback calls. Defaults to 1000.
+        opening_book (OpeningBook, optional): Book whose positions are played without a search,
+            True for the default book if it has been built (see agents.opening_book), or
+            False or None for no book. A tree saved for the position is kept for the next
+            move. Defaults to None.
+        solver_empty_cells (int, optional): Positions with at most this many empty cells are
+            solved exactly with agents.solver instead of searched. Defaults to SOLVER_EMPTY_CELLS.
 
     Returns:
-        Tuple[PlayerAction, Optional[SavedState]]: A tuple of the best action as per MCTS and saved state which is not used currently.
+        Tuple[PlayerAction, Optional[SavedState]]: A tuple of the best action as per MCTS and an
+            MCTSSavedState with the search tree and the SearchStats of the search in `stats`.
     """
-    mcts_search = MCTS(player, board, iterations, timeout)
-    action = mcts_search.get_best_action()
+    start = time.perf_counter()
+    time_manager = None
+    if isinstance(saved_state, MCTSSavedState):
+        saved_state.stop()
+        time_manager = saved_state.time_manager
+    if game_time and time_manager is None:
+        time_manager = TimeManager(game_time, solved_empty_cells=solver_empty_cells)
+    if time_manager is not None:
+        timeout = time_manager.move_time(int(np.count_nonzero(board)))
+    deadline = start + timeout if timeout else None
+
+    mcts_search = None
+    if reuse_tree and isinstance(saved_state, MCTSSavedState) and saved_state.tree is not None:
+        mcts_search = saved_state.tree
+        node = mcts_search.find_node(board, player)
+        if node >= 0 and mcts_search.current_player == player:
+            mcts_search.reroot(node)
+            mcts_search.timeout = timeout
+            mcts_search.iterations = iterations
+            mcts_search.rollouts_per_leaf = rollouts_per_leaf
+            mcts_search.n_threads = n_threads
+            mcts_search.early_stop = early_stop
+            mcts_search.recycle = recycle
+            mcts_search.solver = solver
+            mcts_search.set_node_limit(max_bytes=max_bytes)
+            mcts_search.exploration_const = exploration_const
+            mcts_search.profile = profile
+            mcts_search.callback = callback
+            mcts_search.callback_interval = callback_interval
+        else:
+            mcts_search = None
+
+    action = book_move(opening_book, board, player)
+    if action is None and N_CELLS - np.count_nonzero(board) <= solver_empty_cells:
+        action = PlayerAction(solve_move(Position.from_board(board, player))[0])
+    stats = None
+    if action is None and n_workers > 1:
+        action, visits, wins = root_parallel_search(board, player, n_workers, timeout, iterations,
+                                                    exploration_const, rollouts_per_leaf, deadline,
+                                                    solver=solver, early_stop=early_stop,
+                                                    transpositions=transpositions, max_bytes=max_bytes,
+                                                    recycle=recycle)
+        elapsed = time.perf_counter() - start
+        if time_manager is not None:
+            time_manager.spend(elapsed)
+        stats = SearchStats(iterations=int(visits.sum()), rollouts=int(visits.sum()) * rollouts_per_leaf,
+                            elapsed=elapsed, n_nodes=0, high_water_nodes=0, high_water_bytes=0, max_depth=0,
+                            mean_depth=0.0, root_visits=visits, root_wins=wins, root_proven=0)
+        return PlayerAction(action), MCTSSavedState(None, time_manager, stats)
+    if action is None:
+        if mcts_search is None:
+            mcts_search = MCTS(player, board, iterations, timeout, exploration_const,
+                               rollouts_per_leaf=rollouts_per_leaf, n_threads=n_threads, transpositions=transpositions, early_stop=early_stop,
+                               max_bytes=max_bytes, recycle=recycle, solver=solver, profile=profile,
+                               callback=callback, callback_interval=callback_interval)
+        action = mcts_search.get_best_action(deadline)
+        stats = mcts_search.stats
 
-    return action, saved_state
+    if mcts_search is not None:  # None after a book or solver move without a saved tree
+        child = mcts_search.children[0, action]
+        if ponder and child >= 0 and not mcts_search.terminal[child]:
+            mcts_search.reroot(child)
+            mcts_search.ponder(ponder_max_bytes)
+    if time_manager is not None:
+        time_manager.spend(time.perf_counter() - start)
+    return PlayerAction(action), MCTSSavedState(mcts_search, time_manager, stats)
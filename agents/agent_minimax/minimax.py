@@ -1,12 +1,11 @@
-disable_jit = True
-if disable_jit:
-    import os
-    os.environ['NUMBA_DISABLE_JIT'] = '1'
-
+import itertools
+import time
 import numpy as np
-from numba import njit
+from collections import Counter
 from agents.common import *
-from typing import Callable, Optional, Tuple
+from agents.opening_book import OpeningBook, book_move
+from agents.solver import SOLVER_EMPTY_CELLS, solve_move, warm_up_solver
+from typing import Callable, Optional, Tuple, Union
 
 
 def sorted_valid_columns(board: np.ndarray) -> np.ndarray:
@@ -17,57 +16,77 @@ def sorted_valid_columns(board: np.ndarray) -> np.ndarray:
     """
     valid_columns = np.where(board[-1, :] == NO_PLAYER)[
         0]  # check the top row of the board to see where there are open spaces
-    mid = int(np.ceil(len(valid_columns) / 2))
-    sorted_valid = np.empty(len(valid_columns))
-    sorted_valid[0::2] = np.flip(
-        valid_columns[:mid]
-    )  # construct array that is sequentially sorted from inside to outside
-    sorted_valid[1::2] = valid_columns[mid:]
+    return np.array(center_first(valid_columns.tolist()), dtype=np.int8)
 
-    return sorted_valid.astype(np.int8)
+
+def center_first(valid_columns: list) -> list:
+    """
+    Returns the ascending list `valid_columns` reordered from its middle to its outside.
+    """
+    mid = (len(valid_columns) + 1) // 2
+    sorted_valid = [None] * len(valid_columns)
+    sorted_valid[0::2] = valid_columns[:mid][::-1]  # construct list that is sequentially sorted from inside to outside
+    sorted_valid[1::2] = valid_columns[mid:]
+    return sorted_valid
 
 
-@njit()
-def connected_n(
-    board: np.ndarray,
-    player: BoardPiece,
-    n: BoardPiece,
-    num_rows=BoardPiece(6),
-    num_columns=BoardPiece(7)) -> np.int8:
+def connected_n(board: np.ndarray, player: BoardPiece, n: BoardPiece) -> np.int8:
     """
     Returns number of unique possibilities of 4 spaces in a row that could become four in a row which currently have
     n of the current player's pieces. This function breaks down the game board into all possible vertical, horizontal, 
     diagonal and off-diagonal runs of four spaces. Given a number n and the current board, this function counts 
     the runs that has the player's pieces n times and the other positions have no player. 
     """
-    count_n = 0
+    return count_windows(board_to_bitboard(board, player),
+                         board_to_bitboard(board, other_player(player)), n)
+
+
+WINDOW_MASKS = np.array([
+    sum(1 << (start + k * shift) for k in range(4))
+    for shift in DIRECTION_SHIFTS
+    for start in range(N_COLUMNS * BITBOARD_HEIGHT - 3 * shift)
+    if sum(1 << (start + k * shift) for k in range(4)) & ~BOARD_MASK == 0
+], dtype=np.int64)  # bitboard masks of the 69 runs of four cells that lie on the board
+
 
-    # initialize connect 4 possibilities
-    horizontal_kernel = np.ones((1, 4), dtype=np.int8)
-    vertical_kernel = np.ones((4, 1), dtype=np.int8)
-    diagonal_kernel = np.eye(4, dtype=np.int8)
-    off_diagonal_kernel = np.eye(4, dtype=np.int8)[::-1]
-    kernels = [
-        vertical_kernel, horizontal_kernel, off_diagonal_kernel,
-        diagonal_kernel
-    ]
-
-    for kernel in kernels:
-        kernel_width = kernel.shape[1]
-        kernel_height = kernel.shape[0]
-        for i in range(num_rows - kernel_height + 1):  # loop through rows such that kernel fits in the board
-            for j in range(num_columns - kernel_width + 1):  # loop through columns such that kernel fits
-                sample_array = board[i:i + kernel_height, j:j + kernel_width][
-                    np.where(kernel)]  # get all possible runs of 4
-                if (np.sum(
-                        sample_array[sample_array == player]
-                ) == player * n) and (
-                        len(sample_array[sample_array == NO_PLAYER]) == 4 - n
-                ):  # check if player is in sample n times and connect 4 still possible
-                    count_n += 1
+@jit
+def count_windows(bitboard: int, other_bitboard: int, n: int) -> int:
+    """
+    Bitboard kernel of connected_n: counts the runs of four cells in WINDOW_MASKS that hold
+    n pieces of `bitboard` and none of `other_bitboard`.
+    """
+    count_n = 0
+    for window in WINDOW_MASKS:
+        window = int(window)
+        if not (window & other_bitboard) and count_bits(window & bitboard) == n:
+            count_n += 1
     return count_n
 
 
+@jit
+def window_counts(bitboard: int, other_bitboard: int):
+    """
+    Counts the runs of four cells in WINDOW_MASKS that hold two, three and four pieces of one
+    player and none of the other, for both players in one pass over the table. Returns
+    (twos, threes, fours, other_twos, other_threes, other_fours), where the first three count
+    runs of `bitboard` and the last three runs of `other_bitboard`. Fours are four in a row.
+    """
+    twos = threes = fours = other_twos = other_threes = other_fours = 0
+    for window in WINDOW_MASKS:
+        window = int(window)
+        n_own = count_bits(window & bitboard)
+        n_other = count_bits(window & other_bitboard)
+        if n_other == 0:
+            twos += n_own == 2
+            threes += n_own == 3
+            fours += n_own == 4
+        elif n_own == 0:
+            other_twos += n_other == 2
+            other_threes += n_other == 3
+            other_fours += n_other == 4
+    return twos, threes, fours, other_twos, other_threes, other_fours
+
+
 def heuristic(board: np.ndarray, player: BoardPiece,
               maximizingPlayer: bool) -> np.int8:
     """
@@ -76,28 +95,81 @@ def heuristic(board: np.ndarray, player: BoardPiece,
     absolute score. Next, the heuristic prioritizes a high number of streaks of 3 and subsequently streaks 
     of 2 given by the connected_n function.
     """
-    score = 0
-    other_player = PLAYER1 if player == PLAYER2 else PLAYER2
+    score = heuristic_bitboards(board_to_bitboard(board, player),
+                                board_to_bitboard(board, other_player(player)))
+    return score if maximizingPlayer else -score
+
+
+@jit
+def heuristic_bitboards(bitboard: int, other_bitboard: int) -> float:
+    """
+    Bitboard kernel of heuristic: the score of the position for the owner of `bitboard`.
+    """
+    twos, threes, fours, other_twos, other_threes, other_fours = window_counts(bitboard, other_bitboard)
+    score = 0.0
 
-    if check_end_state(board, player) == GameState.IS_WIN:
+    if fours > 0:
         score = 1e15
-    else:  # if win condition exists, don't check other possibilities
-        connected_threes = connected_n(board, player, 3)
-        if connected_threes > 0:
-            score += 2e8 * connected_threes  #  prioritize connected 3 streaks with multiple options for connected 4
-        else:
-            score += 1e5 * connected_n(board, player, 2)
+    elif threes > 0:  # if win condition exists, don't check other possibilities
+        score += 2e8 * threes  #  prioritize connected 3 streaks with multiple options for connected 4
+    else:
+        score += 1e5 * twos
 
-    if check_end_state(board, other_player) == GameState.IS_WIN:
+    if other_fours > 0:
         score = -1e14
-    else: # if lose condition exists, don't check other possibilities
-        connected_threes_other = connected_n(board, other_player, 3)
-        if connected_threes_other > 0:
-            score -= 1e8 * connected_threes_other
-        else:
-            score -= 1e5 * connected_n(board, other_player, 2)
+    elif other_threes > 0:  # if lose condition exists, don't check other possibilities
+        score -= 1e8 * other_threes
+    else:
+        score -= 1e5 * other_twos
+
+    return score
 
-    return score if maximizingPlayer else -score
+
+@jit
+def heuristic_bitboards_batch(bitboards: np.ndarray, other_bitboards: np.ndarray) -> np.ndarray:
+    """
+    Batch kernel of heuristic_bitboards: the scores of the positions in the int64 arrays
+    `bitboards` and `other_bitboards` for the owners of `bitboards`, in one call.
+    """
+    scores = np.empty(len(bitboards))
+    for i in range(len(bitboards)):
+        scores[i] = heuristic_bitboards(int(bitboards[i]), int(other_bitboards[i]))
+    return scores
+
+
+def heuristic_batch(boards: np.ndarray, player: BoardPiece, maximizingPlayer: bool = True) -> np.ndarray:
+    """
+    Returns heuristic of every board in the stack `boards` of shape (N, 6, 7) for `player`
+    as one array, scored by a single heuristic_bitboards_batch call.
+    """
+    bitboards = ((boards == player) * CELL_BITS).sum(axis=(1, 2))
+    other_bitboards = ((boards == other_player(player)) * CELL_BITS).sum(axis=(1, 2))
+    scores = heuristic_bitboards_batch(bitboards, other_bitboards)
+    return scores if maximizingPlayer else -scores
+
+
+@jit
+def child_scores(bitboard: int, other_bitboard: int, mask: int) -> np.ndarray:
+    """
+    Returns the scores for the owner of `bitboard`, who is to move, of the positions after
+    they drop a piece into each column, as negamax scores leaves, from one
+    heuristic_bitboards_batch call. Entries of full columns are meaningless.
+    """
+    children = np.empty(N_COLUMNS, dtype=np.int64)
+    for column in range(N_COLUMNS):
+        children[column] = bitboard | ((mask + (1 << (column * BITBOARD_HEIGHT))) & column_mask(column))
+    return -heuristic_bitboards_batch(np.full(N_COLUMNS, other_bitboard, dtype=np.int64), children)
+
+
+def warm_up_minimax(board: np.ndarray = None, player: BoardPiece = PLAYER1):
+    """
+    Compiles the nopython kernels used by the minimax agent, or loads them from the on-disk
+    cache. Takes the arguments of the `init` hooks of main.human_vs_agent, which are ignored.
+    """
+    warm_up_jit()
+    heuristic_bitboards(0, 0)
+    child_scores(0, 0, 0)
+    warm_up_solver()
 
 
 def is_terminal_board(board: np.ndarray, player: BoardPiece) -> bool:
@@ -109,61 +181,515 @@ def is_terminal_board(board: np.ndarray, player: BoardPiece) -> bool:
     else:
         return False
 
-@njit()
+EXACT, LOWER_BOUND, UPPER_BOUND = 0, 1, 2  # bound types of TranspositionTable entries
+
+
+_TABLE_IDS = itertools.count()
+
+
+class TranspositionTable:
+    """
+    Fixed size hash table of alpha-beta search results, indexed by the low bits of the Zobrist
+    key of the position (Position.key) and stored as parallel arrays. Each entry holds the
+    remaining search depth, the value for the player to move, whether the value is exact or a
+    lower or upper bound, and the best move found. A new result always replaces the entry in
+    its slot.
+    """
+
+    def __init__(self, size: int = 1 << 20):
+        """
+        Args:
+            size: Number of entries, rounded down to a power of two.
+        """
+        size = 1 << (int(size).bit_length() - 1)
+        self.index_mask = size - 1
+        self.keys = np.zeros(size, dtype=np.uint64)
+        self.depths = np.full(size, -1, dtype=np.int8)  # -1 marks an empty slot
+        self.values = np.zeros(size, dtype=np.float64)
+        self.flags = np.zeros(size, dtype=np.int8)
+        self.moves = np.full(size, -1, dtype=np.int8)
+        self.n_stores = 0
+        self.table_id = next(_TABLE_IDS)  # tells the worker tables of root_split_search which table they follow
+
+    def probe(self, key: int):
+        """
+        Returns the (depth, value, flag, move) entry stored for `key`, or None.
+        """
+        index = key & self.index_mask
+        if self.depths[index] < 0 or int(self.keys[index]) != key:
+            return None
+        return int(self.depths[index]), float(self.values[index]), int(self.flags[index]), int(self.moves[index])
+
+    def clear(self):
+        self.depths[:] = -1
+        self.moves[:] = -1
+        self.n_stores = 0
+
+    def store(self, key: int, depth: int, value: float, flag: int, move: int):
+        index = key & self.index_mask
+        self.keys[index] = key
+        self.depths[index] = depth
+        self.values[index] = value
+        self.flags[index] = flag
+        self.moves[index] = move
+        self.n_stores += 1
+
+    def nbytes(self) -> int:
+        return self.keys.nbytes + self.depths.nbytes + self.values.nbytes + self.flags.nbytes + self.moves.nbytes
+
+
+class SearchCounters:
+    """
+    Counts of one alpha-beta search: nodes visited, and transposition table probes that found
+    an entry and that cut the search off. For the nodes that searched their moves, the
+    counts by remaining depth of how many there were, how many failed high and how many of
+    those failed high on the first move searched measure the move ordering, and re_searches
+    counts the null-window searches that had to be repeated with the full window.
+    """
+
+    def __init__(self):
+        self.nodes = 0
+        self.table_hits = 0
+        self.table_cutoffs = 0
+        self.interior_nodes = Counter()
+        self.cutoffs = Counter()
+        self.first_move_cutoffs = Counter()
+        self.re_searches = 0
+
+    def cutoff_rates(self) -> dict:
+        """
+        Returns {remaining depth: (interior nodes, share of them that failed high, share of
+        the fail-highs that came from the first move)}.
+        """
+        return {
+            depth: (nodes, self.cutoffs[depth] / nodes,
+                    self.first_move_cutoffs[depth] / self.cutoffs[depth] if self.cutoffs[depth] else 0.0)
+            for depth, nodes in sorted(self.interior_nodes.items())
+        }
+
+
+class MoveOrdering:
+    """
+    Dynamic move ordering of a search. Moves are searched in the order: the best move of
+    the transposition table entry, the two killer moves of the ply, which are the last two
+    moves that failed high at that distance from the root, and then the other moves by
+    their history score, the sum of depth ** 2 over the fail-highs of the same player
+    dropping a piece into the same cell. Ties keep the center-first order. The killers and
+    the history carry over between the iterations of iterative deepening.
+    """
+
+    def __init__(self, killers: bool = True, history: bool = True):
+        """
+        Args:
+            killers: Whether to search the killer moves early.
+            history: Whether to sort by history score.
+        """
+        self.use_killers = killers
+        self.use_history = history
+        self.killers = [[-1, -1] for _ in range(N_CELLS + 1)]
+        self.history = [[0] * (N_COLUMNS * BITBOARD_HEIGHT) for _ in range(2)]
+
+    def order(self, position: Position, ply: int, table_move: Optional[int]) -> list:
+        """
+        Returns the valid moves of `position`, which is `ply` moves from the root, in search order.
+        """
+        moves = center_first(position.valid_actions())
+        if self.use_history:
+            history, heights = self.history[player_index(position.player)], position.heights
+            moves.sort(key=lambda move: -history[move * BITBOARD_HEIGHT + heights[move]])
+        first = [table_move] + self.killers[ply] if self.use_killers else [table_move]
+        for move in reversed(first):
+            if move in moves:
+                moves.remove(move)
+                moves.insert(0, move)
+        return moves
+
+    def fail_high(self, position: Position, ply: int, move: int, depth: int):
+        """
+        Records that `move` of the player to move in `position`, searched to `depth`, failed high.
+        """
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        self.history[player_index(position.player)][move * BITBOARD_HEIGHT + position.heights[move]] += depth * depth
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside alphabeta_position when the deadline of the search has passed.
+    """
+
+
+WIN_SCORE = 1e14  # heuristic scores at least this large in absolute value come from a finished game
+
+
 def alphabeta(board: np.ndarray,
               player: BoardPiece,
               depth: np.int8,
               maximizingPlayer=True,
               alpha=np.NINF,
-              beta=np.PINF) -> np.int8:
+              beta=np.PINF,
+              table: Optional[TranspositionTable] = None,
+              counters: Optional[SearchCounters] = None,
+              ordering: Optional[MoveOrdering] = None,
+              batch: bool = JIT_ENABLED) -> np.int8:
     """
     Returns the best possible action as defined by a heuristic function and checks moves at
     inner columns first and outside moves last. The minimax agent employs alpha-beta pruning 
-    for efficiency of search.
+    for efficiency of search. The search itself runs on the bitboard Position of `board`.
     """
+    return alphabeta_position(Position.from_board(board, player), depth,
+                              maximizingPlayer, alpha, beta, table, counters, ordering=ordering, batch=batch)
 
-    valid_actions = sorted_valid_columns(board)
-    best_action = None
-    other_player = PLAYER1 if player == PLAYER2 else PLAYER2  # establish player and opponent
 
-    if (depth == 0) or (is_terminal_board(board, player)):
-        return -1, heuristic(board, player, maximizingPlayer)
+def alphabeta_position(position: Position,
+                       depth: int,
+                       maximizingPlayer=True,
+                       alpha=np.NINF,
+                       beta=np.PINF,
+                       table: Optional[TranspositionTable] = None,
+                       counters: Optional[SearchCounters] = None,
+                       deadline: Optional[float] = None,
+                       first_move: Optional[int] = None,
+                       ordering: Optional[MoveOrdering] = None,
+                       batch: bool = JIT_ENABLED):
+    """
+    Alpha-beta search of alphabeta on a bitboard Position, with position.player to move, as
+    the maximizing or the minimizing player. Returns (action, value) with the value for the
+    maximizing player.
+
+    The search runs in negamax. The root moves are searched in center-first order, except
+    that `first_move` goes first, so that ties between moves are broken the same way whatever
+    the `table` and `ordering` (a new MoveOrdering if None) hold; only the order below the
+    root, and so the number of nodes searched, depends on them. With `batch`, sibling leaves
+    are scored together, see negamax.
+
+    If `deadline` (a time.perf_counter value) passes, the search raises SearchTimeout; the
+    moves on the way back up are undone, so the position is restored all the same.
+    """
+    root_moves = center_first(position.valid_actions())
+    if first_move in root_moves:
+        root_moves.remove(first_move)
+        root_moves.insert(0, first_move)
+    if ordering is None:
+        ordering = MoveOrdering()
+    if counters is None:
+        counters = SearchCounters()
     if maximizingPlayer:
-        value = np.NINF
-        for move in valid_actions:
-            child = apply_player_action(board, move, player)
-            new_value = alphabeta(child, other_player, depth - 1, False, alpha,
-                                  beta)[1]
-            if new_value > value:
-                best_action = move
-                value = new_value
-            if value >= beta:  # beta cutoff
-                break
-            alpha = max(alpha, value)
-        return best_action, value
-    else:
-        value = np.PINF
-        for move in valid_actions:
-            child = apply_player_action(board, move, player)
-            new_value = alphabeta(child, other_player, depth - 1, True, alpha,
-                                  beta)[1]
-            if new_value < value:
-                best_action = move
-                value = new_value
-            if value <= alpha:  # alpha cutoff
-                break
-            beta = min(beta, value)
-        return best_action, value
+        return negamax(position, depth, alpha, beta, table, counters, ordering, 0, deadline, root_moves, batch)
+    action, value = negamax(position, depth, -beta, -alpha, table, counters, ordering, 0, deadline, root_moves,
+                            batch)
+    return action, -value
+
+
+def negamax(position: Position,
+            depth: int,
+            alpha: float,
+            beta: float,
+            table: Optional[TranspositionTable],
+            counters: SearchCounters,
+            ordering: MoveOrdering,
+            ply: int,
+            deadline: Optional[float],
+            moves: Optional[list] = None,
+            batch: bool = JIT_ENABLED):
+    """
+    Negamax core of alphabeta_position with principal variation search: returns (action,
+    value) for the player to move in `position`, `ply` moves from the root. The first move
+    is searched with the window (alpha, beta); every later move only with a null window
+    that tells whether it beats alpha, and again with the full window if it does without
+    failing high. Children are visited with position.play and position.undo, so the whole
+    search runs on the one position buffer. The moves are searched in the order `moves`,
+    or else in the order of `ordering`.
+
+    With `batch`, the children of a node one ply above the leaves are scored together by
+    child_scores before its loop over the moves, which then only applies the cutoffs. Leaf
+    scores do not depend on the window, so the search returns the same result and counts
+    the same nodes and re-searches as without `batch`, but checks `deadline` only once for
+    all the leaves of a node. It scores every child, also those a cutoff would skip, so it
+    is only the default when the kernels are compiled.
+
+    With a `table`, below the root an entry for the same position searched to at least the
+    remaining depth ends the search of a node when its value is exact or its bound falls
+    outside the window. Within one search a position is always reached with the same
+    remaining depth, as every ply adds a piece, so a new table returns the same value as no
+    table. Entries kept from searches of earlier positions of the game reach deeper and
+    can give a different, better informed value.
+    """
+    if deadline is not None and time.perf_counter() >= deadline:
+        raise SearchTimeout
+    counters.nodes += 1
+
+    if (depth == 0) or position.last_move_end_state() != GameState.STILL_PLAYING:
+        to_move = player_index(position.player)
+        return -1, heuristic_bitboards(position.bitboards[to_move], position.bitboards[1 - to_move])
+
+    table_move = None
+    if table is not None and ply > 0:
+        entry = table.probe(position.key)
+        if entry is not None:
+            entry_depth, value, flag, table_move = entry
+            counters.table_hits += 1
+            if entry_depth >= depth and (flag == EXACT or (flag == LOWER_BOUND and value >= beta)
+                                         or (flag == UPPER_BOUND and value <= alpha)):
+                counters.table_cutoffs += 1
+                return table_move, value
+    if moves is None:
+        moves = ordering.order(position, ply, table_move)
+    counters.interior_nodes[depth] += 1
+    alpha_original = alpha
+    scores = None
+    if batch and depth == 1:
+        to_move = player_index(position.player)
+        scores = child_scores(position.bitboards[to_move], position.bitboards[1 - to_move], position.mask)
+
+    best_action, value = None, np.NINF
+    for index, move in enumerate(moves):
+        if scores is not None:
+            score = float(scores[move])
+            counters.nodes += 1
+            if index > 0 and alpha < score < beta:  # the full-window search of the leaf repeats its score
+                counters.re_searches += 1
+                counters.nodes += 1
+        else:
+            position.play(move)
+            try:
+                if index == 0:
+                    score = -negamax(position, depth - 1, -beta, -alpha, table, counters, ordering, ply + 1,
+                                     deadline, None, batch)[1]
+                else:
+                    null_beta = np.nextafter(alpha, np.PINF)
+                    score = -negamax(position, depth - 1, -null_beta, -alpha, table, counters, ordering, ply + 1,
+                                     deadline, None, batch)[1]
+                    if alpha < score < beta:
+                        counters.re_searches += 1
+                        score = -negamax(position, depth - 1, -beta, -alpha, table, counters, ordering, ply + 1,
+                                         deadline, None, batch)[1]
+            finally:
+                position.undo()
+        if score > value:
+            best_action = move
+            value = score
+        if value >= beta:  # beta cutoff
+            counters.cutoffs[depth] += 1
+            if index == 0:
+                counters.first_move_cutoffs[depth] += 1
+            ordering.fail_high(position, ply, move, depth)
+            break
+        alpha = max(alpha, value)
+
+    if table is not None:
+        if value <= alpha_original:
+            flag = UPPER_BOUND
+        elif value >= beta:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        table.store(position.key, depth, value, flag, best_action)
+    return best_action, value
+
+
+def iterative_deepening(position: Position,
+                        deadline: float,
+                        max_depth: Optional[int] = None,
+                        table: Optional[TranspositionTable] = None,
+                        counters: Optional[SearchCounters] = None) -> Tuple[int, float, int]:
+    """
+    Searches `position` with alphabeta_position to depth 1, 2, 3, ... until `deadline` (a
+    time.perf_counter value) and returns the result of the deepest search that completed.
+    Every iteration searches the best move of the previous one first, and the transposition
+    table holds the rest of its principal variation, which orders the moves below the root
+    together with the killers and history of one MoveOrdering. Depth 1 always completes.
+    The deepening also stops at `max_depth`, once the game is searched to its end, or once
+    a win or loss is found.
+
+    Returns:
+        (action, value, depth) of the deepest completed search.
+    """
+    if table is None:
+        table = TranspositionTable()
+    empty_cells = N_CELLS - position.n_moves
+    max_depth = empty_cells if max_depth is None else min(max_depth, empty_cells)
+    ordering = MoveOrdering()
+    action, value = alphabeta_position(position, 1, True, np.NINF, np.PINF, table, counters, ordering=ordering)
+    depth = 1
+    while depth < max_depth and abs(value) < WIN_SCORE:
+        try:
+            action, value = alphabeta_position(position, depth + 1, True, np.NINF, np.PINF, table,
+                                               counters, deadline, action, ordering)
+        except SearchTimeout:
+            break
+        depth += 1
+    return action, value, depth
+
+
+def principal_variation(position: Position, table: TranspositionTable, depth: int) -> list:
+    """
+    Returns the moves expected from `position` on, following the best moves of the table
+    entries for up to `depth` plies. The position is unchanged when the function returns.
+    """
+    moves = []
+    while len(moves) < depth and position.last_move_end_state() == GameState.STILL_PLAYING:
+        entry = table.probe(position.key)
+        if entry is None or not position.can_play(entry[3]):
+            break
+        moves.append(entry[3])
+        position.play(entry[3])
+    for _ in moves:
+        position.undo()
+    return moves
+
+
+_WORKER_TABLES = {}  # size: (table_id, TranspositionTable) of a worker process of root_split_search
+
+
+def search_root_move(bitboards: tuple, player: BoardPiece, move: int, depth: int,
+                     alpha: float, beta: float, table_size: int, table_id: int) -> Tuple[float, int]:
+    """
+    Plays `move` on the position of `bitboards` with `player` to move and searches the rest
+    of `depth` plies with the window (alpha, beta) for `player`. Runs inside the worker
+    processes of root_split_search, on a transposition table that the worker keeps between
+    tasks for the same `table_id`, the table_id of the table of the process searching the
+    first root move, and clears when the table_id changes.
+
+    Returns:
+        (value for `player`, nodes searched)
+    """
+    if table_size not in _WORKER_TABLES:
+        _WORKER_TABLES[table_size] = (table_id, TranspositionTable(table_size))
+    owner, table = _WORKER_TABLES[table_size]
+    if owner != table_id:
+        table.clear()
+        _WORKER_TABLES[table_size] = (table_id, table)
+    position = Position.from_bitboards(player, bitboards)
+    position.play(move)
+    counters = SearchCounters()
+    _, value = negamax(position, depth - 1, -beta, -alpha, table, counters, MoveOrdering(), 1, None)
+    return -value, counters.nodes
+
+
+def root_split_search(board: np.ndarray,
+                      player: BoardPiece,
+                      depth: int,
+                      n_workers: int,
+                      table_size: int = 1 << 20,
+                      counters: Optional[SearchCounters] = None,
+                      table: Optional[TranspositionTable] = None) -> Tuple[int, float]:
+    """
+    Parallel alphabeta from the root: the first move in center-first order is searched
+    with the full window in this process, which sets alpha. The other root moves are then
+    searched at once on a persistent pool of `n_workers` processes, with the null window
+    that tells whether a move beats alpha. The moves that do are searched again, also in
+    parallel, with the window (alpha, inf), which gives their exact values. As in the
+    serial search, the first of the best moves in center-first order is returned, so the
+    result equals that of alphabeta to the same depth, unless `table` holds deeper results
+    from searches of earlier positions, see negamax.
+
+    The first move is searched on `table`, or a new table of `table_size` entries. Every
+    worker keeps a table of `table_size` entries that follows it: the worker tables keep
+    their entries while the searches pass the same `table`, as the moves of one game do
+    through MinimaxSavedState, and are cleared for a new one.
+
+    Returns:
+        (action, value) as alphabeta.
+    """
+    if counters is None:
+        counters = SearchCounters()
+    position = Position.from_board(board, player)
+    moves = center_first(position.valid_actions())
+    if depth == 0 or len(moves) < 2 or position.last_move_end_state() != GameState.STILL_PLAYING:
+        return alphabeta_position(position, depth, counters=counters)
+
+    if table is None:
+        table = TranspositionTable(table_size)
+    position.play(moves[0])
+    _, value = negamax(position, depth - 1, np.NINF, np.PINF, table, counters, MoveOrdering(), 1, None)
+    position.undo()
+    alpha = -value
+    best_action, best_value = moves[0], alpha
+    bitboards = tuple(position.bitboards)
+    pool = get_worker_pool(n_workers, warm_up_minimax)
+
+    def search(moves, alpha, beta):
+        futures = [pool.submit(search_root_move, bitboards, player, move, depth, alpha, beta, table_size,
+                               table.table_id) for move in moves]
+        values = []
+        for future in futures:
+            value, nodes = future.result()
+            counters.nodes += nodes
+            values.append(value)
+        return values
+
+    null_values = search(moves[1:], alpha, np.nextafter(alpha, np.PINF))
+    fail_highs = [move for move, value in zip(moves[1:], null_values) if value > alpha]
+    counters.re_searches += len(fail_highs)
+    for move, value in zip(fail_highs, search(fail_highs, alpha, np.PINF)):
+        if value > best_value:
+            best_action, best_value = move, value
+    return best_action, best_value
+
+
+class MinimaxSavedState(SavedState):
+    def __init__(self, table: TranspositionTable):
+        """
+        Saved state of the minimax agent between its moves: the transposition table, whose
+        entries stay valid for later searches.
+        """
+        self.table = table
 
 
 def generate_move_minimax(
     board: np.ndarray,
     player: BoardPiece,
     saved_state: Optional[SavedState],
-    depth=np.int8(4)
+    depth=np.int8(4),
+    use_table=True,
+    table_size=1 << 20,
+    timeout: Optional[float] = None,
+    n_workers=1,
+    opening_book: Union[bool, OpeningBook, None] = None,
+    solver_empty_cells=SOLVER_EMPTY_CELLS,
 ) -> Tuple[PlayerAction, Optional[SavedState]]:
     """
-    Runs the minimax algorithm and returns best action.
+    Runs the minimax algorithm and returns best action. With `use_table`, the search uses
+    the TranspositionTable of `saved_state`, or a new one of `table_size` entries, and
+    returns it in a MinimaxSavedState for the next move.
+
+    With a `timeout` in seconds, the search deepens iteratively until the timeout instead of
+    searching to `depth`, see iterative_deepening; it always uses a table.
+
+    Without a timeout and with more than one of `n_workers`, the search to `depth` is split
+    at the root over that many processes, see root_split_search. This process searches the
+    first root move on the table of `saved_state`; the worker processes keep their own.
+
+    Positions in `opening_book` (an OpeningBook, or True for the default book if it has been
+    built, see agents.opening_book) are played from the book without a search, and positions
+    with at most `solver_empty_cells` empty cells are solved exactly, see agents.solver. The
+    table is kept in the saved state for the next move all the same.
     """
-    action, value = alphabeta(board, player, depth, True)
-    return action, saved_state
\ No newline at end of file
+    move = book_move(opening_book, board, player)
+    if move is None and N_CELLS - np.count_nonzero(board) <= solver_empty_cells:
+        move = PlayerAction(solve_move(Position.from_board(board, player))[0])
+    if move is not None:
+        if (use_table or timeout) and not isinstance(saved_state, MinimaxSavedState):
+            saved_state = MinimaxSavedState(TranspositionTable(table_size))
+        return move, saved_state
+    if timeout:
+        deadline = time.perf_counter() + timeout
+        table = saved_state.table if isinstance(saved_state, MinimaxSavedState) else TranspositionTable(table_size)
+        action, _, _ = iterative_deepening(Position.from_board(board, player), deadline, table=table)
+        return PlayerAction(action), MinimaxSavedState(table)
+    if n_workers > 1:
+        table = saved_state.table if isinstance(saved_state, MinimaxSavedState) else TranspositionTable(table_size)
+        action, value = root_split_search(board, player, depth, n_workers, table_size, table=table)
+        return PlayerAction(action), MinimaxSavedState(table)
+    if not use_table:
+        action, value = alphabeta(board, player, depth, True)
+        return PlayerAction(action), saved_state
+    if isinstance(saved_state, MinimaxSavedState):
+        table = saved_state.table
+    else:
+        table = TranspositionTable(table_size)
+    action, value = alphabeta(board, player, depth, True, table=table)
+    return PlayerAction(action), MinimaxSavedState(table)
@@ -1,14 +1,64 @@
-disable_jit = True
-if disable_jit:
-    import os
-
-    os.environ["NUMBA_DISABLE_JIT"] = "1"
-
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
 import numpy as np
-from scipy import signal
 from typing import Callable, Optional, Tuple
-from numba import njit
+from numba import njit, types
+from numba.core import cgutils
+from numba.extending import intrinsic
+
+JIT_ENABLED = os.environ.get("CONNECT4_JIT", "1") != "0"  # set CONNECT4_JIT=0 to run the kernels as plain python
+
+
+def jit(function=None, **options):
+    """
+    Compiles `function` with numba in nopython mode and caches the machine code on disk, so
+    that later processes load it instead of compiling again. Returns `function` unchanged
+    when JIT_ENABLED is False. Kernels decorated with jit only take and return ints, floats
+    and arrays, so they run the same either way.
+    """
+    if function is None:
+        return lambda function: jit(function, **options)
+    if not JIT_ENABLED:
+        return function
+    return njit(cache=True, **options)(function)
+
+
+if JIT_ENABLED:
+    @intrinsic
+    def atomic_add(typingctx, array, index, value):
+        """
+        Adds `value` to array[index] as one atomic operation and returns the old value, so
+        that kernels running at the same time in several threads lose none of their updates.
+        `index` is an int, or a tuple of ints for a 2D array. Only callable from jit kernels.
+        """
+        def codegen(context, builder, signature, args):
+            array_type, index_type, value_type = signature.args
+            array, index, value = args
+            if isinstance(index_type, types.BaseTuple):
+                indices = zip(cgutils.unpack_tuple(builder, index, len(index_type)), index_type)
+            else:
+                indices = [(index, index_type)]
+            indices = [context.cast(builder, i, i_type, types.intp) for i, i_type in indices]
+            pointer = cgutils.get_item_pointer(context, builder, array_type,
+                                               context.make_array(array_type)(context, builder, array),
+                                               indices, wraparound=False)
+            value = context.cast(builder, value, value_type, array_type.dtype)
+            operation = "fadd" if isinstance(array_type.dtype, types.Float) else "add"
+            return builder.atomic_rmw(operation, pointer, value, "monotonic")
+
+        return array.dtype(array, index, value), codegen
+else:
+    _ATOMIC_LOCK = threading.Lock()
+
+    def atomic_add(array, index, value):
+        with _ATOMIC_LOCK:
+            old = array[index]
+            array[index] = old + value
+        return old
 
 
 BoardPiece = np.int8  # The data type (dtype) of the board
@@ -29,6 +79,7 @@ PLAYER1_PRINT = BoardPiecePrint(f'X')
 PLAYER2_PRINT = BoardPiecePrint('O')
 
 PlayerAction = np.int8  # The column to be played
+LINE_DIRECTIONS = ((1, 0), (0, 1), (1, 1), (1, -1))  # (row, column) steps along vertical, horizontal, diagonal and off-diagonal lines
 
 class GameState(Enum):
     IS_WIN = 1
@@ -36,7 +87,11 @@ class GameState(Enum):
     STILL_PLAYING = 0
 
 class SavedState:
-    pass
+    def stop(self):
+        """
+        Stops any work the agent keeps doing in the background between its moves. Called
+        when the game ends; does nothing unless overridden.
+        """
 
 GenMove = Callable[
     [np.ndarray, BoardPiece, Optional[SavedState]],  # Arguments for the generate_move function
@@ -111,39 +166,29 @@ def apply_player_action(board: np.ndarray, action: PlayerAction,
     if action > columns - 1 or action < 0:
         raise ValueError('Action outside of board.')
 
-    if ~np.any(board[:, action] == NO_PLAYER):
+    row = column_height(board, action)
+    if row >= rows:
         raise ValueError('Column is already full.')
 
     modified_board = board.copy()
-    for i in range(rows):
-        if modified_board[:, action][i] == NO_PLAYER:  # find first non-filled space in column
-            modified_board[:, action][i] = player
-            break
+    modified_board[row, action] = player
 
     return modified_board
 
 
-@njit()
+def column_height(board: np.ndarray, column: PlayerAction) -> int:
+    """
+    Returns the number of pieces in `column`, which is also the index of the lowest open row.
+    """
+    return int(np.count_nonzero(board[:, column]))
+
+
 def connected_four(board: np.ndarray, player: BoardPiece) -> bool:
     """
     Returns True if there are four adjacent pieces equal to `player` arranged
     in either a horizontal, vertical, or diagonal line. Returns False otherwise.
     """
-    vertical_kernel = np.ones((4, 1), dtype=BoardPiece)
-    horizontal_kernel = np.ones((1, 4), dtype=BoardPiece)
-    diagonal_kernel = np.eye(4, dtype=BoardPiece)
-    off_diagonal_kernel = np.eye(4, dtype=BoardPiece)[::-1]
-
-    is_win = False
-    if np.any(signal.convolve2d(board, vertical_kernel, 'same') == player * 4):
-        is_win = True
-    elif np.any(signal.convolve2d(board, horizontal_kernel, 'same') == player * 4):
-        is_win = True
-    elif np.any(signal.convolve2d(board, diagonal_kernel, 'same') == player * 4):
-        is_win = True
-    elif np.any(signal.convolve2d(board, off_diagonal_kernel, 'same') == player * 4):
-        is_win = True
-    return is_win
+    return bitboard_connected_four(board_to_bitboard(board, player))
 
 
 def check_end_state(board: np.ndarray, player: BoardPiece) -> GameState:
@@ -155,13 +200,39 @@ def check_end_state(board: np.ndarray, player: BoardPiece) -> GameState:
     if connected_four(board, player):
         return GameState.IS_WIN
 
-    elif np.all(board != NO_PLAYER):
+    elif np.count_nonzero(board) == rows * columns:
         return GameState.IS_DRAW
 
     else:
         return GameState.STILL_PLAYING
 
 
+def check_end_state_from_action(board: np.ndarray, player: BoardPiece, action: PlayerAction,
+                                row: int, n_moves: int) -> GameState:
+    """
+    Same as check_end_state for a board where `player` has just played `action` into `row`
+    and which holds `n_moves` pieces in total. Only the last piece can complete four in a
+    row, so only the up to four lines through board[row, action] are scanned, and a draw
+    is read off the move counter instead of the whole board.
+    """
+    cells = board.tolist()  # plain python lists are much faster to index than ndarrays
+    player = int(player)
+    for d_row, d_column in LINE_DIRECTIONS:
+        n_connected = 1
+        for sign in (1, -1):  # walk away from the last piece in both directions along the line
+            i, j = row + sign * d_row, action + sign * d_column
+            while 0 <= i < N_ROWS and 0 <= j < N_COLUMNS and cells[i][j] == player:
+                n_connected += 1
+                i, j = i + sign * d_row, j + sign * d_column
+        if n_connected >= 4:
+            return GameState.IS_WIN
+
+    if n_moves == N_CELLS:
+        return GameState.IS_DRAW
+    else:
+        return GameState.STILL_PLAYING
+
+
 def is_terminal_board(board: np.ndarray, player: BoardPiece) -> bool:
     """
     Returns True only if the game is over at the current state.
@@ -169,4 +240,383 @@ def is_terminal_board(board: np.ndarray, player: BoardPiece) -> bool:
     if check_end_state(board, player) != GameState.STILL_PLAYING:
         return True
     else:
-        return False
\ No newline at end of file
+        return False
+
+
+# Bitboard position engine
+#
+# A player's pieces are stored in one integer with bit (column * BITBOARD_HEIGHT + row) set
+# where board[row, column] belongs to the player. Each column gets one extra sentinel bit
+# above the top row so that shifts never wrap a line of pieces from one column into the next.
+N_ROWS = int(rows)
+N_COLUMNS = int(columns)
+N_CELLS = N_ROWS * N_COLUMNS
+BITBOARD_HEIGHT = N_ROWS + 1
+BOTTOM_MASK = sum(1 << (column * BITBOARD_HEIGHT) for column in range(N_COLUMNS))
+BOARD_MASK = BOTTOM_MASK * ((1 << N_ROWS) - 1)
+DIRECTION_SHIFTS = (1, BITBOARD_HEIGHT, BITBOARD_HEIGHT - 1, BITBOARD_HEIGHT + 1)  # vertical, horizontal, off-diagonal, diagonal
+CELL_BITS = (
+    1 << (np.arange(N_COLUMNS)[None, :] * BITBOARD_HEIGHT + np.arange(N_ROWS)[:, None])
+).astype(np.int64)  # CELL_BITS[row, column] is the bit of that cell
+
+
+ZOBRIST_SEED = 4  # fixed, so that keys are the same in every process and can be stored on disk
+_zobrist_rng = np.random.default_rng(ZOBRIST_SEED)
+ZOBRIST_CELLS = _zobrist_rng.integers(
+    0, np.iinfo(np.uint64).max, size=(2, N_ROWS, N_COLUMNS), dtype=np.uint64, endpoint=True
+)  # ZOBRIST_CELLS[player_index(player), row, column] is xor-ed into the key when player holds that cell
+ZOBRIST_PIECES = np.stack(
+    (np.zeros((N_ROWS, N_COLUMNS), dtype=np.uint64), ZOBRIST_CELLS[0], ZOBRIST_CELLS[1])
+)  # indexed by the piece itself: ZOBRIST_PIECES[NO_PLAYER] is 0 and ZOBRIST_PIECES[PLAYER2] wraps around to the last entry
+_ROW_INDEX, _COLUMN_INDEX = np.indices((N_ROWS, N_COLUMNS))
+ZOBRIST_SIDE = int(_zobrist_rng.integers(0, np.iinfo(np.uint64).max, dtype=np.uint64, endpoint=True))  # xor-ed in when PLAYER2 is to move
+ZOBRIST_BITS = [
+    [int(ZOBRIST_CELLS[index, bit % BITBOARD_HEIGHT, bit // BITBOARD_HEIGHT])
+     if bit % BITBOARD_HEIGHT < N_ROWS else 0 for bit in range(N_COLUMNS * BITBOARD_HEIGHT)]
+    for index in range(2)
+]  # the same keys indexed by bitboard bit, as python ints for the incremental updates in Position
+
+
+def board_key(board: np.ndarray, player: BoardPiece) -> int:
+    """
+    Returns the 64 bit Zobrist key of `board` with `player` to move. Equal to Position.key of
+    the same board, so it can be used to look up positions stored by a search.
+    """
+    key = int(np.bitwise_xor.reduce(ZOBRIST_PIECES[board, _ROW_INDEX, _COLUMN_INDEX], axis=None))
+    return key ^ ZOBRIST_SIDE if player == PLAYER2 else key
+
+
+@jit
+def bitboard_connected_four(bitboard: int) -> bool:
+    """
+    Returns True if the pieces in `bitboard` contain four in a row in any direction.
+    Shifting the bitboard by the distance between two neighbouring cells and and-ing it
+    with itself leaves the cells that start a pair; doing that again with twice the
+    distance leaves the cells that start four in a row.
+    """
+    for shift in DIRECTION_SHIFTS:
+        pairs = bitboard & (bitboard >> shift)
+        if pairs & (pairs >> (2 * shift)):
+            return True
+    return False
+
+
+@jit(inline="always")
+def count_bits(bits: int) -> int:
+    """
+    Returns the number of set bits in the bitboard `bits`, by adding up neighbouring bit
+    counts in parallel within the integer. The final multiplication wraps around in 64 bits,
+    so `bits` has to be a python int when the kernels run uncompiled.
+    """
+    bits = bits - ((bits >> 1) & 0x5555555555555555)
+    bits = (bits & 0x3333333333333333) + ((bits >> 2) & 0x3333333333333333)
+    bits = (bits + (bits >> 4)) & 0x0F0F0F0F0F0F0F0F
+    return ((bits * 0x0101010101010101) >> 56) & 0xFF
+
+
+def batch_connected_four(bitboards: np.ndarray) -> np.ndarray:
+    """
+    Vectorized bitboard_connected_four: returns a boolean array that is True where the
+    bitboard in the int64 array `bitboards` contains four in a row.
+    """
+    is_win = np.zeros(bitboards.shape, dtype=np.bool_)
+    for shift in DIRECTION_SHIFTS:
+        pairs = bitboards & (bitboards >> shift)
+        is_win |= (pairs & (pairs >> (2 * shift))) != 0
+    return is_win
+
+
+@jit
+def legal_moves_mask(mask: int) -> int:
+    """
+    Returns a bitboard with the lowest open cell of every column that is not full set,
+    given the `mask` of all pieces on the board.
+    """
+    return (mask + BOTTOM_MASK) & BOARD_MASK
+
+
+@jit
+def legal_columns(mask: int) -> int:
+    """
+    Returns a 7 bit mask with bit `column` set for every column that is not full, given the
+    `mask` of all pieces on the board.
+    """
+    columns_mask = 0
+    for column in range(N_COLUMNS):
+        if not mask & (1 << (column * BITBOARD_HEIGHT + N_ROWS - 1)):
+            columns_mask |= 1 << column
+    return columns_mask
+
+
+@jit
+def column_mask(column: int) -> int:
+    """
+    Returns the bitboard with every cell of `column` set.
+    """
+    return ((1 << N_ROWS) - 1) << (column * BITBOARD_HEIGHT)
+
+
+@jit
+def play_bitboard(bitboard: int, mask: int, column: int):
+    """
+    Drops a piece into `column` for the player owning `bitboard`, where `mask` holds all pieces.
+    Returns the updated (bitboard, mask). The column must not be full.
+    """
+    move = (mask + (1 << (column * BITBOARD_HEIGHT))) & column_mask(column)
+    return bitboard | move, mask | move
+
+
+def board_to_bitboard(board: np.ndarray, player: BoardPiece) -> int:
+    """
+    Returns the bitboard of the pieces of `player` in the ndarray `board`.
+    """
+    return int(CELL_BITS[board == player].sum())
+
+
+def player_index(player: BoardPiece) -> int:
+    """
+    Returns the index of `player` into Position.bitboards (0 for PLAYER1 and 1 for PLAYER2).
+    """
+    return 0 if player == PLAYER1 else 1
+
+
+def other_player(player: BoardPiece) -> BoardPiece:
+    """
+    Returns the opposing player.
+    """
+    return PLAYER1 if player == PLAYER2 else PLAYER2
+
+
+class Position:
+    """
+    Connect 4 position stored as two bitboards (one per player) and the column heights.
+    `player` is the player to move next. Moves are applied in place with play and taken
+    back with undo, so a search can walk the whole tree on a single Position. make_move
+    returns a new Position and leaves this one unchanged. `key` is the Zobrist key of the
+    position (see board_key) and is updated incrementally by play and undo.
+    """
+    __slots__ = ("bitboards", "heights", "player", "n_moves", "history", "key")
+
+    def __init__(self, player: BoardPiece = PLAYER1, bitboards=(0, 0), heights=None):
+        self.bitboards = list(bitboards)
+        self.heights = [0] * N_COLUMNS if heights is None else list(heights)
+        self.player = player
+        self.n_moves = sum(self.heights)
+        self.history = []  # columns played since construction, for undo
+        self.key = ZOBRIST_SIDE if player == PLAYER2 else 0
+        for index, bitboard in enumerate(self.bitboards):
+            for bit, bit_key in enumerate(ZOBRIST_BITS[index]):
+                if bitboard >> bit & 1:
+                    self.key ^= bit_key
+
+    @classmethod
+    def from_board(cls, board: np.ndarray, player: BoardPiece) -> "Position":
+        """
+        Returns the Position of the ndarray `board` with `player` to move.
+        """
+        bitboards = (board_to_bitboard(board, PLAYER1), board_to_bitboard(board, PLAYER2))
+        heights = np.count_nonzero(board, axis=0).tolist()
+        return cls(player, bitboards, heights)
+
+    @classmethod
+    def from_bitboards(cls, player: BoardPiece, bitboards) -> "Position":
+        """
+        Returns the Position with the pieces of PLAYER1 and PLAYER2 in `bitboards` and `player` to move.
+        """
+        mask = bitboards[0] | bitboards[1]
+        heights = [(mask >> (column * BITBOARD_HEIGHT) & ((1 << N_ROWS) - 1)).bit_length()
+                   for column in range(N_COLUMNS)]
+        return cls(player, bitboards, heights)
+
+    def to_board(self) -> np.ndarray:
+        """
+        Returns the position as an ndarray board of shape (6, 7).
+        """
+        board = initialize_game_state()
+        board[(CELL_BITS & self.bitboards[0]) != 0] = PLAYER1
+        board[(CELL_BITS & self.bitboards[1]) != 0] = PLAYER2
+        return board
+
+    def copy(self) -> "Position":
+        position = Position.__new__(Position)
+        position.bitboards = self.bitboards.copy()
+        position.heights = self.heights.copy()
+        position.player = self.player
+        position.n_moves = self.n_moves
+        position.history = self.history.copy()
+        position.key = self.key
+        return position
+
+    @property
+    def mask(self) -> int:
+        """
+        Bitboard of all pieces on the board.
+        """
+        return self.bitboards[0] | self.bitboards[1]
+
+    def legal_moves_mask(self) -> int:
+        return legal_moves_mask(self.mask)
+
+    def can_play(self, column: int) -> bool:
+        return self.heights[column] < N_ROWS
+
+    def valid_actions(self) -> list:
+        """
+        Returns the list of columns that are not full.
+        """
+        return [column for column in range(N_COLUMNS) if self.heights[column] < N_ROWS]
+
+    def play(self, column: int) -> "Position":
+        """
+        Drops a piece of the player to move into `column` in place and passes the turn.
+        Raises a ValueError if the column is full. Returns the position itself.
+        """
+        height = self.heights[column]
+        if height >= N_ROWS:
+            raise ValueError('Column is already full.')
+        index, bit = player_index(self.player), column * BITBOARD_HEIGHT + height
+        self.bitboards[index] |= 1 << bit
+        self.key ^= ZOBRIST_BITS[index][bit] ^ ZOBRIST_SIDE
+        self.heights[column] = height + 1
+        self.n_moves += 1
+        self.history.append(column)
+        self.player = other_player(self.player)
+        return self
+
+    def undo(self) -> int:
+        """
+        Takes back the last move made with play and returns its column. Raises a ValueError
+        if no move has been played on this position.
+        """
+        if not self.history:
+            raise ValueError('No move to undo.')
+        column = self.history.pop()
+        self.player = other_player(self.player)
+        self.heights[column] -= 1
+        index, bit = player_index(self.player), column * BITBOARD_HEIGHT + self.heights[column]
+        self.bitboards[index] &= ~(1 << bit)
+        self.key ^= ZOBRIST_BITS[index][bit] ^ ZOBRIST_SIDE
+        self.n_moves -= 1
+        return column
+
+    def make_move(self, column: int) -> "Position":
+        """
+        Returns the Position after the player to move drops a piece into `column`.
+        Raises a ValueError if the column is full.
+        """
+        if not self.can_play(column):
+            raise ValueError('Column is already full.')
+        return self.copy().play(column)
+
+    def connected_four(self, player: BoardPiece) -> bool:
+        return bitboard_connected_four(self.bitboards[player_index(player)])
+
+    def check_end_state(self, player: BoardPiece) -> GameState:
+        """
+        Same as check_end_state, evaluated on the bitboards.
+        """
+        if self.connected_four(player):
+            return GameState.IS_WIN
+        elif self.n_moves == N_CELLS:
+            return GameState.IS_DRAW
+        else:
+            return GameState.STILL_PLAYING
+
+    def is_terminal(self, player: BoardPiece) -> bool:
+        return self.check_end_state(player) != GameState.STILL_PLAYING
+
+    def last_move_end_state(self) -> GameState:
+        """
+        Returns the game state for the player who made the last move, i.e. the opponent of
+        `player`. Only that player's last piece can have ended the game, so only their bitboard
+        is checked, and a draw is read off the move counter.
+        """
+        if self.n_moves and bitboard_connected_four(self.bitboards[1 - player_index(self.player)]):
+            return GameState.IS_WIN
+        elif self.n_moves == N_CELLS:
+            return GameState.IS_DRAW
+        else:
+            return GameState.STILL_PLAYING
+
+
+class TimeManager:
+    """
+    Splits a time budget for a whole game across the moves of one player. Each move gets the
+    share of the remaining budget given by its phase weight, relative to the weights of all the
+    moves the player may still have to make, so moves in the middle game, where the choice
+    matters most, get more time than the opening and the endgame. Moves the agent solves
+    exactly instead of searching get no share.
+    """
+    PHASE_WEIGHTS = ((8, 0.5), (30, 1.5), (N_CELLS, 1.0))  # (pieces on the board below which, weight)
+
+    def __init__(self, game_time: float, min_move_time: float = 0.01, solved_empty_cells: int = 0):
+        """
+        Args:
+            game_time: Seconds for all moves of the game.
+            min_move_time: Seconds given to a move even when the budget is used up.
+            solved_empty_cells: Moves with at most this many empty cells are solved, see
+                agents.solver, so the budget is split over the moves before them.
+        """
+        self.remaining = game_time
+        self.min_move_time = min_move_time
+        self.solved_empty_cells = solved_empty_cells
+
+    def phase_weight(self, n_moves: int) -> float:
+        for moves_below, weight in self.PHASE_WEIGHTS:
+            if n_moves < moves_below:
+                return weight
+        return self.PHASE_WEIGHTS[-1][1]
+
+    def move_time(self, n_moves: int) -> float:
+        """
+        Returns the seconds to spend on the move played with `n_moves` pieces on the board.
+        """
+        weights = sum(self.phase_weight(n) for n in range(n_moves, N_CELLS - self.solved_empty_cells, 2))
+        if weights == 0:  # a solved move
+            return self.min_move_time
+        return max(self.remaining * self.phase_weight(n_moves) / weights, self.min_move_time)
+
+    def spend(self, seconds: float):
+        """
+        Takes the time a move actually took off the remaining budget.
+        """
+        self.remaining -= seconds
+
+
+_WORKER_POOLS = {}
+
+
+def get_worker_pool(n_workers: int, initializer: Optional[Callable] = None) -> ProcessPoolExecutor:
+    """
+    Returns a pool of `n_workers` processes, started with the spawn method, that each call
+    `initializer` once, usually the warm-up of an agent. The pool is started on first use
+    and then kept for the lifetime of the program, so the process start-up and the kernel
+    warm-up are only paid once.
+    """
+    key = (n_workers, initializer)
+    if key not in _WORKER_POOLS:
+        _WORKER_POOLS[key] = ProcessPoolExecutor(
+            n_workers, mp_context=multiprocessing.get_context("spawn"), initializer=initializer
+        )
+    return _WORKER_POOLS[key]
+
+
+@atexit.register
+def shutdown_worker_pools():
+    """
+    Stops the processes of every pool started by get_worker_pool.
+    """
+    for pool in _WORKER_POOLS.values():
+        pool.shutdown(cancel_futures=True)
+    _WORKER_POOLS.clear()
+
+
+def warm_up_jit():
+    """
+    Compiles the bitboard kernels of this module, or loads them from the on-disk cache, so that
+    the first move of a game is not dominated by compile time.
+    """
+    bitboard_connected_four(0)
+    legal_moves_mask(0)
+    legal_columns(0)
+    play_bitboard(0, 0, 0)
@@ -0,0 +1,196 @@
+"""
+Opening book shared by the agents: the best move and its value for every position up to a
+given number of plies, searched offline by build_book and stored in one binary file.
+
+The file holds a 16 byte header (BOOK_MAGIC and the number of entries n as a little endian
+uint64) followed by three arrays: the n position keys (Position.key, uint64) in ascending
+order, their values for the player to move (float32) and their best moves (int8). A
+position and its mirror image share one entry, stored under the smaller of the two keys.
+OpeningBook maps the file into memory, so opening a book costs the same whatever its size,
+and looks a position up by binary search on the keys.
+
+Build the default book from the repository root with `python -m agents.opening_book`.
+"""
+import argparse
+import time
+from pathlib import Path
+import numpy as np
+from agents.common import *
+from typing import Optional, Tuple, Union
+
+BOOK_MAGIC = b"C4BOOK01"
+HEADER_BYTES = 16
+BOOK_PATH = Path(__file__).with_name("opening_book.bin")  # default book, written by build_book
+
+
+def mirrored_key(position: Position) -> int:
+    """
+    Returns the Zobrist key of `position` mirrored left to right, from the keys of its pieces.
+    """
+    key = ZOBRIST_SIDE if position.player == PLAYER2 else 0
+    for index, bitboard in enumerate(position.bitboards):
+        while bitboard:
+            bit = (bitboard & -bitboard).bit_length() - 1
+            bitboard &= bitboard - 1
+            column, row = divmod(bit, BITBOARD_HEIGHT)
+            key ^= ZOBRIST_BITS[index][(N_COLUMNS - 1 - column) * BITBOARD_HEIGHT + row]
+    return key
+
+
+class OpeningBook:
+    """
+    Read-only opening book, memory-mapped from a file written by write_book.
+    """
+
+    def __init__(self, path: Union[str, Path] = BOOK_PATH):
+        """
+        Args:
+            path: Book file. Raises a ValueError if it is not an opening book.
+        """
+        self.path = Path(path)
+        header = np.memmap(self.path, dtype=np.uint8, mode="r", shape=(HEADER_BYTES,))
+        if bytes(header[:len(BOOK_MAGIC)]) != BOOK_MAGIC:
+            raise ValueError(f"{self.path} is not an opening book.")
+        n = int(header[len(BOOK_MAGIC):].view("<u8")[0])
+        self.keys = np.memmap(self.path, dtype="<u8", mode="r", offset=HEADER_BYTES, shape=(n,))
+        self.values = np.memmap(self.path, dtype="<f4", mode="r", offset=HEADER_BYTES + 8 * n, shape=(n,))
+        self.moves = np.memmap(self.path, dtype=np.int8, mode="r", offset=HEADER_BYTES + 12 * n, shape=(n,))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def find(self, key: int) -> int:
+        """
+        Returns the index of the entry for `key`, or -1.
+        """
+        index = int(np.searchsorted(self.keys, np.uint64(key)))
+        if index < len(self.keys) and int(self.keys[index]) == key:
+            return index
+        return -1
+
+    def lookup(self, position: Position) -> Optional[Tuple[int, float]]:
+        """
+        Returns (best move, value for the player to move) of `position`, or None if the
+        position is not in the book.
+        """
+        return self.lookup_keys(position.key, mirrored_key(position))
+
+    def lookup_board(self, board: np.ndarray, player: BoardPiece) -> Optional[Tuple[int, float]]:
+        """
+        Same as lookup, for `board` with `player` to move.
+        """
+        return self.lookup_keys(board_key(board, player), board_key(board[:, ::-1], player))
+
+    def lookup_keys(self, key: int, mirror_key: int) -> Optional[Tuple[int, float]]:
+        """
+        Same as lookup, for the position with Zobrist key `key`, and `mirror_key` mirrored.
+        """
+        index = self.find(key)
+        if index >= 0:
+            return int(self.moves[index]), float(self.values[index])
+        index = self.find(mirror_key)
+        if index >= 0:
+            return N_COLUMNS - 1 - int(self.moves[index]), float(self.values[index])
+        return None
+
+
+_DEFAULT_BOOK = []  # the default book once opened, emptied when write_book rewrites it
+
+
+def default_book() -> Optional[OpeningBook]:
+    """
+    Returns the book at BOOK_PATH, opened on first use, or None if it has not been built.
+    Only an opened book is kept, so a book built later in the session is found.
+    """
+    if not _DEFAULT_BOOK:
+        if not BOOK_PATH.exists():
+            return None
+        _DEFAULT_BOOK.append(OpeningBook(BOOK_PATH))
+    return _DEFAULT_BOOK[0]
+
+
+def book_move(opening_book: Union[bool, OpeningBook, None], board: np.ndarray,
+              player: BoardPiece) -> Optional[PlayerAction]:
+    """
+    Returns the book move for `board` with `player` to move, or None. `opening_book` is the
+    argument of the same name of the agents: an OpeningBook, True for the default book if it
+    has been built, or False or None for no book.
+    """
+    if opening_book is True:
+        opening_book = default_book()
+    if not opening_book:
+        return None
+    entry = opening_book.lookup_board(board, player)
+    return None if entry is None else PlayerAction(entry[0])
+
+
+def write_book(path: Union[str, Path], entries: dict):
+    """
+    Writes the book file of `entries`, {key: (move, value)}, to `path`. Writing BOOK_PATH
+    closes the default book, which default_book then opens again.
+    """
+    if Path(path).resolve() == BOOK_PATH.resolve():
+        _DEFAULT_BOOK.clear()
+    keys = np.array(sorted(entries), dtype="<u8")
+    values = np.array([entries[int(key)][1] for key in keys], dtype="<f4")
+    moves = np.array([entries[int(key)][0] for key in keys], dtype=np.int8)
+    with open(path, "wb") as file:
+        file.write(BOOK_MAGIC)
+        file.write(np.array([len(keys)], dtype="<u8").tobytes())
+        for array in (keys, values, moves):
+            file.write(array.tobytes())
+
+
+def book_positions(max_ply: int) -> list:
+    """
+    Returns one Position for every position reachable in at most `max_ply` moves from the
+    empty board in which the game is not over, counting a position and its mirror image once.
+    """
+    position = Position()
+    seen, positions = set(), []
+
+    def visit(ply):
+        key = min(position.key, mirrored_key(position))
+        if key in seen or position.last_move_end_state() != GameState.STILL_PLAYING:
+            return
+        seen.add(key)
+        positions.append(position.copy())
+        if ply < max_ply:
+            for column in position.valid_actions():
+                position.play(column)
+                visit(ply + 1)
+                position.undo()
+
+    visit(0)
+    return positions
+
+
+def build_book(path: Union[str, Path] = BOOK_PATH, max_ply: int = 4, depth: int = 8, verbose: bool = True) -> int:
+    """
+    Searches every position of book_positions(max_ply) with alphabeta to `depth` plies and
+    writes the best moves to the book file at `path`. Returns the number of entries.
+    """
+    from agents.agent_minimax.minimax import TranspositionTable, alphabeta_position, warm_up_minimax
+
+    warm_up_minimax()
+    table = TranspositionTable()
+    entries = {}
+    start = time.perf_counter()
+    for number, position in enumerate(book_positions(max_ply)):
+        move, value = alphabeta_position(position, depth, table=table)
+        key, mirror = position.key, mirrored_key(position)
+        entries[min(key, mirror)] = (move, value) if key <= mirror else (N_COLUMNS - 1 - move, value)
+        if verbose and number % 100 == 0:
+            print(f"{number:6d} positions  {time.perf_counter() - start:8.1f} s")
+    write_book(path, entries)
+    return len(entries)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=build_book.__doc__)
+    parser.add_argument("--path", default=BOOK_PATH)
+    parser.add_argument("--max-ply", type=int, default=4)
+    parser.add_argument("--depth", type=int, default=8)
+    args = parser.parse_args()
+    n_entries = build_book(args.path, args.max_ply, args.depth)
+    print(f"wrote {n_entries} positions to {args.path}")
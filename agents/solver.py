@@ -0,0 +1,203 @@
+"""
+Exact Connect 4 solver for positions with few empty cells, used by both agents near the end
+of a game. It searches the rest of the game with negamax and alpha-beta pruning over win,
+draw and loss, scored by how early the game is decided: the player to move scores
+(N_CELLS + 1 - n_moves) // 2 if they connect four with their next piece, one less for every
+pair of moves it takes them longer, 0 for a draw, and the negative of the opponent's score
+for a loss.
+
+The search runs on two bitboards, the pieces of the player to move (`current`) and all
+pieces (`mask`). It never plays a move that lets the opponent connect four at once, searches
+the other moves by the number of cells they leave the player ready to win, and keeps upper
+bounds of the scores in a SolverTable. solve narrows the score down with null-window searches.
+"""
+import numpy as np
+from agents.common import *
+from typing import Optional, Tuple
+
+MIN_SCORE = -(N_CELLS // 2) + 3  # the lowest score of a position that is not lost with the next move
+COLUMN_ORDER = np.array([3, 4, 2, 5, 1, 6, 0], dtype=np.int64)  # center first, as minimax.center_first
+SOLVER_EMPTY_CELLS = 20 if JIT_ENABLED else 14  # the agents hand over to the solver at this many empty cells or fewer
+
+
+class SolverTable:
+    """
+    Fixed size table of upper bounds of solver scores, indexed by the low bits of
+    current + mask, which identifies a position, and stored as parallel arrays. A new bound
+    always replaces the entry in its slot. Kept between moves, the bounds stay valid.
+    """
+
+    def __init__(self, size: int = 1 << 20):
+        """
+        Args:
+            size: Number of entries, rounded down to a power of two.
+        """
+        size = 1 << (int(size).bit_length() - 1)
+        self.keys = np.zeros(size, dtype=np.int64)
+        self.values = np.zeros(size, dtype=np.int8)  # upper bound - MIN_SCORE + 1, 0 in empty slots
+
+    def nbytes(self) -> int:
+        return self.keys.nbytes + self.values.nbytes
+
+
+@jit
+def winning_cells(bitboard: int, mask: int) -> int:
+    """
+    Returns the bitboard of the empty cells, given the `mask` of all pieces, that would
+    complete four in a row for the owner of `bitboard`, whether they can be played yet or not.
+    """
+    cells = (bitboard << 1) & (bitboard << 2) & (bitboard << 3)  # vertical, only upwards
+    for shift in DIRECTION_SHIFTS[1:]:
+        pairs = (bitboard << shift) & (bitboard << (2 * shift))
+        cells |= pairs & (bitboard << (3 * shift))
+        cells |= pairs & (bitboard >> shift)
+        pairs = (bitboard >> shift) & (bitboard >> (2 * shift))
+        cells |= pairs & (bitboard << shift)
+        cells |= pairs & (bitboard >> (3 * shift))
+    return cells & (BOARD_MASK ^ mask)
+
+
+@jit
+def negamax_solve(current: int, mask: int, n_moves: int, alpha: int, beta: int,
+                  table_keys: np.ndarray, table_values: np.ndarray, nodes: np.ndarray) -> int:
+    """
+    Returns the score of the position for the player to move if it lies in the window
+    (alpha, beta), an upper bound at most alpha if the score is lower, and a lower bound at
+    least beta if it is higher. The player to move must not be able to win with their next
+    piece. Counts the positions searched in nodes[0].
+    """
+    nodes[0] += 1
+    possible = legal_moves_mask(mask)
+    opponent_wins = winning_cells(current ^ mask, mask)
+    forced = possible & opponent_wins
+    if forced:
+        if forced & (forced - 1):  # two threats that can be played into, only one can be blocked
+            return -((N_CELLS - n_moves) // 2)
+        possible = forced
+    non_losing = possible & ~(opponent_wins >> 1)  # don't play below a cell the opponent wins at
+    if non_losing == 0:
+        return -((N_CELLS - n_moves) // 2)
+    if n_moves >= N_CELLS - 2:
+        return 0
+
+    lower = -((N_CELLS - 2 - n_moves) // 2)
+    if alpha < lower:
+        alpha = lower
+        if alpha >= beta:
+            return alpha
+    upper = (N_CELLS - 1 - n_moves) // 2
+    key = current + mask
+    index = key & (len(table_keys) - 1)
+    if table_keys[index] == key and table_values[index] != 0:
+        upper = table_values[index] + MIN_SCORE - 1
+    if beta > upper:
+        beta = upper
+        if alpha >= beta:
+            return beta
+
+    moves = np.zeros(N_COLUMNS, dtype=np.int64)
+    scores = np.zeros(N_COLUMNS, dtype=np.int64)
+    n = 0
+    for column in COLUMN_ORDER:
+        move = non_losing & column_mask(int(column))
+        if move:
+            score = count_bits(winning_cells(current | move, mask))
+            position = n  # insertion sort by score, keeping the center-first order of ties
+            while position > 0 and scores[position - 1] < score:
+                moves[position] = moves[position - 1]
+                scores[position] = scores[position - 1]
+                position -= 1
+            moves[position] = move
+            scores[position] = score
+            n += 1
+
+    for i in range(n):
+        score = -negamax_solve(current ^ mask, mask | int(moves[i]), n_moves + 1, -beta, -alpha,
+                               table_keys, table_values, nodes)
+        if score >= beta:
+            return score
+        if score > alpha:
+            alpha = score
+    table_keys[index] = key
+    table_values[index] = alpha - MIN_SCORE + 1
+    return alpha
+
+
+@jit
+def can_win_next(current: int, mask: int) -> bool:
+    return (winning_cells(current, mask) & legal_moves_mask(mask)) != 0
+
+
+@jit
+def solve_bitboards(current: int, mask: int, n_moves: int, table_keys: np.ndarray,
+                    table_values: np.ndarray, nodes: np.ndarray) -> int:
+    """
+    Returns the exact score of the position for the player to move, by null-window searches
+    that halve the range the score can still be in, trying 0 and the middle of the winning
+    and the losing range first.
+    """
+    if can_win_next(current, mask):
+        return (N_CELLS + 1 - n_moves) // 2
+    lowest = -((N_CELLS - n_moves) // 2)
+    highest = (N_CELLS + 1 - n_moves) // 2
+    while lowest < highest:
+        middle = lowest + (highest - lowest) // 2
+        if middle <= 0 and int(lowest / 2) < middle:
+            middle = int(lowest / 2)
+        elif middle >= 0 and int(highest / 2) > middle:
+            middle = int(highest / 2)
+        result = negamax_solve(current, mask, n_moves, middle, middle + 1, table_keys, table_values, nodes)
+        if result <= middle:
+            highest = result
+        else:
+            lowest = result
+    return lowest
+
+
+def solve(position: Position, table: Optional[SolverTable] = None) -> Tuple[int, int]:
+    """
+    Returns (score for position.player, positions searched) of `position`, whose game must not be over.
+    """
+    if table is None:
+        table = SolverTable()
+    nodes = np.zeros(1, dtype=np.int64)
+    current = position.bitboards[player_index(position.player)]
+    score = solve_bitboards(current, position.mask, position.n_moves, table.keys, table.values, nodes)
+    return int(score), int(nodes[0])
+
+
+def solve_move(position: Position, table: Optional[SolverTable] = None) -> Tuple[int, int]:
+    """
+    Returns (best move, score for position.player) of `position`, whose game must not be
+    over. Of the moves that reach the score, the first in center-first order is chosen.
+    """
+    if table is None:
+        table = SolverTable()
+    nodes = np.zeros(1, dtype=np.int64)
+    current, mask = position.bitboards[player_index(position.player)], position.mask
+    score = int(solve_bitboards(current, mask, position.n_moves, table.keys, table.values, nodes))
+    columns = [int(column) for column in COLUMN_ORDER if position.can_play(column)]
+    for column in columns:
+        move = (mask + (1 << (column * BITBOARD_HEIGHT))) & column_mask(column)
+        if winning_cells(current, mask) & move:
+            return column, score
+        opponent, child_mask = current ^ mask, mask | move
+        if child_mask == BOARD_MASK:  # the last cell, a draw
+            child_score = 0
+        elif can_win_next(opponent, child_mask):
+            continue
+        else:  # the null window tells whether the opponent scores at most -score
+            child_score = -negamax_solve(opponent, child_mask, position.n_moves + 1, -score, -score + 1,
+                                         table.keys, table.values, nodes)
+        if child_score >= score:
+            return column, score
+    return columns[0], score  # every move loses at once
+
+
+def warm_up_solver():
+    """
+    Compiles the solver kernels, or loads them from the on-disk cache, on a position with two
+    empty cells left, which is solved at once.
+    """
+    table = SolverTable(1 << 4)
+    solve_bitboards(0, 0, N_CELLS - 2, table.keys, table.values, np.zeros(1, dtype=np.int64))
@@ -0,0 +1,48 @@
+"""
+Per-call timing of the end-state checks on boards taken from random games.
+Compares the scipy convolution check the agents used to run on every node against the
+bitboard check_end_state adapter and the last-move check_end_state_from_action.
+
+Run from the repository root with `python -m benchmarks.check_end_state`.
+"""
+import timeit
+import numpy as np
+from scipy import signal
+from agents.common import GameState, check_end_state, check_end_state_from_action
+from benchmarks.game_positions import random_game_states
+
+
+def convolution_check_end_state(board: np.ndarray, player) -> GameState:
+    """
+    The original check_end_state: four convolve2d calls and a full-board draw check.
+    """
+    kernels = (np.ones((4, 1)), np.ones((1, 4)), np.eye(4), np.eye(4)[::-1])
+    for kernel in kernels:
+        if np.any(signal.convolve2d(board, kernel, 'same') == player * 4):
+            return GameState.IS_WIN
+    if np.all(board != 0):
+        return GameState.IS_DRAW
+    return GameState.STILL_PLAYING
+
+
+def main(n_games=50, repeat=5):
+    states = random_game_states(n_games)
+    candidates = {
+        "convolve2d check_end_state": lambda: [convolution_check_end_state(s[0], s[1]) for s in states],
+        "bitboard check_end_state": lambda: [check_end_state(s[0], s[1]) for s in states],
+        "check_end_state_from_action": lambda: [check_end_state_from_action(*s[:5]) for s in states],
+        "Position.last_move_end_state": lambda: [s[5].last_move_end_state() for s in states],
+    }
+    results = [run() for run in candidates.values()]
+    assert all(result == results[0] for result in results), "end-state checks disagree"
+
+    baseline = None
+    print(f"{len(states)} positions from {n_games} random games")
+    for name, run in candidates.items():
+        per_call = min(timeit.repeat(run, number=1, repeat=repeat)) / len(states)
+        baseline = baseline or per_call
+        print(f"{name:32s} {per_call * 1e6:8.2f} us/call  {baseline / per_call:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
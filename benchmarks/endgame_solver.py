@@ -0,0 +1,32 @@
+"""
+Solve time of the exact endgame solver against the number of empty cells: median, 90th
+percentile and maximum time and positions searched of solve_move on positions reached by
+random play that avoids finished games. SOLVER_EMPTY_CELLS is chosen from this report so
+that solving stays within the move time of the agents.
+
+Run from the repository root with `python -m benchmarks.endgame_solver`.
+"""
+import time
+import numpy as np
+from agents.solver import SolverTable, solve, solve_move, warm_up_solver
+from benchmarks.game_positions import late_positions
+
+
+def main(empty_cells=range(8, 27, 2), n_positions=20):
+    warm_up_solver()
+    print("empty  median ms     p90 ms     max ms   median nodes    max nodes")
+    for empty in empty_cells:
+        times, nodes = [], []
+        for position in late_positions(n_positions, empty, seed=empty):
+            table = SolverTable()
+            t0 = time.perf_counter()
+            solve_move(position, table)
+            times.append(time.perf_counter() - t0)
+            nodes.append(solve(position, SolverTable())[1])
+        times = np.array(times) * 1000
+        print(f"{empty:5d} {np.median(times):10.2f} {np.percentile(times, 90):10.2f} {times.max():10.2f} "
+              f"{np.median(nodes):14.0f} {max(nodes):12d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Positions shared by the benchmarks and the tests, generated from fixed seeds.
+"""
+import numpy as np
+from agents.common import (
+    N_CELLS,
+    PLAYER1,
+    GameState,
+    Position,
+    other_player,
+    player_index,
+    column_height,
+    apply_player_action,
+    check_end_state_from_action,
+    initialize_game_state,
+)
+from agents.solver import can_win_next
+
+MIDGAME_BOARD = ("|==============|\n"
+                 "|              |\n"
+                 "|              |\n"
+                 "|      O       |\n"
+                 "|    X X O     |\n"
+                 "|    O X X     |\n"
+                 "|  X O O X O   |\n"
+                 "|==============|\n"
+                 "|0 1 2 3 4 5 6 |")  # PLAYER2 to move
+
+
+def random_game_states(n_games: int, seed=0) -> list:
+    """
+    Returns (board, player, action, row, n_moves, position) for every move of `n_games`
+    random games, where `player` made the move `action` into `row`.
+    """
+    rng = np.random.default_rng(seed)
+    states = []
+    for _ in range(n_games):
+        board = initialize_game_state()
+        position = Position.from_board(board, PLAYER1)
+        player = PLAYER1
+        n_moves = 0
+        while True:
+            action = int(rng.choice(position.valid_actions()))
+            row = column_height(board, action)
+            board = apply_player_action(board, action, player)
+            position = position.make_move(action)
+            n_moves += 1
+            states.append((board, player, action, row, n_moves, position))
+            if check_end_state_from_action(board, player, action, row, n_moves) != GameState.STILL_PLAYING:
+                break
+            player = other_player(player)
+    return states
+
+
+def late_positions(n_positions: int, empty_cells: int, seed=0) -> list:
+    """
+    Returns `n_positions` positions with `empty_cells` empty cells, each reached by random
+    moves that never end the game and, where possible, do not let the opponent win with the
+    next move, so that most positions are not decided at once. Games that have no move left
+    that does not end them are played again.
+    """
+    rng = np.random.default_rng(seed)
+    positions = []
+    while len(positions) < n_positions:
+        position = Position()
+        while N_CELLS - position.n_moves > empty_cells:
+            candidates = []
+            for move in position.valid_actions():
+                position.play(move)
+                if position.last_move_end_state() == GameState.STILL_PLAYING:
+                    quiet = not can_win_next(position.bitboards[player_index(position.player)], position.mask)
+                    candidates.append((quiet, move))
+                position.undo()
+            if not candidates:
+                break
+            quiet_moves = [move for quiet, move in candidates if quiet]
+            position.play(int(rng.choice(quiet_moves or [move for _, move in candidates])))
+        if N_CELLS - position.n_moves == empty_cells:
+            positions.append(position)
+    return positions
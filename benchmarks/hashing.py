@@ -0,0 +1,43 @@
+"""
+Throughput of the Zobrist position keys: incremental updates in Position.play/undo, and
+board_key on ndarray boards, on positions taken from random games.
+
+Run from the repository root with `python -m benchmarks.hashing`.
+"""
+import timeit
+from agents.common import Position, board_key
+from benchmarks.game_positions import random_game_states
+
+
+def play_undo(games: list):
+    """
+    Replays every game on one Position and takes all moves back again.
+    """
+    for moves in games:
+        position = Position()
+        for action in moves:
+            position.play(action)
+        for _ in moves:
+            position.undo()
+
+
+def main(n_games=200, repeat=5):
+    states = random_game_states(n_games)
+    games, moves = [], []
+    for board, player, action, row, n_moves, position in states:
+        if n_moves == 1 and moves:
+            games.append(moves)
+            moves = []
+        moves.append(action)
+    games.append(moves)
+
+    n_updates = 2 * len(states)
+    per_update = min(timeit.repeat(lambda: play_undo(games), number=1, repeat=repeat)) / n_updates
+    per_board = min(timeit.repeat(lambda: [board_key(s[0], s[1]) for s in states], number=1, repeat=repeat)) / len(states)
+    print(f"{len(states)} positions from {n_games} random games")
+    print(f"Position.play/undo with incremental key {per_update * 1e6:6.2f} us/move  {1 / per_update:10.0f} moves/s")
+    print(f"board_key on ndarray boards             {per_board * 1e6:6.2f} us/board {1 / per_board:10.0f} boards/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Leaf evaluations per second of the minimax heuristic on boards taken from random games.
+Compares the original heuristic, which slices every run of four out of the board with numpy
+fancy indexing and checks wins with convolutions, against the board adapter `heuristic` and
+the bitboard kernel heuristic_bitboards on the 69 precomputed windows. All three must give
+the same score on every board.
+
+Run from the repository root with `python -m benchmarks.heuristic`.
+"""
+import time
+import numpy as np
+from agents.common import NO_PLAYER, GameState, other_player, player_index
+from agents.agent_minimax.minimax import heuristic, heuristic_bitboards, warm_up_minimax
+from benchmarks.check_end_state import convolution_check_end_state
+from benchmarks.game_positions import random_game_states
+
+
+def original_connected_n(board: np.ndarray, player, n) -> int:
+    """
+    The original connected_n: one fancy-indexed slice and two masked sums per run of four.
+    """
+    count_n = 0
+    kernels = (np.ones((4, 1), dtype=np.int8), np.ones((1, 4), dtype=np.int8),
+               np.eye(4, dtype=np.int8)[::-1], np.eye(4, dtype=np.int8))
+    for kernel in kernels:
+        kernel_height, kernel_width = kernel.shape
+        for i in range(board.shape[0] - kernel_height + 1):
+            for j in range(board.shape[1] - kernel_width + 1):
+                sample_array = board[i:i + kernel_height, j:j + kernel_width][np.where(kernel)]
+                if (np.sum(sample_array[sample_array == player]) == player * n
+                        and len(sample_array[sample_array == NO_PLAYER]) == 4 - n):
+                    count_n += 1
+    return count_n
+
+
+def original_heuristic(board: np.ndarray, player) -> float:
+    """
+    The original heuristic for the maximizing player: up to four original_connected_n calls
+    and two convolution end-state checks.
+    """
+    score = 0
+    if convolution_check_end_state(board, player) == GameState.IS_WIN:
+        score = 1e15
+    else:
+        connected_threes = original_connected_n(board, player, 3)
+        score += 2e8 * connected_threes if connected_threes > 0 else 1e5 * original_connected_n(board, player, 2)
+    opponent = other_player(player)
+    if convolution_check_end_state(board, opponent) == GameState.IS_WIN:
+        score = -1e14
+    else:
+        connected_threes = original_connected_n(board, opponent, 3)
+        score -= 1e8 * connected_threes if connected_threes > 0 else 1e5 * original_connected_n(board, opponent, 2)
+    return score
+
+
+def main(n_games=20):
+    warm_up_minimax()
+    states = [(board, player, position) for board, player, *_, position in random_game_states(n_games)]
+    leaves = [(board, player, position.bitboards[player_index(player)],
+               position.bitboards[player_index(other_player(player))]) for board, player, position in states]
+
+    evaluations = (
+        ("original", lambda board, player, own, other: original_heuristic(board, player)),
+        ("heuristic", lambda board, player, own, other: heuristic(board, player, True)),
+        ("heuristic_bitboards", lambda board, player, own, other: heuristic_bitboards(own, other)),
+    )
+    scores = {}
+    for name, evaluate in evaluations:
+        t0 = time.perf_counter()
+        scores[name] = [evaluate(*leaf) for leaf in leaves]
+        elapsed = time.perf_counter() - t0
+        print(f"{name:20s} {len(leaves) / elapsed:12.0f} evaluations/s")
+    assert scores["heuristic"] == scores["original"] and scores["heuristic_bitboards"] == scores["original"]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Effective MCTS iterations per decision with and without subtree reuse. Plays MCTS against
+itself with a fixed time budget per move and reports the root visit count each decision
+was made with, which includes the visits carried over from the previous move.
+
+Run from the repository root with `python -m benchmarks.mcts_reuse`.
+"""
+import numpy as np
+from agents.common import PLAYER1, PLAYER2, GameState, Position, initialize_game_state
+from agents.agent_mcts.mcts import generate_move_mcts, warm_up_mcts
+
+
+def self_play(timeout: float, reuse_tree: bool) -> list:
+    """
+    Plays one game and returns the root visit count of every decision.
+    """
+    board = initialize_game_state()
+    position = Position.from_board(board, PLAYER1)
+    saved_state = {PLAYER1: None, PLAYER2: None}
+    root_visits = []
+    while position.last_move_end_state() == GameState.STILL_PLAYING:
+        player = position.player
+        action, saved_state[player] = generate_move_mcts(
+            position.to_board(), player, saved_state[player], timeout, False, reuse_tree
+        )
+        root_visits.append(saved_state[player].tree.rootnode.visits)
+        position.play(int(action))
+    return root_visits
+
+
+def main(n_games=4, timeout=0.25):
+    warm_up_mcts()
+    for reuse_tree in (False, True):
+        visits = np.concatenate([self_play(timeout, reuse_tree) for _ in range(n_games)])
+        print(f"reuse_tree={str(reuse_tree):5s}  {len(visits):4d} decisions  "
+              f"median {np.median(visits):8.0f}  mean {visits.mean():8.0f} root visits per decision")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""
+Iterations per second, selection time per iteration and memory per node of the MCTS tree,
+on the empty board and on a midgame position, for several exploration constants.
+
+Run from the repository root with `python -m benchmarks.mcts_tree`.
+"""
+import time
+from agents.common import PLAYER1, PLAYER2, initialize_game_state, string_to_board
+from agents.agent_mcts.mcts import MCTS, warm_up_mcts
+from benchmarks.game_positions import MIDGAME_BOARD
+
+
+def main(timeout=3, exploration_consts=(0.5, 1 / 2 ** 0.5, 1.0)):
+    warm_up_mcts()
+    positions = {
+        "empty board": (initialize_game_state(), PLAYER1),
+        "midgame": (string_to_board(MIDGAME_BOARD), PLAYER2),
+    }
+    for name, (board, player) in positions.items():
+        for exploration_const in exploration_consts:
+            tree = MCTS(player, board, timeout=timeout, exploration_const=exploration_const)
+            t0 = time.perf_counter()
+            tree.get_best_action()
+            elapsed = time.perf_counter() - t0
+            node_bytes = tree.bytes_per_node() * tree.capacity
+            print(f"{name:12s} c={exploration_const:.2f} {tree.n_iterations / elapsed:9.0f} iterations/s  "
+                  f"{tree.selection_time / tree.n_iterations * 1e6:5.2f} us selection/iteration  {tree.n_nodes:8d} nodes  "
+                  f"{tree.bytes_per_node():5.1f} bytes/node allocated  {node_bytes / tree.n_nodes:5.1f} bytes/node used")
+
+
+if __name__ == "__main__":
+    main()
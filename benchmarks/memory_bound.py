@@ -0,0 +1,24 @@
+"""
+Tree size, memory high-water mark and iterations per second of MCTS from the empty board with
+no node limit, and with node limits reached either by searching on with rollouts only or by
+recycling the least visited subtrees.
+
+Run from the repository root with `python -m benchmarks.memory_bound`.
+"""
+from agents.common import PLAYER1, initialize_game_state
+from agents.agent_mcts.mcts import MCTS, warm_up_mcts
+
+
+def main(limits=(None, 100_000, 10_000), timeout=4):
+    warm_up_mcts()
+    for max_nodes in limits:
+        for recycle in ((False,) if max_nodes is None else (False, True)):
+            tree = MCTS(PLAYER1, initialize_game_state(), timeout=timeout, max_nodes=max_nodes, recycle=recycle)
+            action = tree.get_best_action()
+            print(f"max_nodes={max_nodes!s:7} recycle={recycle!s:5}  {tree.rootnode.visits / timeout:8.0f} iterations/s  "
+                  f"high water {tree.high_water_nodes:8d} nodes {tree.high_water_bytes / 2**20:7.1f} MiB  "
+                  f"recycled {tree.n_recycled:8d}  action {action}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Batched leaf evaluation: wall time of alphabeta at depths 4, 6 and 8 on the positions of
+benchmarks.minimax_table with sibling leaves scored one by one and in one child_scores call,
+which must give the same results and node counts, and the throughput of heuristic_batch
+against heuristic called per board on a stack of boards from random games.
+
+Run from the repository root with `python -m benchmarks.minimax_batch`.
+"""
+import time
+import numpy as np
+from agents.common import PLAYER1
+from agents.agent_minimax.minimax import (
+    SearchCounters,
+    TranspositionTable,
+    alphabeta,
+    heuristic,
+    heuristic_batch,
+    warm_up_minimax,
+)
+from benchmarks.game_positions import random_game_states
+from benchmarks.minimax_table import positions
+
+
+def main(depths=(4, 6, 8), n_games=200):
+    warm_up_minimax()
+    for depth in depths:
+        results = {}
+        for batch in (False, True):
+            counters = SearchCounters()
+            t0 = time.perf_counter()
+            results[batch] = [alphabeta(board, player, depth, table=TranspositionTable(), counters=counters,
+                                        batch=batch) for board, player in positions()]
+            elapsed = time.perf_counter() - t0
+            results[batch].append(counters.nodes)
+            print(f"depth {depth}  {'batched' if batch else 'one by one':10s} {counters.nodes:9d} nodes  "
+                  f"{elapsed:7.3f} s")
+        assert results[True] == results[False]
+
+    boards = np.stack([board for board, *_ in random_game_states(n_games)])
+    t0 = time.perf_counter()
+    expected = [heuristic(board, PLAYER1, True) for board in boards]
+    single = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    scores = heuristic_batch(boards, PLAYER1)
+    batched = time.perf_counter() - t0
+    assert scores.tolist() == expected
+    print(f"heuristic        {len(boards) / single:12.0f} boards/s")
+    print(f"heuristic_batch  {len(boards) / batched:12.0f} boards/s")
+
+
+if __name__ == "__main__":
+    main()
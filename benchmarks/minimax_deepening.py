@@ -0,0 +1,41 @@
+"""
+Move latency and search depth of the minimax agent with a fixed depth against iterative
+deepening with a timeout, over games against the MCTS agent: median and p99 latency, and the
+depths the iterative deepening completed.
+
+Run from the repository root with `python -m benchmarks.minimax_deepening`.
+"""
+import time
+import numpy as np
+from agents.common import PLAYER1, PLAYER2, GameState, Position, initialize_game_state
+from agents.agent_mcts.mcts import generate_move_mcts, warm_up_mcts
+from agents.agent_minimax.minimax import generate_move_minimax, principal_variation, warm_up_minimax
+
+
+def main(depth=4, timeout=0.5, n_games=2):
+    warm_up_minimax()
+    warm_up_mcts()
+    for name, options in ((f"depth {depth}", {"depth": depth}), (f"timeout {timeout}s", {"timeout": timeout})):
+        latencies, depths = [], []
+        for game in range(n_games):
+            minimax_player = PLAYER1 if game % 2 == 0 else PLAYER2
+            position = Position.from_board(initialize_game_state(), PLAYER1)
+            saved_state = {PLAYER1: None, PLAYER2: None}
+            while position.last_move_end_state() == GameState.STILL_PLAYING:
+                player = position.player
+                if player == minimax_player:
+                    t0 = time.perf_counter()
+                    action, saved_state[player] = generate_move_minimax(
+                        position.to_board(), player, saved_state[player], **options)
+                    latencies.append(time.perf_counter() - t0)
+                    if "timeout" in options:
+                        depths.append(len(principal_variation(position, saved_state[player].table, 42)))
+                else:
+                    action, saved_state[player] = generate_move_mcts(position.to_board(), player, saved_state[player], 0.2)
+                position.play(int(action))
+        print(f"{name:14s} median {np.median(latencies) * 1000:8.1f} ms  p99 {np.percentile(latencies, 99) * 1000:8.1f} ms"
+              + (f"  principal variation length median {np.median(depths):.0f} max {max(depths)}" if depths else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Nodes searched, wall time and cutoff rates of alphabeta at depths 4, 6 and 8 on the
+positions of benchmarks.minimax_table, with the static center-first order (plus the
+transposition table move) and with killer moves, the history heuristic, or both. Each
+search gets a new transposition table. Every ordering must return the same action and value.
+
+The cutoff rate is the share of the nodes that searched their moves that failed high, and
+the first-move share the part of those that failed high on the first move searched; they
+are listed for the deepest remaining depths, where most nodes are.
+
+Run from the repository root with `python -m benchmarks.minimax_ordering`.
+"""
+import time
+from agents.agent_minimax.minimax import (
+    MoveOrdering,
+    SearchCounters,
+    TranspositionTable,
+    alphabeta,
+    warm_up_minimax,
+)
+from benchmarks.minimax_table import positions
+
+ORDERINGS = (
+    ("static", dict(killers=False, history=False)),
+    ("killers", dict(killers=True, history=False)),
+    ("history", dict(killers=False, history=True)),
+    ("killers + history", dict(killers=True, history=True)),
+)
+
+
+def main(depths=(4, 6, 8)):
+    warm_up_minimax()
+    for depth in depths:
+        expected = None
+        for name, options in ORDERINGS:
+            counters = SearchCounters()
+            results = []
+            t0 = time.perf_counter()
+            for board, player in positions():
+                results.append(alphabeta(board, player, depth, table=TranspositionTable(),
+                                         counters=counters, ordering=MoveOrdering(**options)))
+            elapsed = time.perf_counter() - t0
+            expected = expected or results
+            assert results == expected, (name, results, expected)
+            rates = "  ".join(f"d{remaining}: {rate:.2f}/{first:.2f}"
+                              for remaining, (_, rate, first) in counters.cutoff_rates().items() if remaining <= 3)
+            print(f"depth {depth}  {name:18s} {counters.nodes:9d} nodes  {elapsed:7.2f} s  "
+                  f"{counters.re_searches:6d} re-searches  cutoff rate/first-move share {rates}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""
+Speedup of the root-split parallel alphabeta over the serial search at depths 6 and 8 on
+the positions of benchmarks.minimax_table, for 1, 2, 4 and 8 worker processes. Every
+parallel search must return the same action and value as the serial one. Speedup is
+bounded by the number of cores of the machine the benchmark runs on, and by the first
+root move, which is always searched serially.
+
+Run from the repository root with `python -m benchmarks.minimax_root_split`.
+"""
+import os
+import time
+from agents.agent_minimax.minimax import SearchCounters, TranspositionTable, alphabeta, root_split_search, warm_up_minimax
+from benchmarks.minimax_table import positions
+
+
+def main(depths=(6, 8), worker_counts=(1, 2, 4, 8)):
+    warm_up_minimax()
+    print(f"{os.cpu_count()} cores")
+    for depth in depths:
+        counters = SearchCounters()
+        t0 = time.perf_counter()
+        expected = [alphabeta(board, player, depth, table=TranspositionTable(), counters=counters)
+                    for board, player in positions()]
+        serial = time.perf_counter() - t0
+        print(f"depth {depth}  serial     {counters.nodes:9d} nodes  {serial:7.2f} s")
+        for n_workers in worker_counts:
+            root_split_search(*positions()[0], 1, n_workers)  # start the pool outside the measurement
+            counters = SearchCounters()
+            t0 = time.perf_counter()
+            results = [root_split_search(board, player, depth, n_workers, counters=counters)
+                       for board, player in positions()]
+            elapsed = time.perf_counter() - t0
+            assert results == expected, (n_workers, results, expected)
+            print(f"depth {depth}  {n_workers} workers  {counters.nodes:9d} nodes  {elapsed:7.2f} s  "
+                  f"speedup {serial / elapsed:5.2f}  {counters.re_searches:3d} re-searches")
+
+
+if __name__ == "__main__":
+    main()
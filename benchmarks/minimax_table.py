@@ -0,0 +1,53 @@
+"""
+Nodes searched and wall time of alphabeta at depths 4, 6 and 8 on a fixed set of positions,
+without a transposition table, with a new table per position, and with one table kept over
+the whole set as generate_move_minimax keeps it between moves. With a new table, every
+search must return the same action and value as the plain search. The kept table also cuts
+off with deeper results of earlier positions, so it may return other values; the number of
+positions where it does is printed.
+
+Run from the repository root with `python -m benchmarks.minimax_table`.
+"""
+import time
+from agents.common import PLAYER1, PLAYER2, initialize_game_state, string_to_board, apply_player_action
+from agents.agent_minimax.minimax import SearchCounters, TranspositionTable, alphabeta, warm_up_minimax
+from benchmarks.game_positions import MIDGAME_BOARD
+
+
+def positions() -> list:
+    """
+    Returns (board, player to move) for the empty board, a short opening line played move by
+    move, and a midgame position.
+    """
+    board, player = initialize_game_state(), PLAYER1
+    result = [(board, player)]
+    for action in (3, 3, 2, 4):
+        board = apply_player_action(board, action, player)
+        player = PLAYER2 if player == PLAYER1 else PLAYER1
+        result.append((board, player))
+    result.append((string_to_board(MIDGAME_BOARD), PLAYER2))
+    return result
+
+
+def main(depths=(4, 6, 8)):
+    warm_up_minimax()
+    for depth in depths:
+        expected = None
+        shared_table = TranspositionTable()
+        for name, make_table in (("no table", lambda: None), ("table per position", TranspositionTable),
+                                 ("shared table", lambda: shared_table)):
+            counters = SearchCounters()
+            results = []
+            t0 = time.perf_counter()
+            for board, player in positions():
+                results.append(alphabeta(board, player, depth, table=make_table(), counters=counters))
+            elapsed = time.perf_counter() - t0
+            expected = expected or results
+            differ = sum(result != plain for result, plain in zip(results, expected))
+            assert name == "shared table" or differ == 0, (name, results, expected)
+            print(f"depth {depth}  {name:18s} {counters.nodes:10d} nodes  {elapsed:8.2f} s  "
+                  f"{counters.table_cutoffs:8d} table cutoffs  {differ} results differ")
+
+
+if __name__ == "__main__":
+    main()
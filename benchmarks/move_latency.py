@@ -0,0 +1,57 @@
+"""
+Move latency of the MCTS agent over a batch of self-play games: median and p99 of the time
+generate_move_mcts takes per move, measured from outside the call, against a fixed timeout
+with and without early stopping, and the time used per game against a per-game budget
+split by TimeManager.
+
+Run from the repository root with `python -m benchmarks.move_latency`.
+"""
+import time
+import numpy as np
+from agents.common import PLAYER1, PLAYER2, GameState, Position, initialize_game_state
+from agents.agent_mcts.mcts import generate_move_mcts, warm_up_mcts
+
+
+def play_timed_game(generate_move, latencies: list) -> float:
+    """
+    Plays generate_move against itself, appending the latency of every move to `latencies`.
+    Returns the time used by PLAYER1.
+    """
+    position = Position.from_board(initialize_game_state(), PLAYER1)
+    saved_state = {PLAYER1: None, PLAYER2: None}
+    used = {PLAYER1: 0.0, PLAYER2: 0.0}
+    while position.last_move_end_state() == GameState.STILL_PLAYING:
+        player = position.player
+        t0 = time.perf_counter()
+        action, saved_state[player] = generate_move(position.to_board(), player, saved_state[player])
+        latency = time.perf_counter() - t0
+        latencies.append(latency)
+        used[player] += latency
+        position.play(int(action))
+    return used[PLAYER1]
+
+
+def main(timeout=0.1, game_time=2.0, n_games=10):
+    warm_up_mcts()
+    for early_stop in (False, True):
+        latencies = []
+        for _ in range(n_games):
+            play_timed_game(lambda board, player, saved_state: generate_move_mcts(
+                board, player, saved_state, timeout, early_stop=early_stop), latencies)
+        over = (np.array(latencies) - timeout) * 1000
+        print(f"timeout {timeout}s early_stop={early_stop!s:5}  median {np.median(latencies) * 1000:7.1f} ms  "
+              f"p99 {np.percentile(latencies, 99) * 1000:7.1f} ms  p99 over the timeout {np.percentile(over, 99):+6.2f} ms")
+
+    latencies = []
+    game_times = [
+        play_timed_game(lambda board, player, saved_state: generate_move_mcts(
+            board, player, saved_state, game_time=game_time), latencies)
+        for _ in range(n_games)
+    ]
+    print(f"game budget {game_time}s  median {np.median(latencies) * 1000:7.1f} ms  "
+          f"p99 {np.percentile(latencies, 99) * 1000:7.1f} ms  "
+          f"time per game median {np.median(game_times):.3f}s max {np.max(game_times):.3f}s")
+
+
+if __name__ == "__main__":
+    main()
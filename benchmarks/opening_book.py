@@ -0,0 +1,52 @@
+"""
+Opening and lookup times of the opening book, and the time of the first moves of both agents
+with and without it. Uses the default book if it has been built, otherwise builds a small
+one (4 plies, depth 6) in a temporary directory first.
+
+Run from the repository root with `python -m benchmarks.opening_book`.
+"""
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+from agents.common import PLAYER1, Position
+from agents.opening_book import BOOK_PATH, OpeningBook, book_positions, build_book
+from agents.agent_mcts.mcts import generate_move_mcts, warm_up_mcts
+from agents.agent_minimax.minimax import generate_move_minimax, warm_up_minimax
+
+
+def main(max_ply=4, n_lookups=10000):
+    warm_up_mcts()
+    warm_up_minimax()
+    with tempfile.TemporaryDirectory() as directory:
+        path = BOOK_PATH
+        if not path.exists():
+            path = Path(directory) / "book.bin"
+            build_book(path, max_ply, depth=6, verbose=False)
+        t0 = time.perf_counter()
+        book = OpeningBook(path)
+        print(f"open {len(book)} positions  {(time.perf_counter() - t0) * 1e6:8.1f} us")
+
+        positions = book_positions(max_ply)
+        boards = [(position.to_board(), position.player) for position in positions]
+        rng = np.random.default_rng(0)
+        for name, lookup, items in (("lookup", book.lookup, [(position,) for position in positions]),
+                                    ("lookup_board", book.lookup_board, boards)):
+            sample = [items[i] for i in rng.integers(len(items), size=n_lookups)]
+            t0 = time.perf_counter()
+            for item in sample:
+                lookup(*item)
+            print(f"{name:12s} {(time.perf_counter() - t0) / n_lookups * 1e6:8.1f} us")
+
+        board = Position(PLAYER1).to_board()
+        for name, generate_move in (("minimax depth 6", lambda **kw: generate_move_minimax(board, PLAYER1, None, 6, **kw)),
+                                    ("mcts 1 s", lambda **kw: generate_move_mcts(board, PLAYER1, None, 1, **kw))):
+            for opening_book in (False, book):
+                t0 = time.perf_counter()
+                action, _ = generate_move(opening_book=opening_book)
+                print(f"{name:16s} {'book' if opening_book else 'search':6s} first move {action}  "
+                      f"{(time.perf_counter() - t0) * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Random rollouts per second of the scalar random_rollout kernel against batch_rollouts at
+several batch sizes, from the empty board and from a midgame position, and the MCTS iteration
+rate for several rollouts_per_leaf settings. Run once with the default settings and once with
+CONNECT4_JIT=0 to compare against the plain python scalar path.
+
+Run from the repository root with `python -m benchmarks.rollouts`.
+"""
+import time
+import numpy as np
+from agents.common import PLAYER1, PLAYER2, Position, initialize_game_state, string_to_board
+from agents.agent_mcts.mcts import MCTS, batch_rollouts, random_rollout, warm_up_mcts
+from benchmarks.game_positions import MIDGAME_BOARD
+
+
+def rollouts_per_second(run, n_rollouts: int, min_time=0.5) -> float:
+    """
+    Calls run() until min_time has passed and returns the rate, given n_rollouts per call.
+    """
+    n_calls = 0
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < min_time:
+        run()
+        n_calls += 1
+    return n_calls * n_rollouts / (time.perf_counter() - t0)
+
+
+def main(batch_sizes=(16, 64, 256, 1024, 4096), timeout=1):
+    warm_up_mcts()
+    positions = {
+        "empty board": Position.from_board(initialize_game_state(), PLAYER1),
+        "midgame": Position.from_board(string_to_board(MIDGAME_BOARD), PLAYER2),
+    }
+    for name, position in positions.items():
+        bitboard, other_bitboard = position.bitboards[::1 if position.player == PLAYER1 else -1]
+        print(name)
+        rate = rollouts_per_second(lambda: random_rollout(bitboard, other_bitboard, position.n_moves), 1)
+        print(f"  random_rollout            {rate:10.0f} rollouts/s")
+        for batch_size in batch_sizes:
+            bitboards = np.full(batch_size, bitboard, dtype=np.int64)
+            rate = rollouts_per_second(lambda: batch_rollouts(bitboards, other_bitboard, position.n_moves), batch_size)
+            print(f"  batch_rollouts {batch_size:5d}      {rate:10.0f} rollouts/s")
+
+    for rollouts_per_leaf in (1, 16, 64, 256):
+        tree = MCTS(PLAYER1, initialize_game_state(), timeout=timeout, rollouts_per_leaf=rollouts_per_leaf)
+        tree.get_best_action()
+        iterations = tree.rootnode.visits / timeout
+        print(f"MCTS rollouts_per_leaf={rollouts_per_leaf:4d} {iterations:9.0f} iterations/s "
+              f"{iterations * rollouts_per_leaf:10.0f} rollouts/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Scaling of root-parallel MCTS: total iterations per second from the empty board and the
+score against single-process MCTS with the same time per move, for 1, 2, 4 and 8 workers.
+Scaling is bounded by the number of cores of the machine the benchmark runs on.
+
+Run from the repository root with `python -m benchmarks.root_parallel`.
+"""
+import os
+from agents.common import PLAYER1, PLAYER2, GameState, Position, initialize_game_state
+from agents.agent_mcts.mcts import generate_move_mcts, root_parallel_search, warm_up_mcts
+
+
+def play_game(generate_moves: dict):
+    """
+    Plays one game between the move generators in `generate_moves` (keyed by player) and
+    returns the winner, or None for a draw.
+    """
+    position = Position.from_board(initialize_game_state(), PLAYER1)
+    saved_state = {PLAYER1: None, PLAYER2: None}
+    while True:
+        player = position.player
+        action, saved_state[player] = generate_moves[player](position.to_board(), player, saved_state[player])
+        position.play(int(action))
+        end_state = position.last_move_end_state()
+        if end_state == GameState.IS_WIN:
+            return player
+        if end_state == GameState.IS_DRAW:
+            return None
+
+
+def main(worker_counts=(1, 2, 4, 8), timeout=0.5, n_games=4):
+    warm_up_mcts()
+    print(f"{os.cpu_count()} cores")
+    board = initialize_game_state()
+    for n_workers in worker_counts:
+        root_parallel_search(board, PLAYER1, n_workers, 0.1)  # start the pool outside the measurement
+        _, visits, _ = root_parallel_search(board, PLAYER1, n_workers, timeout)
+
+        def parallel(board, player, saved_state):
+            return generate_move_mcts(board, player, saved_state, timeout, n_workers=n_workers)
+
+        def single(board, player, saved_state):
+            return generate_move_mcts(board, player, saved_state, timeout, reuse_tree=False)
+
+        score = 0.0
+        for game in range(n_games):  # alternate who moves first
+            players = (PLAYER1, PLAYER2) if game % 2 == 0 else (PLAYER2, PLAYER1)
+            winner = play_game({players[0]: parallel, players[1]: single})
+            score += 0.5 if winner is None else float(winner == players[0])
+        print(f"{n_workers} workers  {visits.sum() / timeout:9.0f} iterations/s  "
+              f"score {score:.1f}/{n_games} against 1 process")
+
+
+if __name__ == "__main__":
+    main()
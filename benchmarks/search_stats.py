@@ -0,0 +1,30 @@
+"""
+Overhead of the MCTS search statistics: iterations per second with the default statistics,
+with a callback every 1000 iterations and with every phase timed (profile=True), and the
+time split between the phases of the profiled search, on the empty board.
+
+Run from the repository root with `python -m benchmarks.search_stats`.
+"""
+from agents.common import PLAYER1, initialize_game_state
+from agents.agent_mcts.mcts import MCTS, warm_up_mcts
+
+
+def main(timeout=3):
+    warm_up_mcts()
+    settings = {
+        "default": {},
+        "callback": {"callback": lambda stats: None, "callback_interval": 1000},
+        "profile": {"profile": True},
+    }
+    for name, options in settings.items():
+        tree = MCTS(PLAYER1, initialize_game_state(), timeout=timeout, **options)
+        tree.get_best_action()
+        stats = tree.stats
+        print(f"{name:9s} {stats.iterations_per_second:9.0f} iterations/s  depth max {stats.max_depth} "
+              f"mean {stats.mean_depth:.1f}  {stats.n_nodes} nodes")
+    phases = ("selection", "expansion", "simulation", "backpropagation")
+    print("  ".join(f"{phase} {getattr(stats, phase + '_time') / stats.elapsed:.1%}" for phase in phases))
+
+
+if __name__ == "__main__":
+    main()
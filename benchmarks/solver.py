@@ -0,0 +1,57 @@
+"""
+Time and iterations to decision of MCTS with and without the MCTS-Solver on tactical
+positions: an immediate win, a double threat to set up, and a lost position against a double
+threat. Both searches use early stopping and a 4 second timeout.
+
+Run from the repository root with `python -m benchmarks.solver`.
+"""
+import time
+from agents.common import PLAYER1, PLAYER2, string_to_board
+from agents.agent_mcts.mcts import MCTS, warm_up_mcts
+
+POSITIONS = {
+    "win in 1": (PLAYER2, "|==============|\n"
+                          "|              |\n"
+                          "|              |\n"
+                          "|              |\n"
+                          "|              |\n"
+                          "|    X O       |\n"
+                          "|  X X O O   O |\n"
+                          "|==============|\n"
+                          "|0 1 2 3 4 5 6 |"),
+    "win in 3": (PLAYER1, "|==============|\n"
+                          "|              |\n"
+                          "|              |\n"
+                          "|              |\n"
+                          "|              |\n"
+                          "|      O       |\n"
+                          "|    X X     O |\n"
+                          "|==============|\n"
+                          "|0 1 2 3 4 5 6 |"),
+    "lost": (PLAYER2, "|==============|\n"
+                      "|              |\n"
+                      "|              |\n"
+                      "|              |\n"
+                      "|              |\n"
+                      "|      O       |\n"
+                      "|O   X X X     |\n"
+                      "|==============|\n"
+                      "|0 1 2 3 4 5 6 |"),
+}
+
+
+def main(timeout=4):
+    warm_up_mcts()
+    for name, (player, pretty_board) in POSITIONS.items():
+        board = string_to_board(pretty_board)
+        for solver in (False, True):
+            tree = MCTS(player, board, timeout=timeout, early_stop=True, solver=solver)
+            t0 = time.perf_counter()
+            action = tree.get_best_action()
+            elapsed = time.perf_counter() - t0
+            print(f"{name:9} solver={solver!s:5}  action {action}  {elapsed * 1000:8.1f} ms  "
+                  f"{tree.rootnode.visits:8d} iterations  root proven {tree.proven[0]:+d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""
+Nodes allocated, nodes deduplicated through the transposition table and iterations per second
+of MCTS with and without transpositions, from the empty board and from a midgame position.
+
+Run from the repository root with `python -m benchmarks.transpositions`.
+"""
+from agents.common import PLAYER1, PLAYER2, initialize_game_state, string_to_board
+from agents.agent_mcts.mcts import MCTS, warm_up_mcts
+from benchmarks.game_positions import MIDGAME_BOARD
+
+
+def main(timeout=2):
+    warm_up_mcts()
+    positions = {
+        "empty board": (initialize_game_state(), PLAYER1),
+        "midgame": (string_to_board(MIDGAME_BOARD), PLAYER2),
+    }
+    for name, (board, player) in positions.items():
+        print(name)
+        for transpositions in (False, True):
+            tree = MCTS(player, board, timeout=timeout, transpositions=transpositions)
+            tree.get_best_action()
+            iterations = tree.rootnode.visits
+            print(f"  transpositions={transpositions!s:5}  {iterations / timeout:9.0f} iterations/s "
+                  f"{tree.n_nodes:8d} nodes {tree.n_deduplicated:8d} deduplicated "
+                  f"({tree.n_deduplicated / iterations:.1%} of expansions)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+MCTS iterations per second of tree-parallel search (MCTS.search_threads, one tree shared by
+several threads with virtual loss) at 1, 2, 4 and 8 threads, next to the single-threaded
+search loop, from the empty board and from a midgame position, with one and with 8 rollouts per
+leaf. The threads run in parallel in the descent, rollout and backpropagation kernels, which
+release the GIL, and only take the tree lock to expand a node, so with CONNECT4_JIT=0 no
+speedup is expected.
+
+Run from the repository root with `python -m benchmarks.tree_parallel`.
+"""
+import os
+import time
+from agents.common import PLAYER1, PLAYER2, initialize_game_state, string_to_board
+from agents.agent_mcts.mcts import MCTS, warm_up_mcts
+from benchmarks.game_positions import MIDGAME_BOARD
+
+
+def iterations_per_second(board, player, n_threads: int, timeout: float, rollouts_per_leaf: int = 1) -> float:
+    """Runs search_threads with `n_threads` threads, or the search loop for 0 threads."""
+    tree = MCTS(player, board, timeout=timeout, n_threads=max(n_threads, 1), rollouts_per_leaf=rollouts_per_leaf)
+    if n_threads:
+        tree.search_threads(time.perf_counter() + timeout)
+    else:
+        tree.get_best_action()
+    return tree.rootnode.visits / timeout
+
+
+def main(thread_counts=(2, 4, 8), timeout=2):
+    warm_up_mcts()
+    print(f"{os.cpu_count()} cpu cores")
+    positions = {
+        "empty board": (initialize_game_state(), PLAYER1),
+        "midgame": (string_to_board(MIDGAME_BOARD), PLAYER2),
+    }
+    for name, (board, player) in positions.items():
+        for rollouts_per_leaf in (1, 8):
+            print(f"{name}, {rollouts_per_leaf} rollouts per leaf")
+            loop = iterations_per_second(board, player, 0, timeout, rollouts_per_leaf)
+            base = iterations_per_second(board, player, 1, timeout, rollouts_per_leaf)
+            print(f"  search loop     {loop:9.0f} iterations/s")
+            print(f"  1 thread        {base:9.0f} iterations/s")
+            for n_threads in thread_counts:
+                rate = iterations_per_second(board, player, n_threads, timeout, rollouts_per_leaf)
+                print(f"  {n_threads} threads       {rate:9.0f} iterations/s  x{rate / base:.2f}")
+
+
+if __name__ == "__main__":
+    main()
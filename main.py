@@ -1,9 +1,10 @@
+from functools import partial
 from typing import Callable
 from agents.common import GenMove
 from agents.agent_human_user import user_move
 from agents.agent_random.random import generate_move_random
 from agents.agent_minimax.minimax import generate_move_minimax
-from agents.agent_mcts.mcts import generate_move_mcts
+from agents.agent_mcts.mcts import generate_move_mcts, warm_up_mcts
 
 
 def human_vs_agent(
@@ -22,7 +23,8 @@ def human_vs_agent(
         initialize_game_state,
         pretty_print_board,
         apply_player_action,
-        check_end_state,
+        column_height,
+        check_end_state_from_action,
     )
 
     players = (PLAYER1, PLAYER2)
@@ -36,6 +38,7 @@ def human_vs_agent(
         player_names = (player_1, player_2)[::play_first]
         gen_args = (args_1, args_2)[::play_first]
 
+        n_moves = 0
         playing = True
         while playing:
             for player, player_name, gen_move, args in zip(
@@ -53,8 +56,10 @@ def human_vs_agent(
                     board.copy(), player, saved_state[player], *args
                 )
                 print(f"Move time: {time.time() - t0:.3f}s")
+                row = column_height(board, action)
                 board = apply_player_action(board, action, player)
-                end_state = check_end_state(board, player)
+                n_moves += 1
+                end_state = check_end_state_from_action(board, player, action, row, n_moves)
                 if end_state != GameState.STILL_PLAYING:
                     print(pretty_print_board(board))
                     if end_state == GameState.IS_DRAW:
@@ -66,6 +71,10 @@ def human_vs_agent(
                     playing = False
                     break
 
+        for state in saved_state.values():
+            if state is not None:
+                state.stop()
+
 
 if __name__ == "__main__":
-    human_vs_agent(generate_move_mcts)
+    human_vs_agent(partial(generate_move_mcts, ponder=True, opening_book=True), init_1=warm_up_mcts)
@@ -0,0 +1,42 @@
+"""
+Fixtures of the positions in benchmarks.game_positions, shared by the test modules.
+"""
+import numpy as np
+import pytest
+from agents.common import *
+from benchmarks import game_positions
+
+
+@pytest.fixture(scope="session")
+def random_game_states() -> list:
+    """
+    The states of game_positions.random_game_states for 10 games.
+    """
+    return game_positions.random_game_states(10, seed=5)
+
+
+@pytest.fixture(scope="session")
+def search_positions(random_game_states) -> list:
+    """
+    (board, player to move) of every 12th of the random_game_states where the game goes on,
+    and of game_positions.MIDGAME_BOARD. Ordered by the number of pieces, so that tables
+    kept between the searches never hold results searched deeper than the search at hand
+    needs.
+    """
+    positions = [(board, other_player(player)) for board, player, *_, position in random_game_states[::12]
+                 if position.last_move_end_state() == GameState.STILL_PLAYING]
+    positions.append((string_to_board(game_positions.MIDGAME_BOARD), PLAYER2))
+    return sorted(positions, key=lambda state: np.count_nonzero(state[0]))
+
+
+@pytest.fixture
+def midgame_board() -> np.ndarray:
+    return string_to_board(game_positions.MIDGAME_BOARD)
+
+
+@pytest.fixture(scope="session")
+def late_positions():
+    """
+    game_positions.late_positions, for tests that choose the number of empty cells.
+    """
+    return game_positions.late_positions
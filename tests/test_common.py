@@ -178,4 +178,200 @@ def test_check_end_state_draw():
     )
     board = string_to_board(pretty_off_full_board)
     assert check_end_state(board, PLAYER2) == GameState.IS_DRAW
-    assert check_end_state(board, PLAYER1) == GameState.IS_DRAW
\ No newline at end of file
+    assert check_end_state(board, PLAYER1) == GameState.IS_DRAW
+
+def test_position_round_trip():
+    from agents.common import Position
+
+    pretty_board = (
+    "|==============|\n"
+    "|              |\n"
+    "|              |\n"
+    "|      O       |\n"
+    "|      X X     |\n"
+    "|    O O X     |\n"
+    "|  X X O O     |\n"
+    "|==============|\n"
+    "|0 1 2 3 4 5 6 |"
+    )
+    board = string_to_board(pretty_board)
+    position = Position.from_board(board, PLAYER1)
+
+    assert position.heights == [0, 1, 2, 4, 3, 0, 0]
+    assert position.n_moves == 10
+    assert np.all(position.to_board() == board)
+
+
+def test_position_make_move():
+    from agents.common import Position
+
+    board = initialize_game_state()
+    position = Position.from_board(board, PLAYER1)
+    child = position.make_move(0).make_move(0)
+
+    assert position.n_moves == 0
+    assert child.player == PLAYER1
+    assert np.all(child.to_board() == apply_player_action(apply_player_action(board, 0, PLAYER1), 0, PLAYER2))
+
+
+def test_position_make_move_full_column():
+    from agents.common import Position
+
+    position = Position.from_board(initialize_game_state(), PLAYER1)
+    for _ in range(6):
+        position = position.make_move(0)
+
+    assert position.valid_actions() == [1, 2, 3, 4, 5, 6]
+    pytest.raises(ValueError, position.make_move, 0)
+
+
+def test_legal_moves_mask():
+    from agents.common import Position, BITBOARD_HEIGHT
+
+    position = Position.from_board(initialize_game_state(), PLAYER1)
+    for _ in range(6):
+        position = position.make_move(0)
+    position = position.make_move(1)
+
+    legal_cells = [column * BITBOARD_HEIGHT + height for column, height in enumerate(position.heights) if height < 6]
+    assert position.legal_moves_mask() == sum(1 << cell for cell in legal_cells)
+
+
+def test_bitboard_connected_four_matches_board():
+    from agents.common import Position
+
+    pretty_off_diagonal_board = (
+    "|==============|\n"
+    "|      O       |\n"
+    "|      O       |\n"
+    "|    X O       |\n"
+    "|    X X       |\n"
+    "|    O O X     |\n"
+    "|    O X X X   |\n"
+    "|==============|\n"
+    "|0 1 2 3 4 5 6 |"
+    )
+    position = Position.from_board(string_to_board(pretty_off_diagonal_board), PLAYER1)
+
+    assert position.connected_four(PLAYER1)
+    assert not position.connected_four(PLAYER2)
+
+
+def test_check_end_state_from_action_win():
+    from agents.common import check_end_state_from_action
+
+    pretty_diagonal_board = (
+    "|==============|\n"
+    "|      O       |\n"
+    "|      O       |\n"
+    "|      O   X   |\n"
+    "|      X X X   |\n"
+    "|  X O X O O   |\n"
+    "|  X X X O X   |\n"
+    "|==============|\n"
+    "|0 1 2 3 4 5 6 |"
+    )
+    board = string_to_board(pretty_diagonal_board)
+    assert check_end_state_from_action(board, PLAYER1, 5, 3, 22) == GameState.IS_WIN
+    assert check_end_state_from_action(board, PLAYER1, 2, 0, 22) == GameState.IS_WIN
+    assert check_end_state_from_action(board, PLAYER2, 3, 5, 22) == GameState.STILL_PLAYING
+
+
+def test_check_end_state_from_action_draw():
+    from agents.common import check_end_state_from_action
+
+    pretty_off_full_board = (
+    "|==============|\n"
+    "|O X O X O X O |\n"
+    "|O X O X O X O |\n"
+    "|X O X O X O X |\n"
+    "|X O X O X O X |\n"
+    "|O X O X O X O |\n"
+    "|O X O X O X O |\n"
+    "|==============|\n"
+    "|0 1 2 3 4 5 6 |"
+    )
+    board = string_to_board(pretty_off_full_board)
+    assert check_end_state_from_action(board, PLAYER2, 6, 5, 42) == GameState.IS_DRAW
+    assert check_end_state_from_action(board, PLAYER2, 6, 5, 41) == GameState.STILL_PLAYING
+
+
+def test_position_last_move_end_state():
+    from agents.common import Position
+
+    position = Position.from_board(initialize_game_state(), PLAYER1)
+    for action in (0, 1, 0, 1, 0, 1):
+        position = position.make_move(action)
+    assert position.last_move_end_state() == GameState.STILL_PLAYING
+    assert position.make_move(0).last_move_end_state() == GameState.IS_WIN
+
+
+def test_position_play_undo():
+    from agents.common import Position
+
+    position = Position.from_board(initialize_game_state(), PLAYER1)
+    for action in (3, 3, 4, 0):
+        position.play(action)
+    board = position.to_board()
+    position.play(3)
+    assert position.undo() == 3
+
+    assert position.player == PLAYER1
+    assert position.heights == [1, 0, 0, 2, 1, 0, 0]
+    assert np.all(position.to_board() == board)
+    for _ in range(4):
+        position.undo()
+    assert position.bitboards == [0, 0] and position.n_moves == 0
+    pytest.raises(ValueError, position.undo)
+
+
+def test_position_key_transposition():
+    from agents.common import Position
+
+    position_1 = Position().play(3).play(2).play(4)
+    position_2 = Position().play(4).play(2).play(3)
+    position_3 = Position().play(3).play(4).play(2)
+
+    assert position_1.key == position_2.key
+    assert position_1.key != position_3.key
+    position_1.undo()
+    position_2.undo()
+    assert position_1.key != position_2.key
+
+
+def test_board_key_matches_position_key():
+    from agents.common import Position, board_key
+
+    position = Position()
+    for action in (3, 3, 4, 0, 6, 6, 6):
+        position.play(action)
+        board = position.to_board()
+        assert board_key(board, position.player) == position.key
+        assert board_key(board, PLAYER1) != board_key(board, PLAYER2)
+
+
+def test_time_manager_splits_budget_by_phase():
+    from agents.common import N_CELLS, TimeManager
+    manager = TimeManager(10.0)
+    opening, middle = manager.move_time(0), manager.move_time(10)
+    assert 0 < opening < middle
+    total = 0
+    for n_moves in range(0, N_CELLS, 2):
+        move_time = manager.move_time(n_moves)
+        manager.spend(move_time)
+        total += move_time
+    assert abs(total - 10.0) < 1e-9
+    assert manager.move_time(0) == manager.min_move_time
+
+
+def test_time_manager_leaves_no_time_for_solved_moves():
+    from agents.common import N_CELLS, TimeManager
+    manager = TimeManager(10.0, solved_empty_cells=20)
+    assert manager.move_time(10) > TimeManager(10.0).move_time(10)
+    total = 0
+    for n_moves in range(0, N_CELLS - 20, 2):
+        move_time = manager.move_time(n_moves)
+        manager.spend(move_time)
+        total += move_time
+    assert abs(total - 10.0) < 1e-9
+    assert manager.move_time(N_CELLS - 20) == manager.min_move_time
@@ -1,3 +1,5 @@
+import time
+import pytest
 from mimetypes import init
 from agents.common import *
 from agents.agent_mcts.mcts import *
@@ -149,3 +151,391 @@ def test_expand_on_limited_actions():
     mcts = MCTS(PLAYER2, board, 10, False)
     _ = mcts.get_best_action()
     assert len(mcts.rootnode.children) == 2
+
+
+def test_random_rollout_on_finished_game():
+    pretty_board = ("|==============|\n"
+                    "|              |\n"
+                    "|              |\n"
+                    "|              |\n"
+                    "|              |\n"
+                    "|    X O       |\n"
+                    "|  X X O O O O |\n"
+                    "|==============|\n"
+                    "|0 1 2 3 4 5 6 |")
+
+    position = Position.from_board(string_to_board(pretty_board), PLAYER1)
+    assert random_rollout(position.bitboards[0], position.bitboards[1], position.n_moves) == -1
+
+
+def test_node_pool_grows():
+    board = initialize_game_state()
+    mcts = MCTS(PLAYER1, board, 200, False, initial_capacity=4)
+    _ = mcts.get_best_action()
+
+    assert mcts.n_nodes == 201
+    assert mcts.capacity >= mcts.n_nodes
+    assert mcts.rootnode.visits == 200
+    assert sum(child.visits for child in mcts.rootnode.children.values()) == 200
+    for action, child in mcts.rootnode.children.items():
+        assert child.parent.index == 0
+        assert np.all(child.position.to_board() == apply_player_action(board, action, PLAYER1))
+
+
+def test_generate_move_reuses_subtree():
+    board = initialize_game_state()
+    action, saved_state = generate_move_mcts(board, PLAYER1, None, False, 500)
+    child = saved_state.tree.rootnode.children[action]
+    reply, grandchild = max(child.children.items(), key=lambda item: item[1].visits)
+    reused_visits = grandchild.visits
+
+    board = apply_player_action(apply_player_action(board, action, PLAYER1), reply, PLAYER2)
+    _, saved_state = generate_move_mcts(board, PLAYER1, saved_state, False, 500)
+    tree = saved_state.tree
+
+    assert tree.rootnode.visits == reused_visits + 500
+    assert np.all(tree.rootnode.position.to_board() == board)
+    for index in range(1, tree.n_nodes):
+        parent = tree.parent[index]
+        assert 0 <= parent < index
+        assert tree.children[parent, tree.action[index]] == index
+
+
+def test_generate_move_updates_reused_tree_options():
+    board = initialize_game_state()
+    action, saved_state = generate_move_mcts(board, PLAYER1, None, False, 200, solver=False)
+    tree = saved_state.tree
+    reply = int(np.argmax(np.where(tree.children[tree.children[0, action]] >= 0,
+                                   tree.child_visits[tree.children[0, action]], -1)))
+
+    board = apply_player_action(apply_player_action(board, action, PLAYER1), reply, PLAYER2)
+    _, saved_state = generate_move_mcts(board, PLAYER1, saved_state, False, 200, solver=True,
+                                        max_bytes=64 * NODE_BYTES, recycle=True)
+
+    assert saved_state.tree is tree
+    assert tree.solver
+    assert tree.node_limit == 64
+    assert tree.n_nodes <= 64
+
+
+def test_generate_move_without_matching_subtree():
+    board = initialize_game_state()
+    _, saved_state = generate_move_mcts(board, PLAYER1, None, False, 50)
+    board = apply_player_action(board, 0, PLAYER2)
+    _, saved_state = generate_move_mcts(board, PLAYER1, saved_state, False, 50)
+
+    assert saved_state.tree.rootnode.visits == 50
+
+
+def test_batch_rollouts_on_finished_game():
+    pretty_board = ("|==============|\n"
+                    "|              |\n"
+                    "|              |\n"
+                    "|              |\n"
+                    "|              |\n"
+                    "|    X O       |\n"
+                    "|  X X O O O O |\n"
+                    "|==============|\n"
+                    "|0 1 2 3 4 5 6 |")
+
+    position = Position.from_board(string_to_board(pretty_board), PLAYER1)
+    outcomes = batch_rollouts(np.full(8, position.bitboards[0]), position.bitboards[1], position.n_moves)
+    assert np.all(outcomes == -1)
+
+
+def test_batch_rollouts_play_to_the_end():
+    outcomes = batch_rollouts(np.zeros(200, dtype=np.int64), 0, 0)
+    assert outcomes.shape == (200,)
+    assert set(np.unique(outcomes)) <= {-1, 0, 1}
+    assert np.any(outcomes == 1) and np.any(outcomes == -1)
+
+
+def test_simulate_batch_on_winning_node():
+    pretty_board = ("|==============|\n"
+                    "|              |\n"
+                    "|              |\n"
+                    "|              |\n"
+                    "|              |\n"
+                    "|    X O       |\n"
+                    "|  X X O O   O |\n"
+                    "|==============|\n"
+                    "|0 1 2 3 4 5 6 |")
+
+    board = string_to_board(pretty_board)
+    mcts = MCTS(PLAYER2, board, 7, False, rollouts_per_leaf=16)
+    _ = mcts.get_best_action()
+    assert mcts.simulate_batch(mcts.rootnode.children[5], 16) == 1
+    assert mcts.rootnode.children[5].wins == 1
+
+
+def test_root_parallel_search_finds_win():
+    pretty_board = ("|==============|\n"
+                    "|              |\n"
+                    "|              |\n"
+                    "|              |\n"
+                    "|              |\n"
+                    "|    X O       |\n"
+                    "|  X X O O   O |\n"
+                    "|==============|\n"
+                    "|0 1 2 3 4 5 6 |")
+
+    board = string_to_board(pretty_board)
+    action, visits, wins = root_parallel_search(board, PLAYER2, 2, False, 500)
+    assert action == 5
+    assert visits.sum() == 1000
+    assert np.all(wins <= visits)
+
+
+def test_root_parallel_search_passes_options_and_deadline():
+    pretty_board = ("|==============|\n"
+                    "|              |\n"
+                    "|              |\n"
+                    "|              |\n"
+                    "|              |\n"
+                    "|    X O       |\n"
+                    "|  X X O O   O |\n"
+                    "|==============|\n"
+                    "|0 1 2 3 4 5 6 |")
+
+    board = string_to_board(pretty_board)
+    action, visits, _ = root_parallel_search(board, PLAYER2, 2, False, 200, solver=True, early_stop=True,
+                                             transpositions=True, max_bytes=1 << 20)
+    assert action == 5
+    assert 0 < visits.sum() <= 400
+
+    # the workers get the time left until the deadline, not the full timeout
+    start = time.perf_counter()
+    action, _, _ = root_parallel_search(board, PLAYER2, 2, timeout=10, deadline=start - 1)
+    assert time.perf_counter() - start < 5
+    assert 0 <= action < 7
+
+
+def test_tree_parallel_search_finds_win():
+    pretty_board = ("|==============|\n"
+                    "|              |\n"
+                    "|              |\n"
+                    "|              |\n"
+                    "|              |\n"
+                    "|    X O       |\n"
+                    "|  X X O O   O |\n"
+                    "|==============|\n"
+                    "|0 1 2 3 4 5 6 |")
+
+    board = string_to_board(pretty_board)
+    tree = MCTS(PLAYER2, board, iterations=1000, timeout=False, n_threads=4)
+    assert tree.get_best_action() == 5
+    assert tree.rootnode.visits == 1000
+    assert not tree.virtual_loss[:tree.n_nodes].any()
+
+
+def test_search_threads_grows_tree_and_plays_every_rollout():
+    tree = MCTS(PLAYER1, initialize_game_state(), iterations=2000, timeout=False, initial_capacity=16,
+                rollouts_per_leaf=4, n_threads=4)
+    tree.get_best_action()
+    assert tree.rootnode.visits == 2000
+    assert tree.stats.rollouts == 8000
+    assert tree.capacity > 16
+    assert not tree.virtual_loss[:tree.n_nodes].any()
+    nodes = np.arange(1, tree.n_nodes)
+    assert np.all(tree.child_visits[tree.parent[nodes], tree.action[nodes]] == tree.visits[nodes])
+
+
+def test_get_best_action_without_search_plays_legal_move():
+    board = initialize_game_state()
+    board[:, 3] = np.array([PLAYER1, PLAYER2] * 3)
+    tree = MCTS(PLAYER1, board, iterations=False, timeout=False)
+    assert tree.get_best_action() == 4
+    assert tree.n_nodes == 1
+
+
+@pytest.mark.parametrize("n_threads", [1, 4])
+def test_transpositions_share_nodes(n_threads):
+    tree = MCTS(PLAYER1, initialize_game_state(), iterations=3000, timeout=False, transpositions=True,
+                initial_capacity=16, n_threads=n_threads)
+    tree.get_best_action()
+    assert tree.n_deduplicated > 0
+    assert tree.rootnode.visits == 3000
+    assert not tree.virtual_loss[:tree.n_nodes].any()
+    keys = tree.key[:tree.n_nodes]
+    assert len(np.unique(keys)) == tree.n_nodes  # every position is stored once
+    for node in range(tree.n_nodes):
+        position = Node(tree, node).position
+        assert position.key == keys[node]
+        for column, child in enumerate(tree.children[node]):
+            if child >= 0:  # every edge leads to the position its move reaches
+                assert Node(tree, child).position.key == position.copy().play(column).key
+
+
+def test_transpositions_survive_reroot():
+    board = initialize_game_state()
+    tree = MCTS(PLAYER1, board, iterations=2000, timeout=False, transpositions=True)
+    tree.get_best_action()
+    board[0, 3] = PLAYER1
+    board[0, 2] = PLAYER2
+    node = tree.find_node(board, PLAYER1)
+    tree.reroot(node)
+    assert tree.transpositions[int(tree.key[0])] == 0
+    for key, index in tree.transpositions.items():
+        assert index < tree.n_nodes and tree.key[index] == key
+
+
+def test_pondering_grows_tree_for_reply():
+    board = initialize_game_state()
+    action, saved_state = generate_move_mcts(board, PLAYER1, None, False, 200, ponder=True,
+                                             ponder_max_bytes=5000 * NODE_BYTES)
+    tree = saved_state.tree
+    assert tree.ponder_thread is not None
+    time.sleep(0.5)
+    saved_state.stop()
+    assert tree.ponder_thread is None
+    assert 200 < tree.n_nodes <= tree.capacity
+    assert tree.memory_bytes() <= 5000 * NODE_BYTES
+    assert tree.player[0] == PLAYER2  # rerooted on our move, the opponent is to move
+
+    board[0, action] = PLAYER1
+    reply = int(np.argmax(np.where(tree.children[0] >= 0, tree.visits[tree.children[0]], -1)))
+    board[column_height(board, reply), reply] = PLAYER2
+    reused_visits = tree.visits[tree.children[0, reply]]
+    assert reused_visits > 0
+    _, saved_state = generate_move_mcts(board, PLAYER1, saved_state, False, 100, early_stop=False)
+    assert saved_state.tree is tree
+    assert tree.rootnode.visits == reused_visits + 100
+
+
+def test_early_stop_keeps_best_action():
+    pretty_board = ("|==============|\n"
+                    "|              |\n"
+                    "|              |\n"
+                    "|              |\n"
+                    "|              |\n"
+                    "|    X O       |\n"
+                    "|  X X O O   O |\n"
+                    "|==============|\n"
+                    "|0 1 2 3 4 5 6 |")
+
+    board = string_to_board(pretty_board)
+    tree = MCTS(PLAYER2, board, iterations=20000, timeout=False, early_stop=True)
+    assert tree.get_best_action() == 5
+    assert tree.rootnode.visits < 20000
+
+
+def test_generate_move_mcts_keeps_game_budget():
+    board = initialize_game_state()
+    _, saved_state = generate_move_mcts(board, PLAYER1, None, game_time=1.0)
+    manager = saved_state.time_manager
+    assert isinstance(manager, TimeManager)
+    assert 0.9 < manager.remaining < 1.0
+
+
+@pytest.mark.parametrize("n_threads", [1, 4])
+@pytest.mark.parametrize("recycle", [False, True])
+def test_node_limit_bounds_tree(recycle, n_threads):
+    tree = MCTS(PLAYER1, initialize_game_state(), iterations=5000, timeout=False, initial_capacity=64,
+                max_nodes=1000, recycle=recycle, n_threads=n_threads)
+    tree.get_best_action()
+    assert tree.rootnode.visits == 5000
+    assert tree.capacity <= 1000
+    assert tree.high_water_nodes == 1000
+    assert not tree.virtual_loss[:tree.n_nodes].any()
+    assert tree.high_water_bytes <= 1000 * NODE_BYTES
+    assert (tree.n_recycled > 0) == recycle
+    for node in range(tree.n_nodes):  # every legal action has a child or is unexpanded
+        if not tree.terminal[node]:
+            for column in Node(tree, node).position.valid_actions():
+                assert (tree.children[node, column] < 0) == bool(tree.unexpanded[node] >> column & 1)
+
+
+@pytest.mark.parametrize("n_threads", [1, 4])
+@pytest.mark.parametrize("recycle", [False, True])
+def test_search_stops_before_resize_past_deadline(recycle, n_threads):
+    tree = MCTS(PLAYER1, initialize_game_state(), iterations=False, timeout=False, initial_capacity=64,
+                max_nodes=64 if recycle else None, recycle=recycle, n_threads=n_threads)
+    tree.resize_seconds_per_byte = 1.0  # any reallocation takes longer than the time left
+    start = time.perf_counter()
+    tree.get_best_action(start + 2)
+    assert time.perf_counter() - start < 2
+    assert tree.n_nodes == tree.capacity == 64
+    assert tree.n_recycled == 0
+
+
+def test_max_bytes_bounds_tree():
+    tree = MCTS(PLAYER1, initialize_game_state(), iterations=3000, timeout=False, max_bytes=100_000)
+    tree.get_best_action()
+    assert tree.high_water_bytes <= 100_000
+
+
+def test_solver_proves_immediate_win():
+    pretty_board = ("|==============|\n"
+                    "|              |\n"
+                    "|              |\n"
+                    "|              |\n"
+                    "|              |\n"
+                    "|    X O       |\n"
+                    "|  X X O O   O |\n"
+                    "|==============|\n"
+                    "|0 1 2 3 4 5 6 |")
+
+    board = string_to_board(pretty_board)
+    tree = MCTS(PLAYER2, board, iterations=10000, timeout=False, solver=True)
+    assert tree.get_best_action() == 5
+    assert tree.proven[0] == -1  # PLAYER1 moved into the root and has lost
+    assert tree.proven[tree.children[0, 5]] == 1
+    assert tree.rootnode.visits < 100
+
+
+def test_solver_proves_forced_loss():
+    pretty_board = ("|==============|\n"
+                    "|              |\n"
+                    "|              |\n"
+                    "|              |\n"
+                    "|              |\n"
+                    "|      O       |\n"
+                    "|O   X X X     |\n"
+                    "|==============|\n"
+                    "|0 1 2 3 4 5 6 |")
+
+    board = string_to_board(pretty_board)
+    tree = MCTS(PLAYER2, board, iterations=20000, timeout=False, solver=True)
+    tree.get_best_action()
+    assert tree.proven[0] == 1  # X wins on column 1 or 5 whatever O plays
+    for child in tree.children[0]:
+        assert child < 0 or tree.proven[child] == -1
+
+
+def test_edge_statistics_match_children():
+    tree = MCTS(PLAYER1, initialize_game_state(), iterations=2000, timeout=False)
+    tree.get_best_action()
+    nodes = np.arange(tree.n_nodes)
+    children = tree.children[nodes]
+    expanded = children >= 0
+    assert np.all(tree.child_visits[nodes][expanded] == tree.visits[children[expanded]])
+    assert np.allclose(tree.child_wins[nodes][expanded], tree.wins[children[expanded]])
+    assert np.all(tree.child_visits[nodes][~expanded] == 0)
+    assert np.allclose(tree.log_visits[nodes], np.log(tree.visits[nodes]))
+    assert tree.n_iterations == 2000
+    assert 0 < tree.selection_time
+
+
+def test_uct_best_child_prefers_unvisited_child():
+    tree = MCTS(PLAYER1, initialize_game_state(), iterations=7, timeout=False)
+    tree.get_best_action()
+    tree.child_visits[0, 4] = 0  # as if a concurrent search had expanded it but not backpropagated
+    assert tree.get_best_child(tree.rootnode).index == tree.children[0, 4]
+
+
+def test_generate_move_reports_search_stats():
+    reports = []
+    board = initialize_game_state()
+    _, saved_state = generate_move_mcts(board, PLAYER1, None, False, 1000, early_stop=False, profile=True,
+                                        callback=reports.append, callback_interval=250)
+    stats = saved_state.stats
+    assert isinstance(stats, SearchStats)
+    assert stats.iterations == stats.rollouts == 1000
+    assert stats.root_visits.sum() == 1000
+    assert 1 <= stats.mean_depth <= stats.max_depth
+    assert stats.n_nodes == saved_state.tree.n_nodes
+    assert 0 < stats.selection_time and 0 < stats.simulation_time
+    assert stats.selection_time + stats.expansion_time + stats.simulation_time \
+        + stats.backpropagation_time < stats.elapsed
+    assert [report.iterations for report in reports] == [250, 500, 750, 1000]
+    assert stats.as_dict()["root_visits"] == stats.root_visits.tolist()
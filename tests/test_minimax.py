@@ -1,7 +1,10 @@
+import time
 from mimetypes import init
 from agents.common import *
 import numpy as np
+import pytest
 from agents.agent_minimax.minimax import alphabeta, generate_move_minimax, heuristic
+from agents.agent_minimax.minimax import MoveOrdering, SearchCounters, TranspositionTable, root_split_search
 
 
 def test_sorted_valid_columns_on_intitial_state():
@@ -361,4 +364,195 @@ def test_alphabeta_multi_win_situation():
     assert action1 == 2
     assert action2 == 2
 
-    
\ No newline at end of file
+    
+
+def test_heuristic_bitboards_matches_heuristic():
+    from agents.agent_minimax.minimax import heuristic_bitboards
+    pretty_board = ("|==============|\n"
+                    "|              |\n"
+                    "|              |\n"
+                    "|              |\n"
+                    "|        O     |\n"
+                    "|    X   O     |\n"
+                    "|    O O O X X |\n"
+                    "|==============|\n"
+                    "|0 1 2 3 4 5 6 |")
+
+    board = string_to_board(pretty_board)
+    position = Position.from_board(board, PLAYER2)
+    assert heuristic_bitboards(position.bitboards[1], position.bitboards[0]) == heuristic(board, PLAYER2, True)
+    assert heuristic_bitboards(position.bitboards[0], position.bitboards[1]) == heuristic(board, PLAYER1, True)
+
+
+def test_alphabeta_position_restores_position():
+    from agents.agent_minimax.minimax import alphabeta_position
+
+    position = Position.from_board(initialize_game_state(), PLAYER1).play(3).play(2)
+    bitboards, heights = list(position.bitboards), list(position.heights)
+    alphabeta_position(position, 3)
+
+    assert position.bitboards == bitboards
+    assert position.heights == heights
+    assert position.player == PLAYER1
+
+
+def test_kept_table_cuts_off_with_deeper_entries():
+    from agents.agent_minimax.minimax import alphabeta_position
+
+    position = Position().play(3).play(3)
+    table = TranspositionTable()
+    alphabeta_position(position, 6, table=table)
+    position.play(2).play(4)
+    fresh, kept = SearchCounters(), SearchCounters()
+    alphabeta_position(position, 6, table=TranspositionTable(), counters=fresh)
+    action, _ = alphabeta_position(position, 6, table=table, counters=kept)
+    assert position.can_play(action)
+    assert kept.table_cutoffs > fresh.table_cutoffs
+    assert kept.nodes < fresh.nodes
+
+
+def test_generate_move_minimax_keeps_table():
+    from agents.agent_minimax.minimax import MinimaxSavedState
+    board = initialize_game_state()
+    action, saved_state = generate_move_minimax(board, PLAYER1, None)
+    assert isinstance(saved_state, MinimaxSavedState)
+    table = saved_state.table
+    n_stores = table.n_stores
+    board = apply_player_action(apply_player_action(board, action, PLAYER1), 3, PLAYER2)
+    _, saved_state = generate_move_minimax(board, PLAYER1, saved_state)
+    assert saved_state.table is table
+    assert table.n_stores > n_stores
+
+
+def test_alphabeta_position_timeout_restores_position():
+    from agents.agent_minimax.minimax import SearchTimeout, alphabeta_position
+
+    position = Position.from_board(initialize_game_state(), PLAYER1).play(3).play(2)
+    bitboards, heights, key = list(position.bitboards), list(position.heights), position.key
+    with pytest.raises(SearchTimeout):
+        alphabeta_position(position, 12, deadline=time.perf_counter() + 0.05)
+
+    assert position.bitboards == bitboards
+    assert position.heights == heights
+    assert position.key == key
+
+
+def test_iterative_deepening_meets_deadline():
+    from agents.agent_minimax.minimax import iterative_deepening, principal_variation
+
+    position = Position.from_board(initialize_game_state(), PLAYER1)
+    table = TranspositionTable()
+    start = time.perf_counter()
+    action, value, depth = iterative_deepening(position, start + 0.3, table=table)
+    assert time.perf_counter() - start < 0.35
+    assert depth > 1
+    assert action == 3
+    pv = principal_variation(position, table, depth)
+    assert pv[0] == action and len(pv) > 1
+    assert position.n_moves == 0
+
+
+def test_iterative_deepening_stops_at_win():
+    from agents.agent_minimax.minimax import iterative_deepening
+    pretty_board = ("|==============|\n"
+                    "|              |\n"
+                    "|              |\n"
+                    "|              |\n"
+                    "|              |\n"
+                    "|      O       |\n"
+                    "|O   X X       |\n"
+                    "|==============|\n"
+                    "|0 1 2 3 4 5 6 |")
+    position = Position.from_board(string_to_board(pretty_board), PLAYER1)
+    start = time.perf_counter()
+    action, value, depth = iterative_deepening(position, start + 10)
+    assert action == 4  # makes three in a row with both ends open
+    assert value >= 1e14
+    assert time.perf_counter() - start < 5
+
+
+def test_generate_move_minimax_with_timeout():
+    start = time.perf_counter()
+    action, saved_state = generate_move_minimax(initialize_game_state(), PLAYER1, None, timeout=0.2)
+    assert time.perf_counter() - start < 0.3
+    assert action == 3
+
+
+def test_window_counts_match_connected_n(random_game_states):
+    from agents.agent_minimax.minimax import WINDOW_MASKS, connected_n, window_counts
+
+    assert len(WINDOW_MASKS) == 69
+    for board, player, _, _, _, position in random_game_states:
+        own, other = position.bitboards[player_index(player)], position.bitboards[player_index(other_player(player))]
+        twos, threes, fours, other_twos, other_threes, other_fours = window_counts(own, other)
+        assert (twos, threes) == (connected_n(board, player, 2), connected_n(board, player, 3))
+        assert (other_twos, other_threes) == (connected_n(board, other_player(player), 2),
+                                              connected_n(board, other_player(player), 3))
+        assert (fours > 0) == bitboard_connected_four(own)
+        assert (other_fours > 0) == bitboard_connected_four(other)
+
+
+def test_move_ordering_counts_cutoffs(midgame_board):
+    static, dynamic = SearchCounters(), SearchCounters()
+    alphabeta(midgame_board, PLAYER2, 5, table=TranspositionTable(), counters=static,
+              ordering=MoveOrdering(killers=False, history=False))
+    alphabeta(midgame_board, PLAYER2, 5, table=TranspositionTable(), counters=dynamic)
+    assert dynamic.nodes < static.nodes
+    rates = dynamic.cutoff_rates()
+    assert set(rates) == {1, 2, 3, 4, 5}
+    for nodes, cutoff_rate, first_move_share in rates.values():
+        assert nodes > 0 and 0 <= cutoff_rate <= 1 and 0 <= first_move_share <= 1
+
+
+def test_generate_move_minimax_splits_root_and_keeps_table():
+    board = initialize_game_state()
+    action, saved_state = generate_move_minimax(board, PLAYER1, None, n_workers=2)
+    assert action == 3
+    table = saved_state.table
+    n_stores = table.n_stores
+    board = apply_player_action(apply_player_action(board, action, PLAYER1), 3, PLAYER2)
+    _, saved_state = generate_move_minimax(board, PLAYER1, saved_state, n_workers=2)
+    assert saved_state.table is table
+    assert table.n_stores > n_stores
+
+
+def test_heuristic_batch_matches_heuristic(random_game_states):
+    from agents.agent_minimax.minimax import heuristic_batch
+
+    boards = np.stack([board for board, *_ in random_game_states])
+    for player in (PLAYER1, PLAYER2):
+        for maximizing in (True, False):
+            expected = [heuristic(board, player, maximizing) for board in boards]
+            assert heuristic_batch(boards, player, maximizing).tolist() == expected
+
+
+SEARCH_VARIANTS = {  # name: (board, player, depth, counters) -> (action, value) of another way to search
+    "table": lambda board, player, depth, counters: alphabeta(
+        board, player, depth, table=TranspositionTable(1 << 12), counters=counters,
+        ordering=MoveOrdering(False, False), batch=False),  # small, so that entries get replaced
+    "move ordering": lambda board, player, depth, counters: alphabeta(
+        board, player, depth, table=TranspositionTable(1 << 12), counters=counters, batch=False),
+    "batched leaves": lambda board, player, depth, counters: alphabeta(
+        board, player, depth, counters=counters, ordering=MoveOrdering(False, False), batch=True),
+    "root split": lambda board, player, depth, counters: root_split_search(
+        board, player, depth, 2, counters=counters),
+}
+
+
+@pytest.mark.parametrize("depth", [1, 2, 4])
+@pytest.mark.parametrize("variant", list(SEARCH_VARIANTS))
+def test_search_variants_match_plain_search(search_positions, variant, depth):
+    for board, player in search_positions:
+        plain, counters = SearchCounters(), SearchCounters()
+        expected = alphabeta(board, player, depth, counters=plain, ordering=MoveOrdering(False, False), batch=False)
+        assert SEARCH_VARIANTS[variant](board, player, depth, counters) == expected
+        if variant == "table":
+            assert counters.nodes <= plain.nodes
+        if variant == "batched leaves":
+            assert (counters.nodes, counters.re_searches) == (plain.nodes, plain.re_searches)
+
+
+def test_root_split_clears_worker_tables_for_a_new_table(midgame_board):
+    root_split_search(midgame_board, PLAYER2, 6, 2)  # leaves deeper entries in the worker tables
+    expected = alphabeta(midgame_board, PLAYER2, 3, ordering=MoveOrdering(False, False), batch=False)
+    assert root_split_search(midgame_board, PLAYER2, 3, 2) == expected
@@ -0,0 +1,94 @@
+import numpy as np
+from agents.common import *
+from agents.opening_book import OpeningBook, book_positions, build_book, mirrored_key, write_book
+
+
+def test_book_positions_count_mirror_images_once():
+    positions = book_positions(2)
+    assert len(positions) == 1 + 4 + 25  # of the 49 two-ply positions only 3, 3 is its own mirror image
+    assert len({min(position.key, mirrored_key(position)) for position in positions}) == len(positions)
+
+
+def test_mirrored_key_matches_board_key():
+    position = Position()
+    for column in (0, 1, 1, 5, 3):
+        position.play(column)
+    assert mirrored_key(position) == board_key(position.to_board()[:, ::-1], position.player)
+
+
+def test_build_book_and_lookup(tmp_path):
+    from agents.agent_minimax.minimax import alphabeta_position
+
+    path = tmp_path / "book.bin"
+    assert build_book(path, max_ply=2, depth=2, verbose=False) == 30
+    book = OpeningBook(path)
+    assert len(book) == 30
+    assert np.all(np.diff(book.keys.astype(np.float64)) > 0)
+    for position in book_positions(2):
+        move, value = book.lookup(position)
+        assert position.can_play(move)
+        assert value == np.float32(alphabeta_position(position, 2)[1])
+        assert book.lookup_board(position.to_board(), position.player) == (move, value)
+    position = Position()
+    for column in (0, 1, 2):
+        position.play(column)
+    assert book.lookup(position) is None
+
+
+def test_lookup_mirrors_move(tmp_path):
+    position = Position().play(1)
+    mirror = Position().play(5)
+    path = tmp_path / "book.bin"
+    write_book(path, {min(position.key, mirror.key): (0 if position.key < mirror.key else 6, 1.5)})
+    book = OpeningBook(path)
+    assert book.lookup(position) == (0, 1.5)
+    assert book.lookup(mirror) == (6, 1.5)
+
+
+def test_default_book_is_found_once_built(tmp_path, monkeypatch):
+    import agents.opening_book as opening_book
+
+    path = tmp_path / "book.bin"
+    monkeypatch.setattr(opening_book, "BOOK_PATH", path)
+    monkeypatch.setattr(opening_book, "_DEFAULT_BOOK", [])
+    assert opening_book.default_book() is None
+    write_book(path, {Position().key: (0, 0.0)})
+    assert len(opening_book.default_book()) == 1
+    write_book(path, {Position().key: (0, 0.0), Position().play(3).key: (3, 0.0)})
+    assert len(opening_book.default_book()) == 2
+
+
+def test_agents_play_book_moves(tmp_path):
+    from agents.agent_mcts.mcts import generate_move_mcts
+    from agents.agent_minimax.minimax import generate_move_minimax
+
+    path = tmp_path / "book.bin"
+    write_book(path, {Position().key: (0, 0.0)})  # a move no search would choose
+    book = OpeningBook(path)
+    board = initialize_game_state()
+    assert generate_move_minimax(board, PLAYER1, None, opening_book=book)[0] == 0
+    assert generate_move_mcts(board, PLAYER1, None, 0.1, opening_book=book)[0] == 0
+    assert generate_move_minimax(board, PLAYER1, None)[0] == 3
+
+
+def test_book_moves_keep_search_state(tmp_path):
+    from agents.agent_mcts.mcts import generate_move_mcts
+    from agents.agent_minimax.minimax import MinimaxSavedState, generate_move_minimax
+
+    board = initialize_game_state()
+    _, minimax_state = generate_move_minimax(board, PLAYER1, None, 2)
+    _, mcts_state = generate_move_mcts(board, PLAYER1, None, False, 500)
+    board[0, 3] = PLAYER1
+    board[0, 2] = PLAYER2
+    position = Position.from_board(board, PLAYER1)
+    path = tmp_path / "book.bin"
+    write_book(path, {position.key: (0, 0.0)})
+    book = OpeningBook(path)
+
+    action, saved_state = generate_move_minimax(board, PLAYER1, minimax_state, 2, opening_book=book)
+    assert action == 0 and saved_state is minimax_state
+    assert isinstance(generate_move_minimax(board, PLAYER1, None, 2, opening_book=book)[1], MinimaxSavedState)
+    tree = mcts_state.tree
+    action, saved_state = generate_move_mcts(board, PLAYER1, mcts_state, False, 500, opening_book=book)
+    assert action == 0 and saved_state.tree is tree
+    assert tree.bitboards[0, 0] == position.bitboards[0] and tree.bitboards[0, 1] == position.bitboards[1]
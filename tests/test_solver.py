@@ -0,0 +1,64 @@
+import pytest
+from agents.common import *
+from agents.solver import SolverTable, solve, solve_move, winning_cells
+
+
+def brute_force_score(position: Position) -> int:
+    """
+    Score of `position` for the player to move by plain minimax over the whole rest of the game.
+    """
+    best = -N_CELLS
+    for column in position.valid_actions():
+        position.play(column)
+        if position.last_move_end_state() == GameState.IS_WIN:
+            score = (N_CELLS + 2 - position.n_moves) // 2
+        elif position.n_moves == N_CELLS:
+            score = 0
+        else:
+            score = -brute_force_score(position)
+        position.undo()
+        best = max(best, score)
+    return best
+
+
+def test_winning_cells():
+    pretty_board = ("|==============|\n"
+                    "|              |\n"
+                    "|              |\n"
+                    "|              |\n"
+                    "|              |\n"
+                    "|  X           |\n"
+                    "|  X X X O O O |\n"
+                    "|==============|\n"
+                    "|0 1 2 3 4 5 6 |")
+    position = Position.from_board(string_to_board(pretty_board), PLAYER1)
+    cells = winning_cells(position.bitboards[0], position.mask)
+    assert cells == CELL_BITS[0, 0]
+    assert winning_cells(position.bitboards[1], position.mask) == 0
+
+
+@pytest.mark.parametrize("empty_cells", [4, 7, 9])
+def test_solver_matches_brute_force(late_positions, empty_cells):
+    for position in late_positions(10, empty_cells, seed=empty_cells):
+        expected = brute_force_score(position.copy())
+        assert solve(position)[0] == expected
+        move, score = solve_move(position, SolverTable(1 << 10))
+        assert score == expected
+        position.play(move)
+        if position.last_move_end_state() == GameState.IS_WIN:
+            assert score == (N_CELLS + 2 - position.n_moves) // 2
+        elif position.n_moves < N_CELLS:
+            assert -brute_force_score(position) == expected
+
+
+def test_agents_hand_over_to_solver(late_positions):
+    from agents.agent_mcts.mcts import generate_move_mcts
+    from agents.agent_minimax.minimax import generate_move_minimax
+
+    for position in late_positions(5, 12, seed=3):
+        board, player = position.to_board(), position.player
+        move, score = solve_move(position)
+        assert generate_move_minimax(board, player, None, solver_empty_cells=12)[0] == move
+        action, saved_state = generate_move_mcts(board, player, None, 0.1, solver_empty_cells=12)
+        assert action == move
+        assert saved_state.tree is None